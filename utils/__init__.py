@@ -1,15 +1,69 @@
-import math
+import os
+import time
 import random
 import itertools
+import hashlib
+import json
+import argparse
+import platform
+import importlib
+import tracemalloc
+import asyncio
+from concurrent import futures
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib import cm
-from matplotlib.patches import ConnectionPatch
-import gurobi as gb
-from gurobipy import GRB
-
-import utils.file_reader
-import utils.data_generator
-import utils.problem_model
-import utils.data_visualizer
+
+# Heavy dependencies and the modules of the package are imported the first time they are
+# accessed, e.g. by "from . import pd", so that solver-only processes never load the plotting
+# stack. Each name maps to (module, attribute), attribute being None for the module itself
+_LAZY_IMPORTS = {"pd": ("pandas", None),
+                 "sparse": ("scipy.sparse", None),
+                 "csgraph": ("scipy.sparse.csgraph", None),
+                 "optimize": ("scipy.optimize", None),
+                 "plt": ("matplotlib.pyplot", None),
+                 "cm": ("matplotlib.cm", None),
+                 "ConnectionPatch": ("matplotlib.patches", "ConnectionPatch"),
+                 "gb": ("gurobi", None),
+                 "GRB": ("gurobipy", "GRB")}
+
+_MODULES = ["file_reader",
+            "data_generator",
+            "problem_model",
+            "milp_backends",
+            "shortest_paths",
+            "heuristics",
+            "solution_analysis",
+            "time_expanded",
+            "lazy_constraints",
+            "presolve",
+            "lagrangian",
+            "column_generation",
+            "replanning",
+            "data_visualizer",
+            "benchmark",
+            "batch_solver",
+            "solution_cache",
+            "telemetry"]
+
+
+def __getattr__(name):
+    """Import a lazily imported dependency or module of the package when first accessed"""
+
+    if name in _LAZY_IMPORTS:
+        module_name, attribute = _LAZY_IMPORTS[name]
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+    elif name in _MODULES:
+        value = importlib.import_module(f"{__name__}.{name}")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    """List the names of the package, including the ones not imported yet"""
+
+    return sorted(set(globals()) | set(_LAZY_IMPORTS) | set(_MODULES))
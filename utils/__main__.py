@@ -0,0 +1,70 @@
+"""Command line interface of the package
+
+Usage:
+    python -m utils benchmark --problems ABP NBP --networks 5x5 6x6 --output results.json
+    python -m utils benchmark --networks 5x5 --baseline results.json
+"""
+from . import argparse
+from . import benchmark
+
+
+def _parse_args(argv=None):
+    """Parse the command line arguments"""
+
+    parser = argparse.ArgumentParser(prog="python -m utils")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite = commands.add_parser("benchmark",
+                                help="time build, solve and extraction of the problems over the paper's datasets")
+    suite.add_argument("--problems", nargs="+", default=benchmark.SUITE_PROBLEM_TYPES)
+    suite.add_argument("--networks", nargs="+", default=benchmark.SUITE_NETWORK_TYPES)
+    suite.add_argument("--symmetries", nargs="+", default=benchmark.SUITE_SYMMETRIES)
+    suite.add_argument("--congestion-levels", nargs="+", type=float, default=benchmark.SUITE_CONGESTION_LEVELS)
+    suite.add_argument("--instances", type=int, default=5, help="instances of each dataset")
+    suite.add_argument("--repeats", type=int, default=3)
+    suite.add_argument("--warmup", type=int, default=1)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--time-limit", type=float, default=None, help="time limit (s) of each solve")
+    suite.add_argument("--data-dir", default="data")
+    suite.add_argument("--output", default=None, help="JSON file where results are saved")
+    suite.add_argument("--baseline", default=None, help="JSON file of a previous run to compare with")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown considered a regression")
+    suite.add_argument("--min-time", type=float, default=0.05, help="phases faster than this (s) are ignored")
+    suite.add_argument("--verbose", action="store_true")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Run a command, returning the exit code: 1 if a benchmark regressed against its baseline"""
+
+    args = _parse_args(argv)
+
+    if args.command == "benchmark":
+        results = benchmark.run_suite(args.problems, args.networks, args.symmetries, args.congestion_levels,
+                                      num_instances=args.instances, repeats=args.repeats, warmup=args.warmup,
+                                      seed=args.seed, time_limit=args.time_limit, data_dir=args.data_dir,
+                                      verbose=args.verbose)
+        if args.output is not None:
+            benchmark.save_results(results, args.output)
+
+        for case in results["cases"]:
+            print(f"{case['network_type']:>6} it{case['instance']:<3} {case['symmetry']:<6} "
+                  f"{case['congestion_level']:<4} {case['problem_type']:<5} "
+                  f"build {case['build_time']:.4f}s solve {case['solve_time']:.4f}s "
+                  f"extract {case['extract_time']:.4f}s")
+
+        if args.baseline is not None:
+            regressions = benchmark.compare_to_baseline(results, benchmark.load_results(args.baseline),
+                                                        args.tolerance, args.min_time)
+            for regression in regressions:
+                print(f"REGRESSION {regression['case']} {regression['phase']}: "
+                      f"{regression['baseline']} -> {regression['new']}")
+            if regressions:
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,257 @@
+"""Module that contains functions to solve many MSPPs and MSPP-PDs in parallel"""
+from . import os
+from . import hashlib
+from . import np
+from . import futures
+from . import data_generator
+from . import problem_model
+
+
+# status of the combinations whose solve raised an error, e.g. a gurobipy.GurobiError
+FAILED_STATUS = -1
+
+# data shared by all the tasks solved by a worker process, set once by _init_worker()
+_worker_setup = {}
+
+
+def _init_worker(nodes, arcs, problem_types, scenarios, threads, time_limit):
+    """Store in the worker process the data shared by all its tasks
+
+    The worker's models are all created in a single Gurobi environment, started here with the
+    solver's parameters
+
+    Args:
+        nodes (list): list of the nodes in the network instances
+        arcs (list): list of (i, j) tuples, ordered by arc's idx, of the network instances
+        problem_types (list): the optimization problems to solve
+        scenarios (list): list of scenarios, each one being a list of agents that has to be routed
+        threads (int): number of threads the solver can use
+        time_limit (float): time limit (s) of each solve, None for no limit
+    """
+
+    params = {"Threads": threads}
+    if time_limit is not None:
+        params["TimeLimit"] = time_limit
+
+    _worker_setup.update(nodes=nodes,
+                         network=data_generator.Network([i for i, _ in arcs], [j for _, j in arcs]),
+                         problem_types=problem_types,
+                         scenarios=scenarios,
+                         env=problem_model.start_env(**params))
+
+
+def _solve_task(task):
+    """Solve a single (instance, problem type, scenario) combination in a worker process
+
+    Args:
+        task (tuple): a tuple (it_i, pb_i, scenario_i, weights) with the positions of the
+          combination in the results and the weights of the network instance's arcs
+
+    Returns:
+        tuple: a tuple (it_i, pb_i, scenario_i, status, runtime, objectives, agents_distances)
+    """
+
+    it_i, pb_i, scenario_i, weights = task
+    agents = _worker_setup["scenarios"][scenario_i]
+    w_arcs = data_generator.NetworkInstance(_worker_setup["network"], weights)
+
+    problem, X, *_ = problem_model.set_problem(_worker_setup["problem_types"][pb_i],
+                                               _worker_setup["nodes"], w_arcs, agents,
+                                               env=_worker_setup["env"])
+    problem.optimize()
+
+    objectives, agents_distances = [], {}
+    if problem.SolCount > 0:  # optimal or, at least, the best solution found within the time limit
+        problem.params.SolutionNumber = 0
+        for obj in range(problem.NumObj):
+            problem.params.ObjNumber = obj
+            objectives.append(problem.ObjNVal)
+
+        distances = np.asarray(weights) @ np.round(X.X)
+        agents_distances = {agent.idx: distances[agent.idx] for agent in agents}
+
+    status, runtime = problem.Status, problem.Runtime
+    problem.dispose()  # free the model in the shared environment right away
+
+    return it_i, pb_i, scenario_i, status, runtime, objectives, agents_distances
+
+
+def _empty_results(num_instances, num_problem_types, num_scenarios, max_num_of_agents):
+    """Allocate the arrays where the results of the batch are gathered
+
+    Args:
+        num_instances (int): number of network instances
+        num_problem_types (int): number of optimization problems
+        num_scenarios (int): number of scenarios
+        max_num_of_agents (int): maximum number of agents in a scenario
+
+    Returns:
+        dict: a dict of np.ndarray, see batch_solve()
+    """
+
+    shape = num_instances, num_problem_types, num_scenarios
+
+    return {"opt_tot_distances": np.full(shape, np.nan),
+            "opt_penalties": np.full(shape, np.nan),
+            "agents_opt_distances": np.full((max_num_of_agents,) + shape, np.nan),
+            "convergence_times": np.full(shape, np.nan),
+            "statuses": np.zeros(shape, dtype=int),
+            "done": np.zeros(shape, dtype=bool)}
+
+
+def _batch_fingerprint(nodes, arcs, weights, problem_types, scenarios):
+    """Identify a batch, so that a checkpoint is only restored by the batch that saved it
+
+    Args:
+        nodes (list): list of the nodes in the network instances
+        arcs (list): list of (i, j) tuples, ordered by arc's idx, of the network instances
+        weights (np.ndarray): the weights of the arcs of each network instance
+        problem_types (list): the optimization problems to solve
+        scenarios (list): list of scenarios, each one being a list of agents that has to be routed
+
+    Returns:
+        dict: a dict with the problem types and the hexadecimal hashes of the network
+          instances and of the scenarios
+    """
+
+    network_digest = hashlib.sha256()
+    for array in [np.asarray(nodes, dtype=np.int64),
+                  np.asarray(arcs, dtype=np.int64),
+                  np.asarray(weights, dtype=np.float64)]:
+        network_digest.update(np.ascontiguousarray(array).tobytes())
+
+    scenarios_digest = hashlib.sha256()
+    for agents in scenarios:
+        scenario = [(agent.idx, agent.source, agent.terminus) for agent in agents]
+        scenarios_digest.update(repr(scenario).encode())
+
+    return {"problem_types": np.array(problem_types, dtype=str),
+            "network_digest": np.array(network_digest.hexdigest()),
+            "scenarios_digest": np.array(scenarios_digest.hexdigest())}
+
+
+def _save_checkpoint(checkpoint, results, fingerprint):
+    """Atomically save the results gathered so far
+
+    Args:
+        checkpoint (str): name of the .npz file where results are saved
+        results (dict): the results of the batch
+        fingerprint (dict): the fingerprint of the batch, see _batch_fingerprint()
+    """
+
+    tmp_checkpoint = checkpoint + ".tmp.npz"
+    np.savez(tmp_checkpoint, **results, **fingerprint)
+    os.replace(tmp_checkpoint, checkpoint)
+
+
+def _load_checkpoint(checkpoint, results, fingerprint):
+    """Restore in results the ones saved on a checkpoint, if present and saved by the same batch
+
+    Args:
+        checkpoint (str): name of the .npz file where results were saved
+        results (dict): the empty results of the batch, filled in place
+        fingerprint (dict): the fingerprint of the batch, see _batch_fingerprint()
+    """
+
+    if checkpoint is None or not os.path.exists(checkpoint):
+        return
+
+    with np.load(checkpoint) as saved_results:
+        for name, value in fingerprint.items():
+            if name not in saved_results or not np.array_equal(saved_results[name], value):
+                raise ValueError(f"Checkpoint {checkpoint} was saved by a different batch, {name} differs")
+        if saved_results["done"].shape != results["done"].shape:
+            raise ValueError(f"Checkpoint {checkpoint} refers to a batch with a different shape")
+        for name in results:
+            results[name][...] = saved_results[name]
+
+
+def batch_solve(networks_df, problem_types, scenarios, *, nodes=None, processes=None,
+                threads=1, time_limit=None, checkpoint=None, checkpoint_every=50):
+    """Solve every (network instance, problem type, scenario) combination over a pool of processes
+
+    Results are placed according to the position of the combination, so they do not depend on
+    the order in which the processes complete their tasks. A combination whose solve raises
+    an error does not stop the batch: its status is FAILED_STATUS and it is not done. If a
+    checkpoint is given, the results are periodically saved on it, also when the batch is
+    interrupted, and the combinations already solved are skipped when the same batch is run
+    again
+
+    Args:
+        networks_df (pd.Dataframe): pandas dataframe containing one or more network instances
+        problem_types (list): the optimization problems to solve. Only MSPP and MSPP-PD variants are accepted
+        scenarios (list): list of scenarios, each one being a list of agents that has to be routed
+        nodes (list): list of the nodes in the network instances. By default they are the ones of networks_df
+        processes (int): number of worker processes. By default each core runs a solver's thread
+        threads (int): number of threads each solver can use (default is 1)
+        time_limit (float): time limit (s) of each solve. By default there is no limit
+        checkpoint (str): name of the .npz file where to save partial results. By default
+          nothing is saved
+        checkpoint_every (int): number of solved combinations between two checkpoints (default is 50)
+
+    Returns:
+        dict: a dict of np.ndarray with shape (num_of_instances, len(problem_types), len(scenarios)),
+          except where stated otherwise:
+          - "opt_tot_distances": the optimal total distance
+          - "opt_penalties": the optimal penalty (NaN for the MSPP)
+          - "agents_opt_distances": the distance covered by each agent, with an additional leading
+            axis indexed by agent's idx (NaN for agents not in a scenario)
+          - "convergence_times": the solver's runtime (s)
+          - "statuses": the final status of the solver, FAILED_STATUS if the solve raised an error
+          - "done": whether the combination has been solved
+          Distances and penalties are NaN where the solver found no solution within the time limit
+    """
+
+    if nodes is None:
+        nodes = data_generator.get_nodes(networks_df)
+    if processes is None:
+        processes = max(1, (os.cpu_count() or 1) // threads)
+
+    arcs = list(networks_df.columns)
+    weights = networks_df.to_numpy(dtype=float)
+    max_num_of_agents = max(agent.idx for agents in scenarios for agent in agents) + 1
+
+    results = _empty_results(len(weights), len(problem_types), len(scenarios), max_num_of_agents)
+    fingerprint = _batch_fingerprint(nodes, arcs, weights, problem_types, scenarios)
+    _load_checkpoint(checkpoint, results, fingerprint)
+
+    tasks = [(it_i, pb_i, scenario_i, weights[it_i])
+             for it_i, pb_i, scenario_i in zip(*np.nonzero(~results["done"]))]
+
+    with futures.ProcessPoolExecutor(max_workers=processes,
+                                     initializer=_init_worker,
+                                     initargs=(nodes, arcs, problem_types, scenarios,
+                                               threads, time_limit)) as executor:
+
+        # the combination of each task, to record the failure of the ones that raise an error
+        pending = {executor.submit(_solve_task, task): task[:3] for task in tasks}
+        try:
+            for num_done, solved in enumerate(futures.as_completed(pending), start=1):
+                combination = pending[solved]
+                try:
+                    _, _, _, status, runtime, objectives, agents_distances = solved.result()
+                except Exception:  # e.g. a model too large for the license, retried by the next run
+                    results["statuses"][combination] = FAILED_STATUS
+                else:
+                    results["statuses"][combination] = status
+                    results["convergence_times"][combination] = runtime
+                    if objectives:
+                        results["opt_tot_distances"][combination] = objectives[0]
+                    if len(objectives) > 1:
+                        results["opt_penalties"][combination] = objectives[1]
+                    for agent_idx, distance in agents_distances.items():
+                        results["agents_opt_distances"][(agent_idx,) + combination] = distance
+                    results["done"][combination] = True
+
+                if checkpoint is not None and num_done % checkpoint_every == 0:
+                    _save_checkpoint(checkpoint, results, fingerprint)
+        except BaseException:
+            # e.g. KeyboardInterrupt: the executor then only waits for the tasks already running
+            for future in pending:
+                future.cancel()
+            raise
+        finally:
+            if checkpoint is not None:
+                _save_checkpoint(checkpoint, results, fingerprint)
+
+    return results
@@ -0,0 +1,556 @@
+"""Module that contains functions to measure the time needed to load, build and solve MSPPs and MSPP-PDs"""
+from . import os
+from . import np
+from . import time
+from . import tracemalloc
+from . import json
+from . import platform
+from . import GRB
+from . import file_reader
+from . import data_generator
+from . import problem_model
+from . import milp_backends
+from . import heuristics
+
+
+def time_problem(problem_type, nodes, w_arcs, agents, time_limit=None):
+    """Build and solve a problem measuring separately the two phases
+
+    Args:
+        problem_type (str): The optimization problem to formulate. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        time_limit (float): time limit (s) for the solver. By default there is no limit
+
+    Returns:
+        dict: a dict with the time (s) spent building the model ("build_time"), the time (s)
+          spent by the solver ("solve_time") and the final status of the model ("status")
+    """
+
+    start = time.perf_counter()
+    problem, *_ = problem_model.set_problem(problem_type, nodes, w_arcs, agents)
+    problem.update()  # flush pending modifications, they are part of the build
+    build_time = time.perf_counter() - start
+
+    if time_limit is not None:
+        problem.Params.TimeLimit = time_limit
+    problem.optimize()
+
+    return {"build_time": build_time,
+            "solve_time": problem.Runtime,
+            "status": problem.Status}
+
+
+def benchmark_problems(problem_types, nodes, networks, agents, time_limit=None):
+    """Measure build and solve times of some problems over a set of network instances
+
+    Args:
+        problem_types (list): the optimization problems to benchmark
+        nodes (list): list of the nodes of the network instances
+        networks (iterable): the network instances, each given as a list of weighted arcs
+        agents (list): list of agents that has to be routed
+        time_limit (float): time limit (s) for each solve. By default there is no limit
+
+    Returns:
+        tuple: a tuple (build_times, solve_times) of np.ndarray with shape
+          (num_of_instances, len(problem_types)) containing the times (s) of each phase
+    """
+
+    build_times, solve_times = [], []
+    for w_arcs in networks:
+        timings = [time_problem(problem_type, nodes, w_arcs, agents, time_limit)
+                   for problem_type in problem_types]
+        build_times.append([timing["build_time"] for timing in timings])
+        solve_times.append([timing["solve_time"] for timing in timings])
+
+    return np.array(build_times), np.array(solve_times)
+
+
+def benchmark_model_reuse(problem_type, nodes, networks, agents, warm_start=False):
+    """Compare rebuilding a problem for each network instance against reusing a single model
+
+    Args:
+        problem_type (str): the optimization problem to benchmark
+        nodes (list): list of the nodes of the network instances
+        networks (iterable): the network instances, sharing the same topology, each given as a
+          list of weighted arcs
+        agents (list): list of agents that has to be routed
+        warm_start (bool): if True, the reused model starts from the previous instance's solution
+
+    Returns:
+        tuple: a tuple (rebuild_times, reuse_times) of np.ndarray containing, for each instance,
+          the overall time (s) to get it solved with the two approaches
+    """
+
+    rebuild_times, reuse_times = [], []
+    reusable_problem = None
+    for w_arcs in networks:
+
+        start = time.perf_counter()
+        problem, *_ = problem_model.set_problem(problem_type, nodes, w_arcs, agents)
+        problem.optimize()
+        rebuild_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        if reusable_problem is None:
+            reusable_problem = problem_model.ReusableProblem(problem_type, nodes, w_arcs, agents)
+        else:
+            reusable_problem.set_instance(w_arcs)
+        reusable_problem.optimize(warm_start=warm_start)
+        reuse_times.append(time.perf_counter() - start)
+
+    return np.array(rebuild_times), np.array(reuse_times)
+
+
+def compare_backends(problem_types, nodes, networks, agents, time_limit=None):
+    """Solve some problems with both HiGHS and Gurobi to cross-check their optimal objectives
+
+    Args:
+        problem_types (list): the optimization problems to solve
+        nodes (list): list of the nodes of the network instances
+        networks (iterable): the network instances, each given as a list of weighted arcs
+        agents (list): list of agents that has to be routed
+        time_limit (float): time limit (s) for each solve. By default there is no limit
+
+    Returns:
+        dict: a dict with, for each backend, a np.ndarray with shape
+          (num_of_instances, len(problem_types), 2) containing the Distance and the Penalty
+          objectives (NaN where missing) and a np.ndarray with shape
+          (num_of_instances, len(problem_types)) with the solvers' runtimes (s)
+    """
+
+    backends = ["highs", "gurobi"]
+    objectives = {backend: [] for backend in backends}
+    runtimes = {backend: [] for backend in backends}
+
+    for w_arcs in networks:
+        instance_objectives = {backend: [] for backend in backends}
+        instance_runtimes = {backend: [] for backend in backends}
+
+        for problem_type in problem_types:
+            description = problem_model.describe_problem(problem_type, nodes, w_arcs, agents)
+            for backend in backends:
+                solution = milp_backends.solve(description, backend, time_limit=time_limit)
+                padded_objectives = solution.objectives + [np.nan] * (2 - len(solution.objectives))
+                instance_objectives[backend].append(padded_objectives)
+                instance_runtimes[backend].append(solution.runtime)
+
+        for backend in backends:
+            objectives[backend].append(instance_objectives[backend])
+            runtimes[backend].append(instance_runtimes[backend])
+
+    return {**{f"{backend}_objectives": np.array(objectives[backend]) for backend in backends},
+            **{f"{backend}_runtimes": np.array(runtimes[backend]) for backend in backends}}
+
+
+def benchmark_loading(filename, along, dirname, num_of_instances=150, repeats=5):
+    """Compare loading network instances from the paper's csv files and from a columnar binary store
+
+    The store is created from the csv file if missing
+
+    Args:
+        filename (str): The name of the csv file
+        along (str): Specify how instances are ordered on the csv file, see file_reader.read_networks_csv()
+        dirname (str): The name of the directory of the store, see file_reader.write_networks_store()
+        num_of_instances (int): number of instances taken, as done by networks_df.head(), in
+          the second measure of each source (default is 150)
+        repeats (int): number of times each measure is repeated (default is 5)
+
+    Returns:
+        dict: a dict with the best time (s), among the repetitions, to load all the instances
+          ("csv_load_time", "store_load_time") and to load and read the weights of the first
+          num_of_instances instances ("csv_head_time", "store_head_time")
+    """
+
+    if not os.path.exists(dirname):
+        file_reader.convert_networks_csv(filename, along, dirname)
+
+    loaders = {"csv": lambda: file_reader.read_networks_csv(filename, along),
+               "store": lambda: file_reader.read_networks_store(dirname)}
+
+    timings = {}
+    for source, loader in loaders.items():
+        load_times, head_times = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            networks_df = loader()
+            load_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            networks_df = loader()
+            networks_df.head(num_of_instances).to_numpy().sum()  # weights actually read
+            head_times.append(time.perf_counter() - start)
+
+        timings[f"{source}_load_time"] = min(load_times)
+        timings[f"{source}_head_time"] = min(head_times)
+
+    return timings
+
+
+def _blended_objective(problem):
+    """Gives the sum of the objectives of the best solution found, NaN if none was found"""
+
+    if problem.SolCount == 0:
+        return np.nan
+
+    problem.params.SolutionNumber = 0
+    objective = 0.0
+    for obj in range(problem.NumObj):
+        problem.params.ObjNumber = obj
+        objective += problem.ObjNVal
+
+    return objective
+
+
+def compare_penalty_formulations(problem_types, nodes, networks, agents, time_limit=None):
+    """Compare the "pairs" and the "counts" formulations of the quadratic penalties
+
+    Args:
+        problem_types (list): the optimization problems to benchmark, i.e. AQP and/or NQP
+        nodes (list): list of the nodes of the network instances
+        networks (iterable): the network instances, each given as a list of weighted arcs
+        agents (list): list of agents that has to be routed
+        time_limit (float): time limit (s) for each solve. By default there is no limit
+
+    Returns:
+        dict: a dict with, for each formulation, np.ndarray with shape
+          (num_of_instances, len(problem_types)) containing the build times (s)
+          ("<formulation>_build_times"), the peak memory (bytes) allocated by Python while
+          building ("<formulation>_build_memory"), the number of variables, constraints and
+          nonzeros of the models ("<formulation>_num_vars", "<formulation>_num_constrs",
+          "<formulation>_num_nonzeros"), the solve times (s) ("<formulation>_solve_times") and
+          the blended optimal objectives ("<formulation>_objectives", NaN if not found)
+    """
+
+    formulations = ["pairs", "counts"]
+    measures = ["build_times", "build_memory", "num_vars", "num_constrs", "num_nonzeros",
+                "solve_times", "objectives"]
+    results = {f"{formulation}_{measure}": [] for formulation in formulations for measure in measures}
+
+    for w_arcs in networks:
+        instance_results = {name: [] for name in results}
+        for problem_type in problem_types:
+            for formulation in formulations:
+                tracemalloc.start()
+                start = time.perf_counter()
+                problem, *_ = problem_model.set_problem(problem_type, nodes, w_arcs, agents,
+                                                        penalty_formulation=formulation)
+                problem.update()
+                build_time = time.perf_counter() - start
+                _, build_memory = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                if time_limit is not None:
+                    problem.Params.TimeLimit = time_limit
+                problem.optimize()
+
+                objective = _blended_objective(problem)
+
+                for measure, value in zip(measures, [build_time, build_memory, problem.NumVars,
+                                                     problem.NumConstrs, problem.NumNZs,
+                                                     problem.Runtime, objective]):
+                    instance_results[f"{formulation}_{measure}"].append(value)
+
+        for name in results:
+            results[name].append(instance_results[name])
+
+    return {name: np.array(values) for name, values in results.items()}
+
+
+def _first_incumbent_callback(problem, where):
+    """Gurobi callback that records in problem._first_incumbent_time when the first solution is found"""
+
+    if problem._first_incumbent_time is None:
+        if where == GRB.Callback.MIPSOL:
+            problem._first_incumbent_time = problem.cbGet(GRB.Callback.RUNTIME)
+        elif where == GRB.Callback.MIP and problem.cbGet(GRB.Callback.MIP_SOLCNT) > 0:
+            problem._first_incumbent_time = problem.cbGet(GRB.Callback.RUNTIME)
+
+
+def time_warm_start(problem_type, nodes, w_arcs, agents, warm_start=True, time_limit=None):
+    """Solve a problem measuring when the first incumbent and the optimal solution are found
+
+    Args:
+        problem_type (str): The optimization problem to formulate. Only MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        warm_start (bool): if True, the solver starts from the solution of heuristics.prioritized_planning()
+        time_limit (float): time limit (s) for the solver. By default there is no limit
+
+    Returns:
+        dict: a dict with the time (s) spent by the heuristic ("heuristic_time", 0 without warm
+          start), the solver's time (s) to find the first incumbent ("first_incumbent_time") and
+          to terminate ("solve_time"), the final status of the model ("status") and the blended
+          objective of the heuristic's and of the final solutions ("heuristic_objective",
+          "objective"), NaN where missing
+    """
+
+    problem, *variables = problem_model.set_problem(problem_type, nodes, w_arcs, agents)
+    if time_limit is not None:
+        problem.Params.TimeLimit = time_limit
+
+    heuristic_time, heuristic_objective = 0.0, np.nan
+    if warm_start:
+        start = time.perf_counter()
+        x = heuristics.prioritized_planning(problem_type, nodes, w_arcs, agents)
+        heuristic_time = time.perf_counter() - start
+        heuristics.set_warm_start(problem_type, variables, nodes, w_arcs, agents, x)
+        heuristic_objective = sum(heuristics.evaluate_paths(problem_type, x, nodes, w_arcs, agents))
+
+    problem._first_incumbent_time = None
+    problem.optimize(_first_incumbent_callback)
+
+    objective = _blended_objective(problem)
+
+    return {"heuristic_time": heuristic_time,
+            "first_incumbent_time": (np.nan if problem._first_incumbent_time is None
+                                     else problem._first_incumbent_time),
+            "solve_time": problem.Runtime,
+            "status": problem.Status,
+            "heuristic_objective": heuristic_objective,
+            "objective": objective}
+
+
+def benchmark_warm_start(problem_types, nodes, networks, agents, time_limit=None):
+    """Compare solving some problems from scratch and from the prioritized planning heuristic
+
+    Args:
+        problem_types (list): the optimization problems to benchmark
+        nodes (list): list of the nodes of the network instances
+        networks (iterable): the network instances, each given as a list of weighted arcs
+        agents (list): list of agents that has to be routed
+        time_limit (float): time limit (s) for each solve. By default there is no limit
+
+    Returns:
+        dict: a dict with, for "cold" and "warm" solves, np.ndarray with shape
+          (num_of_instances, len(problem_types)) containing the times (s) to the first incumbent
+          ("<mode>_first_incumbent_times") and to optimality ("<mode>_solve_times"), the latter
+          including the heuristic's time for warm solves, plus the objectives of the heuristic
+          ("heuristic_objectives") and of the solver ("<mode>_objectives")
+    """
+
+    results = {name: [] for name in ["cold_first_incumbent_times", "cold_solve_times", "cold_objectives",
+                                     "warm_first_incumbent_times", "warm_solve_times", "warm_objectives",
+                                     "heuristic_objectives"]}
+    for w_arcs in networks:
+        instance_results = {name: [] for name in results}
+        for problem_type in problem_types:
+            for mode, warm_start in [("cold", False), ("warm", True)]:
+                timing = time_warm_start(problem_type, nodes, w_arcs, agents, warm_start, time_limit)
+                instance_results[f"{mode}_first_incumbent_times"].append(timing["heuristic_time"]
+                                                                         + timing["first_incumbent_time"])
+                instance_results[f"{mode}_solve_times"].append(timing["heuristic_time"] + timing["solve_time"])
+                instance_results[f"{mode}_objectives"].append(timing["objective"])
+            instance_results["heuristic_objectives"].append(timing["heuristic_objective"])
+
+        for name in results:
+            results[name].append(instance_results[name])
+
+    return {name: np.array(values) for name, values in results.items()}
+
+
+# problems, datasets and agents' configurations of the paper's tractability study
+SUITE_PROBLEM_TYPES = ["MSPP", "ABP", "NBP", "ALP", "NLP", "AQP", "NQP"]
+SUITE_NETWORK_TYPES = ["5x5", "6x6", "8x8", "10x10", "12x12"]
+SUITE_SYMMETRIES = ["high", "medium", "low"]
+SUITE_CONGESTION_LEVELS = [0.5, 1, 1.5, 2]
+
+
+def _network_filename(data_dir, network_type):
+    """Gives the csv file of the paper's instances of a grid size, e.g. "6x6" """
+
+    filename = os.path.join(data_dir, f"d_it_ij_{network_type}_10it.csv")
+    if not os.path.exists(filename):
+        filename = os.path.join(data_dir, f"d_it_ij_{network_type}_1it.csv")
+
+    return filename
+
+
+def _run_case(problem_type, nodes, w_arcs, agents, time_limit):
+    """Build, solve and extract the solution of a problem timing each phase
+
+    Returns:
+        dict: a dict with "build_time", "solve_time", "extract_time", "status", "objectives"
+          and "agents_distances", the distance covered by each agent, by position in agents
+    """
+
+    start = time.perf_counter()
+    problem, X, *_ = problem_model.set_problem(problem_type, nodes, w_arcs, agents)
+    problem.update()
+    build_time = time.perf_counter() - start
+
+    if time_limit is not None:
+        problem.Params.TimeLimit = time_limit
+    start = time.perf_counter()
+    problem.optimize()
+    solve_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    objectives, agents_distances = [], []
+    if problem.SolCount > 0:
+        arc_idxs, _, _, weights = problem_model._arc_arrays(w_arcs)
+        distances = weights @ np.round(X.X)[arc_idxs]
+        agents_distances = [float(distances[agent.idx]) for agent in agents]
+        problem.params.SolutionNumber = 0
+        for obj in range(problem.NumObj):
+            problem.params.ObjNumber = obj
+            objectives.append(problem.ObjNVal)
+    extract_time = time.perf_counter() - start
+
+    return {"build_time": build_time,
+            "solve_time": solve_time,
+            "extract_time": extract_time,
+            "status": problem.Status,
+            "objectives": objectives,
+            "agents_distances": agents_distances}
+
+
+def run_suite(problem_types=None, network_types=None, symmetries=None, congestion_levels=None,
+              num_instances=5, repeats=3, warmup=1, seed=0, time_limit=None, data_dir="data",
+              verbose=False):
+    """Time build, solve and extraction of the problems over the paper's datasets
+
+    Each case, i.e. a (network type, instance, symmetry, congestion level, problem type)
+    combination, is run warmup times without being measured and then repeats times. Agents
+    are generated with a seed derived from seed and from the case, so runs are reproducible.
+    As in the paper, the number of agents is the number of rows of the grid times the
+    congestion level
+
+    Args:
+        problem_types (list): the problems to run. By default SUITE_PROBLEM_TYPES
+        network_types (list): the grid sizes, e.g. "6x6". By default SUITE_NETWORK_TYPES
+        symmetries (list): the symmetry levels of the agents. By default SUITE_SYMMETRIES
+        congestion_levels (list): the congestion levels. By default SUITE_CONGESTION_LEVELS
+        num_instances (int): number of instances of each dataset to use (default is 5)
+        repeats (int): number of measured runs of each case (default is 3)
+        warmup (int): number of unmeasured runs of each case (default is 1)
+        seed (int): base seed for the generation of agents (default is 0)
+        time_limit (float): time limit (s) for each solve. By default there is no limit
+        data_dir (str): the directory of the datasets (default is "data")
+        verbose (bool): if True, print each case as it is run
+
+    Returns:
+        dict: a JSON serializable dict with the configuration of the suite ("config"), the
+          environment ("environment") and a list of records ("cases"), one per case, with its
+          description, the times (s) of each phase of each run ("build_times", "solve_times",
+          "extract_times"), their medians ("build_time", "solve_time", "extract_time"), the
+          final status, the objectives and the agents' distances of the last run
+    """
+
+    config = {"problem_types": problem_types or SUITE_PROBLEM_TYPES,
+              "network_types": network_types or SUITE_NETWORK_TYPES,
+              "symmetries": symmetries or SUITE_SYMMETRIES,
+              "congestion_levels": [float(level) for level in congestion_levels or SUITE_CONGESTION_LEVELS],
+              "num_instances": num_instances,
+              "repeats": repeats,
+              "warmup": warmup,
+              "seed": seed,
+              "time_limit": time_limit}
+
+    cases = []
+    for network_type in config["network_types"]:
+        networks_df = file_reader.read_networks_csv(_network_filename(data_dir, network_type),
+                                                    along="cols").head(num_instances)
+        network_shape = [int(size) for size in network_type.split("x")]
+        nodes = data_generator.get_nodes(networks_df)
+
+        for it_i, w_arcs in enumerate(data_generator.network_instances(networks_df)):
+            for symmetry in config["symmetries"]:
+                for congestion_level in config["congestion_levels"]:
+                    num_of_agents = int(network_shape[0] * congestion_level)
+                    # the same level gives the same agents, whether it is given as 1 or 1.0
+                    case_seed = f"{seed}-{network_type}-{it_i}-{symmetry}-{congestion_level:g}"
+                    agents = data_generator.generate_agents(network_shape, num_of_agents,
+                                                            symmetry=symmetry, seed=case_seed)
+
+                    for problem_type in config["problem_types"]:
+                        if verbose:
+                            print(f"{network_type} it{it_i} {symmetry} {congestion_level} {problem_type}")
+
+                        for _ in range(warmup):
+                            _run_case(problem_type, nodes, w_arcs, agents, time_limit)
+                        runs = [_run_case(problem_type, nodes, w_arcs, agents, time_limit)
+                                for _ in range(repeats)]
+
+                        case = {"network_type": network_type,
+                                "instance": it_i,
+                                "symmetry": symmetry,
+                                "congestion_level": congestion_level,
+                                "num_agents": num_of_agents,
+                                "problem_type": problem_type,
+                                "status": runs[-1]["status"],
+                                "objectives": runs[-1]["objectives"],
+                                "agents_distances": runs[-1]["agents_distances"]}
+                        for phase in ["build", "solve", "extract"]:
+                            times = [run[f"{phase}_time"] for run in runs]
+                            case[f"{phase}_times"] = times
+                            case[f"{phase}_time"] = float(np.median(times))
+                        cases.append(case)
+
+    environment = {"python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "numpy": np.__version__}
+
+    return {"config": config, "environment": environment, "cases": cases}
+
+
+def _case_key(case):
+    """Gives the identifier of a case of the suite"""
+
+    return (case["network_type"], case["instance"], case["symmetry"],
+            case["congestion_level"], case["problem_type"])
+
+
+def compare_to_baseline(results, baseline, tolerance=0.25, min_time=0.05):
+    """Find the cases of a suite's run that are slower than a baseline run, or disagree with it
+
+    Args:
+        results (dict): the results of run_suite()
+        baseline (dict): the results of a previous run_suite(), with the same configuration
+        tolerance (float): relative slowdown of a phase's median time considered a regression (default is 0.25)
+        min_time (float): phases faster than this (s) in both runs are ignored, being too
+          noisy (default is 0.05)
+
+    Returns:
+        list: a list with a dict for each regression, with the case, the phase ("build",
+          "solve", "extract" or "objectives", if both runs are optimal but disagree) and the
+          baseline's and the new values
+    """
+
+    baseline_cases = {_case_key(case): case for case in baseline["cases"]}
+
+    regressions = []
+    for case in results["cases"]:
+        baseline_case = baseline_cases.get(_case_key(case))
+        if baseline_case is None:
+            continue
+
+        for phase in ["build", "solve", "extract"]:
+            old_time, new_time = baseline_case[f"{phase}_time"], case[f"{phase}_time"]
+            if max(old_time, new_time) >= min_time and new_time > old_time * (1 + tolerance):
+                regressions.append({"case": _case_key(case), "phase": phase,
+                                    "baseline": old_time, "new": new_time})
+
+        same_objectives = (len(case["objectives"]) == len(baseline_case["objectives"])
+                           and np.allclose(case["objectives"], baseline_case["objectives"], atol=1e-6))
+        if case["status"] == baseline_case["status"] == GRB.OPTIMAL and not same_objectives:
+            regressions.append({"case": _case_key(case), "phase": "objectives",
+                                "baseline": baseline_case["objectives"], "new": case["objectives"]})
+
+    return regressions
+
+
+def save_results(results, filename):
+    """Save the results of run_suite() as JSON"""
+
+    with open(filename, "w") as results_file:
+        json.dump(results, results_file, indent=1)
+
+
+def load_results(filename):
+    """Load the results of run_suite() saved as JSON"""
+
+    with open(filename) as results_file:
+        return json.load(results_file)
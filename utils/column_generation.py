@@ -0,0 +1,301 @@
+"""Module that contains a path-based column generation solver of MSPP-PDs, with price-and-branch and a bound on its gap"""
+from . import time
+from . import np
+from . import gb
+from . import GRB
+from . import heuristics
+from . import lagrangian
+
+
+_REDUCED_COST_TOL = 1e-9
+
+
+def _penalty_cuts(kind, num_agents):
+    """Compute the lines whose maximum is the lower convex envelope of the penalty of an element
+
+    The penalty of the number of agents using an element is convex for the linear and
+    quadratic kinds, so the envelope matches it at every integer number of agents. For the
+    binary kind the envelope is (n - 1) / (num_agents - 1), as the paper's constraints (7,12)
+
+    Args:
+        kind (str): how the penalty grows, "binary", "linear" or "quadratic"
+        num_agents (int): number of agents
+
+    Returns:
+        tuple: a tuple (slopes, intercepts) of the lines with positive slope
+    """
+
+    table = lagrangian._penalty_table(kind, num_agents)
+
+    # lower convex hull of the points (n, table[n]), from left to right
+    hull = [0]
+    for count in range(1, num_agents + 1):
+        while len(hull) >= 2:
+            first, second = hull[-2], hull[-1]
+            if ((table[second] - table[first]) * (count - first)
+                    >= (table[count] - table[first]) * (second - first)):
+                hull.pop()
+            else:
+                break
+        hull.append(count)
+
+    starts, ends = np.array(hull[:-1]), np.array(hull[1:])
+    slopes = (table[ends] - table[starts]) / (ends - starts)
+    intercepts = table[starts] - slopes * starts
+    positive = slopes > 0
+
+    return slopes[positive], intercepts[positive]
+
+
+class _PathMaster:
+    """Class to represent the restricted master problem, with a column for each agent's path
+
+    Attributes:
+        model (gb.Model): the master problem, minimizing the distance of the chosen paths plus
+          the penalty Phi of each element
+        paths (list): for each agent, the list of the positions of the arcs of its paths
+        columns (list): for each agent, the list of the gb.Var choosing its paths
+    """
+
+    def __init__(self, element, kind, num_elements, num_agents, env=None):
+        """Initialize the instance, with no path
+
+        Args:
+            element (str): the penalized element, "arc", "node" or None
+            kind (str): how the penalty grows, "binary", "linear" or "quadratic"
+            num_elements (int): number of arcs or nodes
+            num_agents (int): number of agents
+            env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+        """
+
+        self.element = element
+        self.kind = kind
+        self.model = gb.Model(env=env)
+        self.model.setParam("OutputFlag", 0)
+
+        # a path for each agent
+        self.convexity = [self.model.addConstr(gb.LinExpr() == 1) for _ in range(num_agents)]
+
+        # Phi_e >= slope * (agents using e) + intercept, for each line of the penalty's envelope
+        self.slopes, self.intercepts = (np.empty(0), np.empty(0)) if element is None else _penalty_cuts(kind, num_agents)
+        self.Phi = self.model.addVars(num_elements if len(self.slopes) else 0, obj=1.0, name="Phi")
+        self.cuts = [[self.model.addConstr(self.Phi[e] >= intercept) for intercept in self.intercepts]
+                     for e in range(len(self.Phi))]
+        self._flat_cuts = [cut for element_cuts in self.cuts for cut in element_cuts]
+        self._num_elements = num_elements
+
+        self.paths = [[] for _ in range(num_agents)]
+        self.columns = [[] for _ in range(num_agents)]
+        self._known_paths = [set() for _ in range(num_agents)]
+
+    def add_path(self, agent_pos, path, cost, used_elements):
+        """Add the column of a path, unless the agent already has it
+
+        Args:
+            agent_pos (int): position of the agent
+            path (np.ndarray): the positions of the arcs of the path
+            cost (float): the distance of the path
+            used_elements (np.ndarray): the arcs or nodes used by the path
+
+        Returns:
+            bool: True if the column is new
+        """
+
+        key = tuple(sorted(path.tolist()))
+        if key in self._known_paths[agent_pos]:
+            return False
+        self._known_paths[agent_pos].add(key)
+
+        constrs, coeffs = [self.convexity[agent_pos]], [1.0]
+        for e in used_elements if len(self.Phi) else []:
+            constrs.extend(self.cuts[e])
+            coeffs.extend(-self.slopes)
+        var = self.model.addVar(obj=cost, column=gb.Column(coeffs, constrs))
+
+        self.paths[agent_pos].append(np.asarray(path))
+        self.columns[agent_pos].append(var)
+
+        return True
+
+    def prices(self):
+        """Gives the duals of the convexity constraints and the price of using each element
+
+        Returns:
+            tuple: a tuple (convexity_duals, element_prices)
+        """
+
+        convexity_duals = np.array(self.model.getAttr("Pi", self.convexity))
+        if not self._flat_cuts:
+            return convexity_duals, np.zeros(self._num_elements)
+
+        cut_duals = np.array(self.model.getAttr("Pi", self._flat_cuts)).reshape(len(self.cuts), len(self.slopes))
+
+        return convexity_duals, cut_duals @ self.slopes
+
+    def set_integer(self):
+        """Turn the relaxation into the integer master over the columns generated so far
+
+        The first path of each agent is the start of the integer master
+        """
+
+        for agent_columns in self.columns:
+            self.model.setAttr("VType", agent_columns, [GRB.BINARY] * len(agent_columns))
+            self.model.setAttr("Start", agent_columns, [1.0] + [0.0] * (len(agent_columns) - 1))
+        if self.kind == "binary":
+            self.model.setAttr("VType", list(self.Phi.values()), [GRB.BINARY] * len(self.Phi))
+
+    def chosen_paths(self):
+        """Gives the path chosen for each agent by the current solution, the one with the largest value"""
+
+        return [agent_paths[int(np.argmax(self.model.getAttr("X", agent_columns)))]
+                for agent_paths, agent_columns in zip(self.paths, self.columns)]
+
+
+def _padded(paths, num_arcs):
+    """Stack paths of different lengths into a matrix, padded with -1"""
+
+    padded = np.full((len(paths), num_arcs), -1)
+    for agent_pos, path in enumerate(paths):
+        padded[agent_pos, :len(path)] = path
+
+    return padded
+
+
+def _x_to_paths(x, arc_idxs, agent_idxs):
+    """Convert a matrix with the same meaning of X.x into the positions of the arcs of each agent's path, padded with -1"""
+
+    return _padded([np.flatnonzero(x[arc_idxs, agent_idx]) for agent_idx in agent_idxs], len(arc_idxs))
+
+
+def _add_paths(master, paths, agent_positions, weights, heads, sources, termini):
+    """Add to the master the paths of some agents, as arcs' positions padded with -1
+
+    Returns:
+        int: the number of new columns
+    """
+
+    num_new = 0
+    for agent_pos in agent_positions:
+        path = paths[agent_pos][paths[agent_pos] >= 0]
+        if master.element == "node":
+            # an agent traverses the heads of its arcs and its source, unless it does not move
+            used_elements = heads[path]
+            if sources[agent_pos] != termini[agent_pos]:
+                used_elements = np.append(used_elements, sources[agent_pos])
+        else:
+            used_elements = path
+        num_new += master.add_path(agent_pos, path, weights[path].sum(), used_elements)
+
+    return num_new
+
+
+def solve_column_generation(problem_type, nodes, w_arcs, agents, max_iterations=100, time_limit=None,
+                            mip_time_limit=None, gap_tol=1e-4, env=None):
+    """Solve a MSPP-PD by column generation over the agents' paths, then price-and-branch
+
+    The master problem chooses a path for each agent among the generated ones and pays the
+    penalty of each arc or node through the lower convex envelope of its penalty, so its
+    relaxation is a lower bound of the optimal objective (distance + penalty, as the blended
+    objectives of problem_model.set_problem()). The duals of the relaxation price the use of
+    each element, and the paths with negative reduced cost are found by a shortest path for
+    each agent with weights increased by the prices, as in lagrangian.solve_lagrangian().
+    The master starts with the paths of heuristics.prioritized_planning() and the shortest
+    paths. When no path has negative reduced cost, or the limits are reached, the master is
+    solved with integer variables over the generated paths, giving an upper bound
+
+    Args:
+        problem_type (str): the problem to solve. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        max_iterations (int): maximum number of pricing iterations (default is 100)
+        time_limit (float): time limit (s) of the column generation. By default there is no limit
+        mip_time_limit (float): time limit (s) of the integer master. By default there is no limit
+        gap_tol (float): relative gap between the bounds at which the pricing stops (default is 1e-4)
+        env (gb.Env): the environment where the master is created. By default it is Gurobi's default one
+
+    Returns:
+        dict: a dict with:
+          - "x": a (len(w_arcs), len(agents)) matrix with the best paths found, as X.x
+          - "objectives": their objectives, as the ones of problem_model.evaluate_pb_objectives()
+          - "lower_bound", "upper_bound": the bounds on the optimal blended objective
+          - "gap": the relative gap between the bounds, (upper - lower) / upper
+          - "relaxation": the objective of the last relaxation of the master
+          - "num_columns": the number of paths generated
+          - "iterations": the number of pricing iterations
+          - "runtime": the time (s) spent
+    """
+
+    start = time.perf_counter()
+
+    arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+    tails = np.array([arc.i for arc in arcs], dtype=int)
+    heads = np.array([arc.j for arc in arcs], dtype=int)
+    weights = np.array([arc.w for arc in arcs], dtype=float)
+    arc_idxs = np.array([arc.idx for arc in arcs], dtype=int)
+
+    agent_idxs = np.array([agent.idx for agent in agents], dtype=int)
+    sources = np.array([agent.source for agent in agents], dtype=int)
+    termini = np.array([agent.terminus for agent in agents], dtype=int)
+    num_nodes = len(nodes)
+
+    element, kind = heuristics._PENALTIES[problem_type]
+    num_elements = len(arcs) if element == "arc" else num_nodes
+    master = _PathMaster(element, kind, num_elements, len(agents), env)
+
+    # initial columns: a feasible solution, that is the start of the integer master, and the shortest paths
+    x = heuristics.prioritized_planning(problem_type, nodes, w_arcs, agents)
+    every_agent = range(len(agents))
+    _add_paths(master, _x_to_paths(x, arc_idxs, agent_idxs), every_agent, weights, heads, sources, termini)
+    _, paths = lagrangian._priced_paths(num_nodes, tails, heads, weights, sources, termini)
+    _add_paths(master, paths, every_agent, weights, heads, sources, termini)
+
+    lower_bound, relaxation, iterations = -np.inf, np.inf, 0
+    for iterations in range(1, max_iterations + 1):
+        master.model.optimize()
+        relaxation = master.model.ObjVal
+        convexity_duals, prices = master.prices()
+
+        # pricing: a shortest path for each agent with the elements' prices
+        priced_weights = weights.copy()
+        if element == "arc":
+            priced_weights += prices
+        elif element == "node":
+            priced_weights += prices[heads]
+        costs, paths = lagrangian._priced_paths(num_nodes, tails, heads, priced_weights, sources, termini)
+        if element == "node":
+            costs = costs + np.where(sources != termini, prices[sources], 0)
+        reduced_costs = costs - convexity_duals
+
+        # each agent chooses a single path, so the relaxation can not improve by more than this
+        lower_bound = max(lower_bound, relaxation + np.minimum(reduced_costs, 0).sum())
+
+        negative = reduced_costs < -_REDUCED_COST_TOL
+        if not negative.any() or relaxation - lower_bound <= gap_tol * abs(relaxation):
+            break
+        if time_limit is not None and time.perf_counter() - start >= time_limit:
+            break
+
+        # paths already in the master, due to tolerances, would not change the relaxation
+        if _add_paths(master, paths, np.flatnonzero(negative), weights, heads, sources, termini) == 0:
+            break
+
+    # price-and-branch: the integer master over the generated paths
+    master.set_integer()
+    if mip_time_limit is not None:
+        master.model.Params.TimeLimit = mip_time_limit
+    master.model.optimize()
+
+    x = lagrangian._paths_to_x(_padded(master.chosen_paths(), len(arcs)), arc_idxs, agent_idxs)
+    objectives = heuristics.evaluate_paths(problem_type, x, nodes, w_arcs, agents)
+    upper_bound = sum(objectives)
+
+    return {"x": x,
+            "objectives": objectives,
+            "lower_bound": float(lower_bound),
+            "upper_bound": float(upper_bound),
+            "gap": max(float((upper_bound - lower_bound) / abs(upper_bound)), 0.0) if upper_bound else 0.0,
+            "relaxation": float(relaxation),
+            "num_columns": sum(len(agent_paths) for agent_paths in master.paths),
+            "iterations": iterations,
+            "runtime": time.perf_counter() - start}
@@ -1,6 +1,9 @@
 """ Module that contains classes and functions to store and generate variables used for the MSPP and MSPP-PD problems formulation"""
 from . import random
 from . import itertools
+from . import np
+from . import pd
+from . import shortest_paths
 
 
 class WArc:
@@ -13,6 +16,8 @@ class WArc:
         idx (int): Unique identifier of the arc within the network
     """
 
+    __slots__ = ("i", "j", "w", "idx")
+
     def __init__(self, begin, end, weight, index):
         """Initialize the instance based on the informations about the arc
 
@@ -43,6 +48,8 @@ class Agent:
         index (int): Unique identifier of the agent within the network
     """
 
+    __slots__ = ("source", "terminus", "idx", "path")
+
     def __init__(self, source, terminus, index):
         """Initialize the instance based on the informations about the agent
 
@@ -63,21 +70,183 @@ class Agent:
         return f"{self.__class__.__name__}({self.source!r}, {self.terminus!r}, {self.idx!r})"
 
 
+class Commodity:
+    """Class to represent a group of agents sharing source and terminus, routed as a single flow
+
+    Attributes:
+        source (int): Integer representing the agents' starting node
+        terminus (int): Integer representing the agents' terminus node
+        agents (list): the agents of the group
+        multiplicity (int): number of agents of the group
+        index (int): Unique identifier of the commodity
+    """
+
+    __slots__ = ("source", "terminus", "agents", "multiplicity", "idx")
+
+    def __init__(self, source, terminus, agents, index):
+        """Initialize the instance based on the informations about the agents
+
+        Args:
+            source (int): the source node
+            terminus (int): the terminus node
+            agents (list): the agents of the group
+            index (int): its identifier
+        """
+
+        self.source = source
+        self.terminus = terminus
+        self.agents = agents
+        self.multiplicity = len(agents)
+        self.idx = index
+
+    def __repr__(self):
+        """Return the representation of the commodity instance"""
+
+        return f"{self.__class__.__name__}({self.source!r}, {self.terminus!r}, multiplicity={self.multiplicity!r}, {self.idx!r})"
+
+
+def group_agents(agents):
+    """Group agents with the same source and terminus into commodities
+
+    Agents of the same commodity are interchangeable, so routing their number along the network
+    instead of each of them removes the symmetric solutions of the problems
+
+    Args:
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        list: a list of Commodity, ordered by first appearance of their (source, terminus) in agents
+    """
+
+    groups = {}
+    for agent in agents:
+        groups.setdefault((agent.source, agent.terminus), []).append(agent)
+
+    return [Commodity(source, terminus, group, idx)
+            for idx, ((source, terminus), group) in enumerate(groups.items())]
+
+
+class Network:
+    """Class to represent the topology shared by network instances, as arrays
+
+    Arcs are identified by their position, i.e. their idx
+
+    Attributes:
+        tails (np.ndarray): int32 array with the starting node of each arc
+        heads (np.ndarray): int32 array with the ending node of each arc
+        num_nodes (int): number of nodes, labeled from 0
+        out_indptr (np.ndarray): the arcs leaving node n are out_arcs[out_indptr[n]:out_indptr[n+1]]
+        out_arcs (np.ndarray): the arcs sorted by starting node
+        in_indptr (np.ndarray): the arcs entering node n are in_arcs[in_indptr[n]:in_indptr[n+1]]
+        in_arcs (np.ndarray): the arcs sorted by ending node
+    """
+
+    __slots__ = ("tails", "heads", "num_nodes", "out_indptr", "out_arcs", "in_indptr", "in_arcs")
+
+    def __init__(self, tails, heads, num_nodes=None):
+        """Initialize the instance building the adjacency of the nodes
+
+        Args:
+            tails (np.ndarray): the starting node of each arc
+            heads (np.ndarray): the ending node of each arc
+            num_nodes (int): number of nodes. By default it is the largest node plus one
+        """
+
+        self.tails = np.asarray(tails, dtype=np.int32)
+        self.heads = np.asarray(heads, dtype=np.int32)
+        if num_nodes is None:
+            num_nodes = int(max(self.tails.max(), self.heads.max())) + 1
+        self.num_nodes = num_nodes
+
+        self.out_arcs = np.argsort(self.tails, kind="stable").astype(np.int32)
+        self.out_indptr = np.searchsorted(self.tails[self.out_arcs], np.arange(num_nodes + 1))
+        self.in_arcs = np.argsort(self.heads, kind="stable").astype(np.int32)
+        self.in_indptr = np.searchsorted(self.heads[self.in_arcs], np.arange(num_nodes + 1))
+
+    def __repr__(self):
+        """Return the representation of the network instance"""
+
+        return f"{self.__class__.__name__}(num_nodes={self.num_nodes!r}, num_arcs={len(self.tails)!r})"
+
+    def out_arcs_of(self, node):
+        """Gives the positions of the arcs leaving a node"""
+
+        return self.out_arcs[self.out_indptr[node]:self.out_indptr[node + 1]]
+
+    def in_arcs_of(self, node):
+        """Gives the positions of the arcs entering a node"""
+
+        return self.in_arcs[self.in_indptr[node]:self.in_indptr[node + 1]]
+
+
+class NetworkInstance:
+    """Class to represent a network instance as the weights of the arcs of a Network
+
+    It behaves as the list of its weighted arcs, ordered by idx, so it can be passed wherever
+    a list of WArc is expected. The WArc are created only when accessed
+
+    Attributes:
+        network (Network): the topology of the instance
+        weights (np.ndarray): float64 array with the weight of each arc
+    """
+
+    __slots__ = ("network", "weights")
+
+    def __init__(self, network, weights):
+        """Initialize the instance based on its topology and weights
+
+        Args:
+            network (Network): the topology of the instance
+            weights (np.ndarray): the weight of each arc, not copied if already float64
+        """
+
+        self.network = network
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    def __repr__(self):
+        """Return the representation of the network instance"""
+
+        return f"{self.__class__.__name__}({self.network!r})"
+
+    def __len__(self):
+        """Return the number of arcs"""
+
+        return len(self.weights)
+
+    def __getitem__(self, idx):
+        """Return the weighted arc with the given idx"""
+
+        if idx < 0:
+            idx += len(self)
+        return WArc(int(self.network.tails[idx]), int(self.network.heads[idx]), float(self.weights[idx]), idx)
+
+    def __iter__(self):
+        """Iterate over the weighted arcs, ordered by idx"""
+
+        tails, heads, weights = self.network.tails.tolist(), self.network.heads.tolist(), self.weights.tolist()
+        for idx in range(len(weights)):
+            yield WArc(tails[idx], heads[idx], weights[idx], idx)
+
+
 def network_instances(networks_df):
     """Generator that gives one by one the network instances in the passed dataframe
 
-    Note that a network instance, for us, is completely defined by the set of all its weighted arcs 
+    Note that a network instance, for us, is completely defined by the set of all its weighted arcs.
+    The instances share a single Network and their weights are rows of a single array
 
     Args:
         networks_df (pd.Dataframe): pandas dataframe containing one or more network instances
 
     Yields:
-        list: a list containing all the weighted arcs of a network instance
+        NetworkInstance: the weighted arcs of a network instance
     """
 
-    for it in networks_df.index:  # each network instance...
-        yield [WArc(i, j, networks_df.loc[it, (i, j)], idx)
-               for idx, (i, j) in enumerate(networks_df.columns)]  # ... is formed by a set of arcs
+    network = Network(networks_df.columns.get_level_values(0),
+                      networks_df.columns.get_level_values(1))
+    weights = networks_df.to_numpy(dtype=np.float64)
+
+    for it_weights in weights:  # each network instance is formed by a set of arcs
+        yield NetworkInstance(network, it_weights)
 
 
 def get_nodes(networks_df):
@@ -96,7 +265,203 @@ def get_nodes(networks_df):
     return [i for i in starting_nodes.union(ending_nodes).unique()]
 
 
-def _generate_agents_with_high_simmetry(network_shape, num_of_agents):
+def dag_shortest_paths(networks_df, sources=None):
+    """Compute at once the shortest paths of all the network instances in the passed dataframe
+
+    The grid-like networks of the paper are acyclic, so the shortest paths of every instance
+    are computed together, relaxing the arcs one layer at a time over all the instances
+
+    Args:
+        networks_df (pd.Dataframe): pandas dataframe containing one or more acyclic network instances
+        sources (list): nodes from which shortest paths start. By default all the nodes
+
+    Returns:
+        tuple: a tuple (distances, predecessor_arcs) of np.ndarray with shape
+          (num_of_instances, len(sources), num_of_nodes) where:
+          - distances contains the shortest distance of each node from each source (inf if unreachable)
+          - predecessor_arcs contains the idx of the arc through which each node is reached along
+            a shortest path (-1 for the sources and unreachable nodes)
+    """
+
+    nodes = get_nodes(networks_df)
+    if sources is None:
+        sources = nodes
+
+    tails = np.asarray(networks_df.columns.get_level_values(0), dtype=int)
+    heads = np.asarray(networks_df.columns.get_level_values(1), dtype=int)
+
+    return shortest_paths.dag_shortest_path_trees(len(nodes), tails, heads,
+                                                  networks_df.to_numpy(dtype=float),
+                                                  np.asarray(sources, dtype=int))
+
+
+def _grid_weights(rng, weights, num_of_instances, num_of_arcs, low, high):
+    """Draw the random weights of the arcs of many network instances
+
+    Args:
+        rng (np.random.Generator): the random number generator
+        weights (str or function): the distribution of the weights. "integers" for integers
+          uniformly drawn in [low, high], "uniform" for reals uniformly drawn in [low, high), or a
+          function called as weights(rng, size) that returns an array of the given size
+        num_of_instances (int): number of network instances
+        num_of_arcs (int): number of arcs of each instance
+        low (float): the lowest weight
+        high (float): the highest weight
+
+    Returns:
+        np.ndarray: a float64 (num_of_instances, num_of_arcs) matrix of weights
+    """
+
+    size = (num_of_instances, num_of_arcs)
+
+    if callable(weights):
+        return np.asarray(weights(rng, size), dtype=np.float64)
+    elif weights == "integers":
+        return rng.integers(low, high, size=size, endpoint=True).astype(np.float64)
+    elif weights == "uniform":
+        return rng.uniform(low, high, size=size)
+
+    raise ValueError(f"Unknown weights' distribution {weights!r}")
+
+
+def _congested_center(rows, cols, num_of_rows, num_of_cols, peak):
+    """Compute the congestion of some locations of a grid, a gaussian bell centered on the grid
+
+    It is the weighting of the facility example of extra.ipynb, without the unit base weight
+
+    Args:
+        rows (np.ndarray): vertical location of each point on the grid
+        cols (np.ndarray): horizontal location of each point on the grid
+        num_of_rows (int): number of rows of the grid
+        num_of_cols (int): number of columns of the grid
+        peak (float): the congestion at the center of the grid
+
+    Returns:
+        np.ndarray: the congestion of each location
+    """
+
+    rows_term = (rows - (num_of_rows - 1) / 2)**2 / (2 * max((num_of_rows - 1) / 6, 1e-12)**2)
+    cols_term = (cols - (num_of_cols - 1) / 2)**2 / (2 * max((num_of_cols - 1) / 6, 1e-12)**2)
+
+    return peak * np.exp(-(rows_term + cols_term))
+
+
+def _grid_networks_df(tails, heads, weights):
+    """Gives the dataframe of network instances sharing the given arcs
+
+    Args:
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): a (num_of_instances, num_of_arcs) matrix of weights
+
+    Returns:
+        pd.Dataframe: a pandas dataframe containing network instances along rows and networks' arcs
+          along columns, as the one returned by file_reader.read_networks_csv()
+    """
+
+    arcs = pd.MultiIndex.from_arrays([tails, heads])
+    instances = pd.Index([f"it{it + 1}" for it in range(len(weights))], dtype=object)
+
+    return pd.DataFrame(weights, index=instances, columns=arcs, copy=False)
+
+
+def generate_layered_grid_networks(network_shape, num_of_instances=1, *, weights="integers", low=1, high=3,
+                                   congestion_peak=0.0, seed=None):
+    """Generates instances of a grid-like acyclic network, as the ones of the paper
+
+    Nodes are numbered along the columns of the grid, as in the paper's data, and each node is
+    linked to the (up to) 3 nearest nodes of the next column
+
+    Args:
+        network_shape (tuple): (m,n) shape of the grid-like network. Where m is the number of rows
+          and n is the number of columns of the network
+        num_of_instances (int): number of network instances to generate (default is 1)
+        weights (str or function): the distribution of the arcs' weights, see _grid_weights()
+          (default is "integers")
+        low (float): the lowest weight (default is 1)
+        high (float): the highest weight (default is 3)
+        congestion_peak (float): weight added to the arcs at the center of the grid and
+          decreasing as a gaussian bell moving away from it (default is 0)
+        seed (int): seed of the random number generator. By default it is not reproducible
+
+    Returns:
+        pd.Dataframe: a pandas dataframe containing network instances along rows and networks' arcs
+          along columns, as the one returned by file_reader.read_networks_csv()
+    """
+
+    num_of_rows, num_of_cols = network_shape
+
+    # candidate arcs from each node of each column but the last, towards the row above, the same row and the row below
+    cols, rows, shifts = np.meshgrid(np.arange(num_of_cols - 1), np.arange(num_of_rows), np.arange(-1, 2),
+                                     indexing="ij")
+    is_arc = (rows + shifts >= 0) & (rows + shifts < num_of_rows)
+    cols, rows, shifts = cols[is_arc], rows[is_arc], shifts[is_arc]
+
+    tails = cols * num_of_rows + rows
+    heads = (cols + 1) * num_of_rows + rows + shifts
+
+    rng = np.random.default_rng(seed)
+    arc_weights = _grid_weights(rng, weights, num_of_instances, len(tails), low, high)
+    if congestion_peak:
+        arc_weights += _congested_center(rows + shifts / 2, cols + 1 / 2, num_of_rows, num_of_cols,
+                                         congestion_peak)
+
+    return _grid_networks_df(tails, heads, arc_weights)
+
+
+def generate_facility_grid_networks(network_shape, num_of_instances=1, *, weights="integers", low=1, high=3,
+                                    congestion_peak=0.0, seed=None):
+    """Generates instances of a facility's network, a grid of bidirectional tracks
+
+    It is the network of the facility example of extra.ipynb: nodes, numbered along the
+    columns, are the crossroads of the tracks and each one is linked in both directions to
+    its horizontal and vertical neighbours. The weighting of that example is obtained with
+    weights="uniform", low=high=1 and congestion_peak=1.5
+
+    Args:
+        network_shape (tuple): (m,n) shape of the grid. Where m is the number of horizontal tracks
+          (rows) and n is the number of vertical tracks (columns)
+        num_of_instances (int): number of network instances to generate (default is 1)
+        weights (str or function): the distribution of the arcs' weights, see _grid_weights()
+          (default is "integers")
+        low (float): the lowest weight (default is 1)
+        high (float): the highest weight (default is 3)
+        congestion_peak (float): weight added to the arcs at the center of the grid and
+          decreasing as a gaussian bell moving away from it (default is 0)
+        seed (int): seed of the random number generator. By default it is not reproducible
+
+    Returns:
+        pd.Dataframe: a pandas dataframe containing network instances along rows and networks' arcs
+          along columns, as the one returned by file_reader.read_networks_csv()
+    """
+
+    num_of_rows, num_of_cols = network_shape
+
+    # the location of an arc is exactly in between the 2 nodes that it connects
+    horizontal_cols, horizontal_rows = (grid.ravel() for grid in np.meshgrid(np.arange(num_of_cols - 1),
+                                                                             np.arange(num_of_rows),
+                                                                             indexing="ij"))
+    vertical_cols, vertical_rows = (grid.ravel() for grid in np.meshgrid(np.arange(num_of_cols),
+                                                                         np.arange(num_of_rows - 1),
+                                                                         indexing="ij"))
+    west_nodes = horizontal_cols * num_of_rows + horizontal_rows
+    north_nodes = vertical_cols * num_of_rows + vertical_rows
+
+    # west to east, east to west, north to south and south to north arcs
+    tails = np.concatenate([west_nodes, west_nodes + num_of_rows, north_nodes, north_nodes + 1])
+    heads = np.concatenate([west_nodes + num_of_rows, west_nodes, north_nodes + 1, north_nodes])
+    arc_rows = np.concatenate([horizontal_rows, horizontal_rows, vertical_rows + 1 / 2, vertical_rows + 1 / 2])
+    arc_cols = np.concatenate([horizontal_cols + 1 / 2, horizontal_cols + 1 / 2, vertical_cols, vertical_cols])
+
+    rng = np.random.default_rng(seed)
+    arc_weights = _grid_weights(rng, weights, num_of_instances, len(tails), low, high)
+    if congestion_peak:
+        arc_weights += _congested_center(arc_rows, arc_cols, num_of_rows, num_of_cols, congestion_peak)
+
+    return _grid_networks_df(tails, heads, arc_weights)
+
+
+def _generate_agents_with_high_simmetry(network_shape, num_of_agents, rng=random):
     """Generates a number of agents having same source and terminus nodes within the network
 
     Note that source and terminus nodes are selected randomly from the first and the last columns of
@@ -106,6 +471,7 @@ def _generate_agents_with_high_simmetry(network_shape, num_of_agents):
         network_shape (tuple): (m,n) shape of a grid-like network. Where m is the number of rows
           and n is the number of columns of the network
         num_of_agents (int): number of agents to generate
+        rng (random.Random): the random number generator (default is the random module's one)
 
     Returns:
         list: a list containing the generated agents
@@ -117,8 +483,8 @@ def _generate_agents_with_high_simmetry(network_shape, num_of_agents):
     last_network_column = [node + num_of_network_nodes - num_of_network_rows
                            for node in first_network_column]
     agent_idxs = list(range(num_of_agents))
-    source_node = random.choice(first_network_column)
-    terminus_node = random.choice(last_network_column)
+    source_node = rng.choice(first_network_column)
+    terminus_node = rng.choice(last_network_column)
 
     return [Agent(source_node,
                   terminus_node,
@@ -161,7 +527,7 @@ def _generate_agents_as_in_paper(network_shape, num_of_agents):
     return agents
 
 
-def _generate_agents_with_low_simmetry(network_shape, num_of_agents):
+def _generate_agents_with_low_simmetry(network_shape, num_of_agents, rng=random):
     """Generates a number of agents having random source and terminus nodes within the network
 
     Note that source and terminus nodes are selected randomly from the first and the last columns of
@@ -172,6 +538,7 @@ def _generate_agents_with_low_simmetry(network_shape, num_of_agents):
         network_shape (tuple): (m,n) shape of a grid-like network. Where m is the number of rows
           and n is the number of columns of the network
         num_of_agents (int): number of agents to generate
+        rng (random.Random): the random number generator (default is the random module's one)
 
     Returns:
         list: a list containing the generated agents
@@ -185,12 +552,12 @@ def _generate_agents_with_low_simmetry(network_shape, num_of_agents):
 
     agent_idxs = list(range(num_of_agents))
 
-    return [Agent(random.choice(first_network_column),
-                  random.choice(last_network_column),
+    return [Agent(rng.choice(first_network_column),
+                  rng.choice(last_network_column),
                   idx) for idx in agent_idxs]
 
 
-def generate_agents(network_shape, num_of_agents, *, symmetry="medium"):
+def generate_agents(network_shape, num_of_agents, *, symmetry="medium", seed=None):
     """Generates a number of agents with a specified level of simmetry
 
     Args:
@@ -199,6 +566,8 @@ def generate_agents(network_shape, num_of_agents, *, symmetry="medium"):
         num_of_agents (int): number of agents to generate
         symmetry (str): value used to specify the desired level of symmetry that generated agents
           should have (default is "medium")
+        seed (int or str): seed of a private random number generator, to get the same agents at each
+          call. By default the random module's generator is used
 
     Returns:
         list: a list containing the generated agents
@@ -206,9 +575,11 @@ def generate_agents(network_shape, num_of_agents, *, symmetry="medium"):
 
     # * Notice that agents are not sorted by idx
 
+    rng = random if seed is None else random.Random(seed)
+
     if symmetry == "high":
 
-        return _generate_agents_with_high_simmetry(network_shape, num_of_agents)
+        return _generate_agents_with_high_simmetry(network_shape, num_of_agents, rng)
 
     elif symmetry == "medium":
 
@@ -216,4 +587,4 @@ def generate_agents(network_shape, num_of_agents, *, symmetry="medium"):
 
     elif symmetry == "low":
 
-        return _generate_agents_with_low_simmetry(network_shape, num_of_agents)
+        return _generate_agents_with_low_simmetry(network_shape, num_of_agents, rng)
@@ -1,5 +1,5 @@
 """Module that contains functions to plot the solution of a MSPP or a MSPP-PD"""
-from . import np, math, plt, cm, ConnectionPatch
+from . import np, plt, cm, ConnectionPatch
 
 
 def _plot_network_nodes(ax, location_to_node, param_dict):
@@ -64,8 +64,9 @@ def _plot_agent_path(ax, x, w_arcs, agent, node_to_location, param_dict):
         param_dict (dict): dict containing items to customize the plot
     """
 
+    on_path = np.isclose(np.asarray(x)[:, agent.idx], 1)
     for arc in w_arcs:
-        if math.isclose(x[arc.idx, agent.idx], 1):
+        if on_path[arc.idx]:
             arrow = ConnectionPatch(node_to_location[arc.i],
                                     node_to_location[arc.j],
                                     **param_dict)
@@ -1,4 +1,6 @@
 """Module that contains functions to read the paper's data"""
+from . import os
+from . import np
 from . import pd
 
 
@@ -21,19 +23,153 @@ def read_networks_csv(filename, along):
                                   header=[0, 1],
                                   index_col=0)
 
-        # Convert column names from str to int and start counting nodes from 0 (easier)
-        networks_df.columns = [networks_df.columns.get_level_values(0).astype(int) - 1,
-                               networks_df.columns.get_level_values(1).astype(int) - 1]
-
-        return networks_df
+        return _rows_to_networks(networks_df)
 
     elif along == "cols":
         networks_df = pd.read_csv(filename,
                                   index_col=[0, 1],
                                   decimal=",")
 
-        # start conting nodes from 0 makes life easier
-        networks_df.index = [networks_df.index.get_level_values(0) - 1,
-                             networks_df.index.get_level_values(1) - 1]
+        return _cols_to_networks(networks_df)
+
+
+def _rows_to_networks(networks_df):
+    """Convert the labels of a dataframe read from a csv file with instances along rows"""
+
+    # Convert column names from str to int and start counting nodes from 0 (easier)
+    networks_df.columns = [networks_df.columns.get_level_values(0).astype(int) - 1,
+                           networks_df.columns.get_level_values(1).astype(int) - 1]
+
+    return networks_df
+
+
+def _cols_to_networks(networks_df):
+    """Convert the labels of a dataframe read from a csv file with instances along columns"""
+
+    # start conting nodes from 0 makes life easier
+    networks_df.index = [networks_df.index.get_level_values(0) - 1,
+                         networks_df.index.get_level_values(1) - 1]
+
+    return networks_df.T  # transpose to have instances along rows
+
+
+def iter_networks_csv(filename, along, chunksize=100):
+    """Generator that read the network instances of a csv file a block at a time
+
+    Only a block is in memory at any time, so instances can be processed while the rest of
+    the file is still to be read, e.g. by data_generator.network_instances(). With instances
+    along columns each block requires a pass over the file, reading only the block's columns
+
+    Args:
+        filename (str): The name of the file to be read
+        along (str): Specify how instances are ordered on the file, see read_networks_csv()
+        chunksize (int): maximum number of instances in a block (default is 100)
+
+    Yields:
+        pd.Dataframe: a pandas dataframe containing a block of consecutive network instances, as
+          the one returned by read_networks_csv()
+    """
+
+    if along == "rows":
+        with pd.read_csv(filename,
+                         decimal=",",
+                         header=[0, 1],
+                         index_col=0,
+                         chunksize=chunksize) as reader:
+            for networks_df in reader:
+                yield _rows_to_networks(networks_df)
+
+    elif along == "cols":
+        num_of_cols = len(pd.read_csv(filename, index_col=[0, 1], nrows=0).columns)
+        for first_col in range(0, num_of_cols, chunksize):
+            instance_cols = range(2 + first_col, 2 + min(first_col + chunksize, num_of_cols))
+            networks_df = pd.read_csv(filename,
+                                      index_col=[0, 1],
+                                      usecols=[0, 1, *instance_cols],
+                                      decimal=",")
+            yield _cols_to_networks(networks_df)
+
+    else:
+        raise ValueError(f"Unknown layout {along!r}")
+
+
+def write_networks_csv(networks_df, filename, along):
+    """Function that write one or more network instances on a csv file, as the paper's data
+
+    Args:
+        networks_df (pd.Dataframe): pandas dataframe containing network instances along rows and
+          networks' arcs along columns, as the one returned by read_networks_csv()
+        filename (str): The name of the file to be written
+        along (str): Specify how instances are ordered on the file.
+          The only accepted values are "rows" or "cols", see read_networks_csv()
+    """
+
+    # the paper counts nodes from 1
+    arcs = pd.MultiIndex.from_arrays([networks_df.columns.get_level_values(0) + 1,
+                                      networks_df.columns.get_level_values(1) + 1])
+    paper_df = pd.DataFrame(networks_df.to_numpy(), index=networks_df.index, columns=arcs)
+
+    if along == "rows":
+        paper_df.to_csv(filename, decimal=",")
+    elif along == "cols":
+        paper_df.T.to_csv(filename, decimal=",")
+    else:
+        raise ValueError(f"Unknown layout {along!r}")
+
+
+def write_networks_store(networks_df, dirname):
+    """Function that write one or more network instances on a columnar binary store
+
+    The store is a directory with three .npy files: "weights.npy", a float64 (instances x arcs)
+    matrix with the weights, "arcs.npy", an int32 (arcs x 2) matrix with the (i, j) nodes of
+    each arc, and "instances.npy", with the names of the instances
+
+    Args:
+        networks_df (pd.Dataframe): pandas dataframe containing network instances along rows and
+          networks' arcs along columns, as the one returned by read_networks_csv()
+        dirname (str): The name of the directory of the store, created if missing
+    """
+
+    os.makedirs(dirname, exist_ok=True)
+
+    arcs = np.column_stack([networks_df.columns.get_level_values(0),
+                            networks_df.columns.get_level_values(1)]).astype(np.int32)
+
+    np.save(os.path.join(dirname, "weights.npy"), networks_df.to_numpy(dtype=np.float64))
+    np.save(os.path.join(dirname, "arcs.npy"), arcs)
+    np.save(os.path.join(dirname, "instances.npy"), networks_df.index.to_numpy(dtype=str))
+
+
+def convert_networks_csv(filename, along, dirname):
+    """Function that convert a csv file of network instances into a columnar binary store
+
+    Args:
+        filename (str): The name of the csv file to be converted
+        along (str): Specify how instances are ordered on the csv file, see read_networks_csv()
+        dirname (str): The name of the directory of the store, see write_networks_store()
+    """
+
+    write_networks_store(read_networks_csv(filename, along), dirname)
+
+
+def read_networks_store(dirname, mmap=True):
+    """Function that read the network instances of a columnar binary store
+
+    Args:
+        dirname (str): The name of the directory of the store, see write_networks_store()
+        mmap (bool): if True (default) the weights are memory-mapped, read-only, instead of
+          loaded, so that only the instances actually used are read from disk
+
+    Returns:
+        pd.Dataframe: a pandas dataframe containing network instances along rows and networks' arcs
+          along columns, as the one returned by read_networks_csv(). Its values are a view of
+          the weights on the store
+    """
+
+    weights = np.load(os.path.join(dirname, "weights.npy"), mmap_mode="r" if mmap else None)
+    arcs = np.load(os.path.join(dirname, "arcs.npy"))
+    instances = np.load(os.path.join(dirname, "instances.npy"))
+
+    columns = pd.MultiIndex.from_arrays([arcs[:, 0].astype(int), arcs[:, 1].astype(int)])
 
-        return networks_df.T  # transpose to have instances along rows
+    return pd.DataFrame(weights, index=pd.Index(instances, dtype=object), columns=columns, copy=False)
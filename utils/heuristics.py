@@ -0,0 +1,355 @@
+"""Module that contains heuristics to quickly find good solutions of MSPP-PDs, e.g. to warm start a solver"""
+from . import np
+from . import shortest_paths
+
+
+# network's element penalized by each problem and how the penalty grows with the number of agents using it
+_PENALTIES = {"MSPP": (None, None),
+              "ABP": ("arc", "binary"),
+              "NBP": ("node", "binary"),
+              "ALP": ("arc", "linear"),
+              "NLP": ("node", "linear"),
+              "AQP": ("arc", "quadratic"),
+              "NQP": ("node", "quadratic")}
+
+
+def _penalty(kind, counts):
+    """Compute the penalty incurred on some network's elements
+
+    Args:
+        kind (str): how the penalty grows, "binary", "linear" or "quadratic"
+        counts (np.ndarray): the number of agents using each element
+
+    Returns:
+        float: the overall penalty
+    """
+
+    if kind == "binary":
+        return float(np.sum(counts > 1))
+    elif kind == "linear":
+        return float(np.sum(np.maximum(counts - 1, 0)))
+    elif kind == "quadratic":
+        return float(np.sum(counts * (counts - 1) / 2))
+
+    return 0.0
+
+
+def _marginal_penalty(kind, counts):
+    """Compute the penalty added by one more agent using some network's elements
+
+    Args:
+        kind (str): how the penalty grows, "binary", "linear" or "quadratic"
+        counts (np.ndarray): the number of agents already using each element
+
+    Returns:
+        np.ndarray: the additional penalty for each element
+    """
+
+    if kind == "binary":
+        return (counts == 1).astype(float)
+    elif kind == "linear":
+        return (counts >= 1).astype(float)
+    elif kind == "quadratic":
+        return counts.astype(float)
+
+    return np.zeros(len(counts))
+
+
+class _Routing:
+    """Class to represent the paths of the agents while they are planned
+
+    Attributes:
+        paths (list): the positions of the arcs of each agent's path, by position of the agent
+        arc_counts (np.ndarray): number of agents traversing each arc
+        node_counts (np.ndarray): number of agents traversing each node
+    """
+
+    def __init__(self, problem_type, num_nodes, tails, heads, weights, agents):
+        """Initialize an empty routing
+
+        Args:
+            problem_type (str): the MSPP-PD variant whose objective is minimized
+            num_nodes (int): number of nodes in the network
+            tails (np.ndarray): the starting node of each arc
+            heads (np.ndarray): the ending node of each arc
+            weights (np.ndarray): the weight of each arc
+            agents (list): list of agents that has to be routed
+        """
+
+        self.element, self.kind = _PENALTIES[problem_type]
+        self.num_nodes = num_nodes
+        self.tails, self.heads, self.weights = tails, heads, weights
+        self.agents = agents
+
+        self.paths = [None] * len(agents)
+        self.arc_counts = np.zeros(len(tails), dtype=int)
+        self.node_counts = np.zeros(num_nodes, dtype=int)
+
+    def _path_nodes(self, agent_pos, path):
+        """Gives the nodes traversed along a path of an agent"""
+
+        if len(path) == 0:  # source and terminus coincide, the agent does not move
+            return np.array([], dtype=int)
+        return np.unique(np.concatenate([[self.agents[agent_pos].source], self.heads[path]]))
+
+    def add(self, agent_pos, path):
+        """Assign a path to an agent"""
+
+        self.paths[agent_pos] = path
+        self.arc_counts[path] += 1
+        self.node_counts[self._path_nodes(agent_pos, path)] += 1
+
+    def remove(self, agent_pos):
+        """Remove the path of an agent, returning it"""
+
+        path = self.paths[agent_pos]
+        self.paths[agent_pos] = None
+        self.arc_counts[path] -= 1
+        self.node_counts[self._path_nodes(agent_pos, path)] -= 1
+
+        return path
+
+    def objective(self):
+        """Gives the blended objective (distance + penalty) of the routing"""
+
+        counts = self.arc_counts if self.element == "arc" else self.node_counts
+        distance = sum(self.weights[path].sum() for path in self.paths)
+
+        return distance + _penalty(self.kind, counts)
+
+    def best_path(self, agent_pos):
+        """Find the path of an agent minimizing the objective, given the paths of the other agents
+
+        The penalties added by the agent are moved on the arcs' weights: a node's penalty is
+        paid by the arcs entering it, the source's one does not depend on the path
+
+        Args:
+            agent_pos (int): the position of an agent without path
+
+        Returns:
+            tuple: a tuple (path, cost) with the positions of the arcs of the path and the
+              increase of the objective it causes
+        """
+
+        adjusted_weights = self.weights.copy()
+        if self.element == "arc":
+            adjusted_weights += _marginal_penalty(self.kind, self.arc_counts)
+        elif self.element == "node":
+            adjusted_weights += _marginal_penalty(self.kind, self.node_counts)[self.heads]
+
+        agent = self.agents[agent_pos]
+        path = shortest_paths.shortest_path(self.num_nodes, self.tails, self.heads,
+                                            adjusted_weights, agent.source, agent.terminus)
+        if path is None:
+            raise ValueError(f"Agent {agent.idx} can not reach its terminus")
+
+        return path, adjusted_weights[path].sum()
+
+
+def prioritized_planning(problem_type, nodes, w_arcs, agents, max_rounds=10):
+    """Route the agents one at a time and then improve their paths with a local search
+
+    Each agent, following the order of the list, is routed along the path that minimizes the
+    increase of the objective given the paths of the agents routed before it. Then, until the
+    objective improves (and for at most max_rounds rounds), each agent is rerouted along its
+    best path given the paths of all the others
+
+    Args:
+        problem_type (str): the problem whose objective is minimized. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        max_rounds (int): maximum number of rounds of local search (default is 10)
+
+    Returns:
+        np.ndarray: a (len(w_arcs), len(agents)) matrix with the same meaning of X.x
+    """
+
+    arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+    tails = np.array([arc.i for arc in arcs], dtype=int)
+    heads = np.array([arc.j for arc in arcs], dtype=int)
+    weights = np.array([arc.w for arc in arcs], dtype=float)
+
+    routing = _Routing(problem_type, len(nodes), tails, heads, weights, agents)
+
+    # construction
+    for agent_pos in range(len(agents)):
+        path, _ = routing.best_path(agent_pos)
+        routing.add(agent_pos, path)
+
+    _local_search(routing, max_rounds)
+
+    x = np.zeros((len(w_arcs), len(agents)))
+    for agent, path in zip(agents, routing.paths):
+        x[[arcs[arc_pos].idx for arc_pos in path], agent.idx] = 1
+
+    return x
+
+
+def _local_search(routing, max_rounds):
+    """Reroute each agent along its best path given the paths of all the others, until the objective improves
+
+    Args:
+        routing (_Routing): a routing where every agent has a path, improved in place
+        max_rounds (int): maximum number of rounds over all the agents
+    """
+
+    for _ in range(max_rounds):
+        improved = False
+        for agent_pos in range(len(routing.agents)):
+            current_cost = routing.objective()
+            current_path = routing.remove(agent_pos)
+            path, _ = routing.best_path(agent_pos)
+            routing.add(agent_pos, path)
+
+            if routing.objective() < current_cost - 1e-9:
+                improved = True
+            else:
+                routing.remove(agent_pos)
+                routing.add(agent_pos, current_path)
+        if not improved:
+            break
+
+
+def local_search(problem_type, x, nodes, w_arcs, agents, max_rounds=10):
+    """Improve the agents' paths rerouting one agent at a time, as in prioritized_planning()
+
+    Args:
+        problem_type (str): the problem whose objective is minimized. Only MSPP and MSPP-PD variants are accepted
+        x (np.ndarray): a (len(w_arcs), len(agents)) matrix with the agents' paths, as X.x
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        max_rounds (int): maximum number of rounds of local search (default is 10)
+
+    Returns:
+        np.ndarray: the improved paths, with the same meaning of x
+    """
+
+    arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+    tails = np.array([arc.i for arc in arcs], dtype=int)
+    heads = np.array([arc.j for arc in arcs], dtype=int)
+    weights = np.array([arc.w for arc in arcs], dtype=float)
+    arc_idxs = np.array([arc.idx for arc in arcs], dtype=int)
+
+    routing = _Routing(problem_type, len(nodes), tails, heads, weights, agents)
+    x = np.round(x)
+    for agent_pos, agent in enumerate(agents):
+        routing.add(agent_pos, np.flatnonzero(x[arc_idxs, agent.idx]))
+
+    _local_search(routing, max_rounds)
+
+    improved_x = np.zeros(x.shape)
+    for agent, path in zip(agents, routing.paths):
+        improved_x[arc_idxs[path], agent.idx] = 1
+
+    return improved_x
+
+
+def start_values(problem_type, x, nodes, w_arcs, agents, penalty_formulation="pairs"):
+    """Compute the value of every decision variable of a formulation for given agents' paths
+
+    Args:
+        problem_type (str): the formulated problem. Only MSPP and MSPP-PD variants are accepted
+        x (np.ndarray): a (len(w_arcs), len(agents)) matrix with the agents' paths, as X.x
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): the formulation of the quadratic penalties, see
+          problem_model.set_AQP() (default is "pairs")
+
+    Returns:
+        list: a list of np.ndarray with the values of the decision variables, in the same order
+          of the gb.MVar returned by problem_model.set_problem()
+    """
+
+    x = np.round(x)
+    tails = np.zeros(len(w_arcs), dtype=int)
+    heads = np.zeros(len(w_arcs), dtype=int)
+    for arc in w_arcs:
+        tails[arc.idx], heads[arc.idx] = arc.i, arc.j
+
+    # r: agents traversing a node, i.e. using an arc leaving or entering it
+    r = np.zeros((len(nodes), len(agents)))
+    arc_pos, agent_idxs = np.nonzero(x)
+    r[tails[arc_pos], agent_idxs] = 1
+    r[heads[arc_pos], agent_idxs] = 1
+
+    arc_counts, node_counts = x.sum(axis=1), r.sum(axis=1)
+    is_pair = np.tril(np.ones((len(agents), len(agents))), k=-1)  # agent_.idx < agent.idx
+
+    if problem_type == "MSPP":
+        return [x]
+    elif problem_type == "ABP":
+        return [x, (arc_counts > 1).astype(float)]
+    elif problem_type == "NBP":
+        return [x, r, (node_counts > 1).astype(float)]
+    elif problem_type == "ALP":
+        return [x, (arc_counts > 0).astype(float)]
+    elif problem_type == "NLP":
+        return [x, r, (node_counts > 0).astype(float)]
+    elif problem_type == "AQP" and penalty_formulation == "counts":
+        return [x, arc_counts * (arc_counts - 1) / 2]
+    elif problem_type == "AQP":
+        return [x, x[:, :, None] * x[:, None, :] * is_pair]
+    elif problem_type == "NQP" and penalty_formulation == "counts":
+        return [x, r, node_counts * (node_counts - 1) / 2]
+    elif problem_type == "NQP":
+        return [x, r, r[:, :, None] * r[:, None, :] * is_pair]
+
+
+def evaluate_paths(problem_type, x, nodes, w_arcs, agents):
+    """Compute the objectives of a problem for given agents' paths
+
+    Args:
+        problem_type (str): the problem to evaluate. Only MSPP and MSPP-PD variants are accepted
+        x (np.ndarray): a (len(w_arcs), len(agents)) matrix with the agents' paths, as X.x
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        list: a list with the values of the problem's objectives, as the one returned by
+          problem_model.evaluate_pb_objectives()
+    """
+
+    values = start_values(problem_type, x, nodes, w_arcs, agents)
+    weights = np.zeros(len(w_arcs))
+    for arc in w_arcs:
+        weights[arc.idx] = arc.w
+
+    element, kind = _PENALTIES[problem_type]
+    objectives = [float(weights @ values[0].sum(axis=1))]
+    if element == "arc":
+        objectives.append(_penalty(kind, values[0].sum(axis=1)))
+    elif element == "node":
+        objectives.append(_penalty(kind, values[1].sum(axis=1)))
+
+    return objectives
+
+
+def set_warm_start(problem_type, variables, nodes, w_arcs, agents, x=None, penalty_formulation="pairs"):
+    """Set the starting solution of a formulated problem from the agents' paths
+
+    Args:
+        problem_type (str): the formulated problem. Only MSPP and MSPP-PD variants are accepted
+        variables (tuple): the gb.MVar returned by problem_model.set_problem(), X first
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        x (np.ndarray): the agents' paths, as X.x. By default they are found by prioritized_planning()
+        penalty_formulation (str): the formulation of the quadratic penalties, see
+          problem_model.set_AQP() (default is "pairs")
+
+    Returns:
+        np.ndarray: the agents' paths used as starting solution
+    """
+
+    if x is None:
+        x = prioritized_planning(problem_type, nodes, w_arcs, agents)
+
+    for mvar, values in zip(variables, start_values(problem_type, x, nodes, w_arcs, agents,
+                                                             penalty_formulation)):
+        mvar.setAttr("Start", values)
+
+    return x
@@ -0,0 +1,204 @@
+"""Module that contains a Lagrangian relaxation solver of MSPP-PDs, giving solutions with a bound on their gap"""
+from . import time
+from . import np
+from . import shortest_paths
+from . import heuristics
+
+
+def _penalty_table(kind, num_agents):
+    """Compute the penalty of a network's element for each number of agents using it
+
+    Args:
+        kind (str): how the penalty grows, "binary", "linear" or "quadratic"
+        num_agents (int): number of agents
+
+    Returns:
+        np.ndarray: the penalty for 0, 1, ..., num_agents agents
+    """
+
+    return np.array([heuristics._penalty(kind, np.array([count])) for count in range(num_agents + 1)])
+
+
+def _priced_paths(num_nodes, tails, heads, weights, sources, termini):
+    """Route every agent along a shortest path for the given (priced) weights of the arcs
+
+    The agents sharing a source share a single shortest path tree, computed for all of them
+    at once by the vectorized routines of shortest_paths
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the non-negative weight of each arc
+        sources (np.ndarray): the source of each agent
+        termini (np.ndarray): the terminus of each agent
+
+    Returns:
+        tuple: a tuple (costs, paths) with the cost of the path of each agent and a
+          (num_of_agents, num_nodes) matrix with the positions of the arcs of each path, padded with -1
+    """
+
+    tree_sources, tree_of_agent = np.unique(sources, return_inverse=True)
+    distances, predecessor_arcs = shortest_paths.shortest_path_trees(num_nodes, tails, heads, weights, tree_sources)
+
+    costs = distances[tree_of_agent, termini]
+    if not np.isfinite(costs).all():
+        raise ValueError("Some agents can not reach their terminus")
+
+    return costs, shortest_paths._trace_paths(tails, predecessor_arcs[tree_of_agent], sources, termini, num_nodes)
+
+
+def _usage(element, paths, heads, sources, termini, num_elements):
+    """Count the agents using each arc or node along their paths
+
+    Args:
+        element (str): the penalized element, "arc" or "node"
+        paths (np.ndarray): the positions of the arcs of each agent's path, padded with -1
+        heads (np.ndarray): the ending node of each arc
+        sources (np.ndarray): the source of each agent
+        termini (np.ndarray): the terminus of each agent
+        num_elements (int): number of arcs or nodes
+
+    Returns:
+        np.ndarray: the number of agents using each element
+    """
+
+    path_arcs = paths[paths >= 0]
+    if element == "arc":
+        return np.bincount(path_arcs, minlength=num_elements)
+
+    # an agent traverses the heads of its arcs and its source, unless it does not move
+    return (np.bincount(heads[path_arcs], minlength=num_elements)
+            + np.bincount(sources[sources != termini], minlength=num_elements))
+
+
+def _paths_to_x(paths, arc_idxs, agent_idxs):
+    """Convert paths, as arcs' positions padded with -1, into a matrix with the same meaning of X.x
+
+    Args:
+        paths (np.ndarray): the positions of the arcs of each agent's path, padded with -1
+        arc_idxs (np.ndarray): the idx of the arc in each position
+        agent_idxs (np.ndarray): the idx of each agent
+
+    Returns:
+        np.ndarray: a (len(arc_idxs), len(agent_idxs)) matrix with the paths
+    """
+
+    x = np.zeros((len(arc_idxs), len(agent_idxs)))
+    path_pos, step = np.nonzero(paths >= 0)
+    x[arc_idxs[paths[path_pos, step]], agent_idxs[path_pos]] = 1
+
+    return x
+
+
+def solve_lagrangian(problem_type, nodes, w_arcs, agents, max_iterations=200, time_limit=None, gap_tol=1e-4,
+                     step_scale=2.0, patience=5, repair_every=10, repair_rounds=10):
+    """Solve a MSPP-PD by Lagrangian relaxation of the sharing of arcs/nodes, with subgradient optimization
+
+    The number of agents using each penalized element (arc or node) is a copy n_e of the sum
+    of their usage, and the constraints linking the two are relaxed with multipliers l_e. The
+    relaxation splits into a shortest path problem for each agent, with weights increased by
+    the multipliers, and the minimization of penalty(n_e) - l_e n_e for each element. Its
+    value is a lower bound of the optimal objective (distance + penalty, as the blended
+    objectives of problem_model.set_problem()).
+    Multipliers are updated by subgradient steps with Polyak's step size, whose scale is
+    halved when the bound does not improve for patience iterations. Every repair_every
+    iterations the paths of the relaxation are repaired by heuristics.local_search() into a
+    solution, whose objective is an upper bound
+
+    Args:
+        problem_type (str): the problem to solve. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        max_iterations (int): maximum number of subgradient iterations (default is 200)
+        time_limit (float): time limit (s). By default there is no limit
+        gap_tol (float): relative gap between the bounds at which the solver stops (default is 1e-4)
+        step_scale (float): initial scale of the step size, between 0 and 2 (default is 2)
+        patience (int): iterations without improvement of the bound before halving the scale (default is 5)
+        repair_every (int): iterations between two repairs of the paths (default is 10)
+        repair_rounds (int): maximum number of rounds of each repair (default is 10)
+
+    Returns:
+        dict: a dict with:
+          - "x": a (len(w_arcs), len(agents)) matrix with the best paths found, as X.x
+          - "objectives": their objectives, as the ones of problem_model.evaluate_pb_objectives()
+          - "lower_bound", "upper_bound": the bounds on the optimal blended objective
+          - "gap": the relative gap between the bounds, (upper - lower) / upper
+          - "multipliers": the multiplier of each arc, by idx, or node
+          - "iterations": the number of subgradient iterations
+          - "runtime": the time (s) spent
+    """
+
+    start = time.perf_counter()
+
+    arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+    tails = np.array([arc.i for arc in arcs], dtype=int)
+    heads = np.array([arc.j for arc in arcs], dtype=int)
+    weights = np.array([arc.w for arc in arcs], dtype=float)
+    arc_idxs = np.array([arc.idx for arc in arcs], dtype=int)
+
+    agent_idxs = np.array([agent.idx for agent in agents], dtype=int)
+    sources = np.array([agent.source for agent in agents], dtype=int)
+    termini = np.array([agent.terminus for agent in agents], dtype=int)
+    num_nodes = len(nodes)
+
+    element, kind = heuristics._PENALTIES[problem_type]
+    num_elements = len(arcs) if element == "arc" else num_nodes
+    table = _penalty_table(kind, len(agents))
+    counts = np.arange(len(agents) + 1)
+
+    multipliers = np.zeros(num_elements)
+    lower_bound, upper_bound, best_x = -np.inf, np.inf, None
+    iterations, stale = 0, 0
+
+    for iterations in range(1, max_iterations + 1):
+        # relaxation: a shortest path for each agent...
+        priced_weights = weights.copy()
+        if element == "arc":
+            priced_weights += multipliers
+        elif element == "node":
+            priced_weights += multipliers[heads]
+        costs, paths = _priced_paths(num_nodes, tails, heads, priced_weights, sources, termini)
+        if element == "node":
+            costs = costs + np.where(sources != termini, multipliers[sources], 0)
+
+        # ... and the best number of agents on each element
+        element_costs = table[None, :] - multipliers[:, None] * counts[None, :]
+        best_counts = np.argmin(element_costs, axis=1)
+        bound = costs.sum() + element_costs[np.arange(num_elements), best_counts].sum()
+
+        if bound > lower_bound + 1e-9:
+            lower_bound, stale = bound, 0
+        else:
+            stale += 1
+            if stale >= patience:
+                step_scale, stale = step_scale / 2, 0
+
+        # repaired paths of the relaxation give a solution
+        if best_x is None or iterations % repair_every == 0:
+            x = heuristics.local_search(problem_type, _paths_to_x(paths, arc_idxs, agent_idxs), nodes, w_arcs, agents, repair_rounds)
+            objective = sum(heuristics.evaluate_paths(problem_type, x, nodes, w_arcs, agents))
+            if objective < upper_bound:
+                upper_bound, best_x = objective, x
+
+        if element is None:  # MSPP, the relaxation is exact
+            break
+        subgradient = _usage(element, paths, heads, sources, termini, num_elements) - best_counts
+        if upper_bound - lower_bound <= gap_tol * abs(upper_bound) or not subgradient.any() or step_scale < 1e-6:
+            break
+        if time_limit is not None and time.perf_counter() - start >= time_limit:
+            break
+
+        # the optimal multipliers are non-negative, as the penalties do not decrease with the agents
+        step = step_scale * (upper_bound - bound) / (subgradient @ subgradient)
+        multipliers = np.maximum(multipliers + step * subgradient, 0)
+
+    return {"x": best_x,
+            "objectives": heuristics.evaluate_paths(problem_type, best_x, nodes, w_arcs, agents),
+            "lower_bound": float(lower_bound),
+            "upper_bound": float(upper_bound),
+            "gap": max(float((upper_bound - lower_bound) / abs(upper_bound)), 0.0) if upper_bound else 0.0,
+            "multipliers": multipliers,
+            "iterations": iterations,
+            "runtime": time.perf_counter() - start}
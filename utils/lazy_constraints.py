@@ -0,0 +1,226 @@
+"""Module that contains a branch-and-cut mode for MSPP-PDs, adding the conflict constraints only when violated"""
+from . import np
+from . import sparse
+from . import gb
+from . import GRB
+from . import problem_model
+from . import milp_backends
+
+
+# families of constraints always added upfront, the others link the penalties and are added lazily
+EAGER_FAMILIES = ("Flow",)
+
+_VIOLATION_TOL = 1e-6
+
+
+class LazySystem:
+    """Class to represent the constraints of a problem that are added only when violated
+
+    Attributes:
+        A (sparse.csr_matrix): the constraint matrix, with a column for each variable of the problem
+        lb (np.ndarray): the lower bound of each row
+        ub (np.ndarray): the upper bound of each row
+        added (np.ndarray): True for the rows already added to the problem
+    """
+
+    def __init__(self, A, lb, ub):
+        """Initialize the instance, with no row added
+
+        Args:
+            A (sparse.csr_matrix): the constraint matrix
+            lb (np.ndarray): the lower bound of each row
+            ub (np.ndarray): the upper bound of each row
+        """
+
+        self.A = A
+        self.lb = lb
+        self.ub = ub
+        self.added = np.zeros(A.shape[0], dtype=bool)
+
+    def __repr__(self):
+        """Return the representation of the lazy system instance"""
+
+        return f"{self.__class__.__name__}(num_rows={self.A.shape[0]!r}, num_added={int(self.added.sum())!r})"
+
+    def violated_rows(self, x, include_added=False):
+        """Find the rows violated by a solution
+
+        Args:
+            x (np.ndarray): the value of each variable
+            include_added (bool): if True, also the rows already added are checked (default is False)
+
+        Returns:
+            np.ndarray: the positions of the violated rows
+        """
+
+        Ax = self.A @ np.asarray(x, dtype=float)
+        violated = (Ax < self.lb - _VIOLATION_TOL) | (Ax > self.ub + _VIOLATION_TOL)
+        if not include_added:
+            violated &= ~self.added
+
+        return np.flatnonzero(violated)
+
+    def rows(self, positions):
+        """Gives some rows in the (A, sense, rhs) form of MILPDescription.add_constrs()
+
+        Args:
+            positions (np.ndarray): the positions of the rows
+
+        Returns:
+            tuple: a tuple (A, sense, rhs) describing the rows
+        """
+
+        lb, ub = self.lb[positions], self.ub[positions]
+        sense = np.where(lb == ub, GRB.EQUAL, np.where(np.isinf(lb), GRB.LESS_EQUAL, GRB.GREATER_EQUAL))
+
+        return self.A[positions], sense, np.where(np.isinf(lb), ub, lb)
+
+
+def split_description(description, eager_families=EAGER_FAMILIES):
+    """Split the description of a problem into the constraints added upfront and the lazy ones
+
+    Args:
+        description (MILPDescription): the description of the problem
+        eager_families (tuple): names of the families of constraints added upfront (default is EAGER_FAMILIES)
+
+    Returns:
+        tuple: a tuple (eager_description, lazy_system) with a MILPDescription with the same
+          variables and objectives but only the eager families of constraints, and the
+          LazySystem of all the other constraints
+    """
+
+    eager_description = problem_model.MILPDescription()
+    lazy_description = problem_model.MILPDescription()
+    for name, shape, vtype, lb, ub in description.var_blocks:
+        eager_description.add_vars(name, shape, vtype, lb, ub)
+        lazy_description.add_vars(name, shape, vtype, lb, ub)
+    for name, cols, coeffs in description.objectives:
+        eager_description.add_objective(name, cols, coeffs)
+
+    for name, A, sense, rhs in description.constr_families:
+        if name in eager_families:
+            eager_description.add_constrs(name, A, sense, rhs)
+        else:
+            lazy_description.add_constrs(name, A, sense, rhs)
+
+    if lazy_description.constr_families:
+        A, lb, ub = lazy_description.constraints()
+    else:
+        A, lb, ub = sparse.csr_matrix((0, description.num_vars)), np.empty(0), np.empty(0)
+
+    return eager_description, LazySystem(A, lb, ub)
+
+
+def set_lazy_problem(problem_type, nodes, w_arcs, agents, penalty_formulation="pairs",
+                     eager_families=EAGER_FAMILIES, env=None):
+    """Formulate a problem whose conflict constraints are added lazily, see optimize_lazy()
+
+    The model starts as the MSPP with the penalty variables, i.e. with only the flow
+    constraints, and its objectives are blended into a single one
+
+    Args:
+        problem_type (str): The optimization problem to formulate. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the quadratic penalties are linearized, see
+          problem_model.set_AQP() (default is "pairs")
+        eager_families (tuple): names of the families of constraints added upfront (default is EAGER_FAMILIES)
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        tuple: a tuple (Problem, *_) as the one returned by problem_model.set_problem(). The
+          LazySystem of the problem is Problem._lazy_system
+    """
+
+    description = problem_model.describe_problem(problem_type, nodes, w_arcs, agents, penalty_formulation)
+    eager_description, lazy_system = split_description(description, eager_families)
+
+    problem, *variables = problem_model.to_gurobi_model(eager_description, env=env)
+    problem_model.blend_objectives(problem)  # Gurobi has no lazy constraints for multiple objectives
+    problem.setParam("LazyConstraints", 1)
+    problem._lazy_system = lazy_system
+
+    return (problem, *variables)
+
+
+def _lazy_callback(problem, where):
+    """Gurobi callback that adds the lazy constraints violated by each new incumbent"""
+
+    if where == GRB.Callback.MIPSOL:
+        lazy_system = problem._lazy_system
+        x = np.array(problem.cbGetSolution(problem._vars))
+        # Gurobi may find solutions violating the lazy constraints already added, e.g. by heuristics
+        violated = lazy_system.violated_rows(x, include_added=True)
+
+        A, sense, rhs = lazy_system.rows(violated)
+        for row in range(len(violated)):
+            start, end = A.indptr[row], A.indptr[row + 1]
+            expr = gb.LinExpr(A.data[start:end].tolist(), [problem._vars[col] for col in A.indices[start:end]])
+            if sense[row] == GRB.LESS_EQUAL:
+                problem.cbLazy(expr <= rhs[row])
+            elif sense[row] == GRB.GREATER_EQUAL:
+                problem.cbLazy(expr >= rhs[row])
+            else:
+                problem.cbLazy(expr == rhs[row])
+
+        lazy_system.added[violated] = True
+        problem._num_lazy_rounds += int(len(violated) > 0)
+
+
+def optimize_lazy(problem):
+    """Optimize a problem built by set_lazy_problem(), adding the violated lazy constraints
+
+    The number of lazy constraints added is lazy_system.added.sum() and the number of
+    incumbents that violated some of them is problem._num_lazy_rounds
+
+    Args:
+        problem (gb.Model): the problem, as returned by set_lazy_problem()
+    """
+
+    problem.update()
+    problem._vars = problem.getVars()
+    problem._num_lazy_rounds = 0
+    problem.optimize(_lazy_callback)
+
+
+def solve_with_cut_rounds(description, backend="highs", eager_families=EAGER_FAMILIES, max_rounds=100, **kwargs):
+    """Solve a described problem adding its lazy constraints in rounds, for solvers without callbacks
+
+    At each round the problem with the constraints added so far is solved to optimality and
+    the constraints violated by its solution are added, until none is violated
+
+    Args:
+        description (MILPDescription): the description of the problem
+        backend (str): the solver to use, see milp_backends.solve() (default is "highs")
+        eager_families (tuple): names of the families of constraints added upfront (default is EAGER_FAMILIES)
+        max_rounds (int): maximum number of rounds (default is 100)
+        **kwargs: solver's options, see milp_backends.solve()
+
+    Returns:
+        tuple: a tuple (solution, num_rounds, num_cuts) with the milp_backends.MILPSolution of the
+          whole description (its status is GRB.ITERATION_LIMIT if constraints are still violated
+          after max_rounds rounds), the number of rounds and the number of constraints added
+    """
+
+    eager_description, lazy_system = split_description(description, eager_families)
+
+    runtime = 0.0
+    for num_rounds in range(1, max_rounds + 1):
+        solution = milp_backends.solve(eager_description, backend, **kwargs)
+        runtime += solution.runtime
+        if solution.x is None:
+            break
+
+        violated = lazy_system.violated_rows(solution.x)
+        if len(violated) == 0:
+            break
+
+        eager_description.add_constrs(f"Cuts {num_rounds}", *lazy_system.rows(violated))
+        lazy_system.added[violated] = True
+
+    status = solution.status
+    if solution.x is not None and len(lazy_system.violated_rows(solution.x)) > 0:
+        status = GRB.ITERATION_LIMIT
+
+    return milp_backends.MILPSolution(description, backend, status, solution.x, runtime), num_rounds, int(lazy_system.added.sum())
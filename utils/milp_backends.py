@@ -0,0 +1,146 @@
+"""Module that contains functions to solve the description of a MSPP or MSPP-PD with different MILP solvers"""
+from . import time
+from . import np
+from . import optimize
+from . import GRB
+from . import problem_model
+
+
+# scipy.optimize.milp statuses converted to Gurobi's ones, so that results can be compared
+_HIGHS_TO_GRB_STATUS = {0: GRB.OPTIMAL,
+                        1: GRB.TIME_LIMIT,
+                        2: GRB.INFEASIBLE,
+                        3: GRB.UNBOUNDED,
+                        4: GRB.NUMERIC}
+
+
+class MILPSolution:
+    """Class to represent the solution of a described MSPP or MSPP-PD
+
+    Attributes:
+        description (MILPDescription): the description of the solved problem
+        backend (str): the solver used, "highs" or "gurobi"
+        status (int): the final status, as a GRB.Status code
+        x (np.ndarray): the value of each variable, None if no solution was found
+        objectives (list): the value of each objective of the description
+        runtime (float): the time (s) spent by the solver
+    """
+
+    def __init__(self, description, backend, status, x, runtime):
+        """Initialize the instance based on the solver's outcome
+
+        Args:
+            description (MILPDescription): the description of the solved problem
+            backend (str): the solver used
+            status (int): the final status, as a GRB.Status code
+            x (np.ndarray): the value of each variable, None if no solution was found
+            runtime (float): the time (s) spent by the solver
+        """
+
+        self.description = description
+        self.backend = backend
+        self.status = status
+        self.x = x
+        self.runtime = runtime
+
+        if x is None:
+            self.objectives = []
+        else:
+            self.objectives = [float(description.objective_vector(index) @ x)
+                               for index in range(len(description.objectives))]
+
+    def __repr__(self):
+        """Return the representation of the solution instance"""
+
+        return f"{self.__class__.__name__}({self.backend!r}, status={self.status!r}, objectives={self.objectives!r})"
+
+    def values(self, name):
+        """Gives the values of a block of variables, e.g. "X"
+
+        Args:
+            name (str): name of the block
+
+        Returns:
+            np.ndarray: the values, with the shape of the block
+        """
+
+        return self.description.block_values(self.x, name)
+
+
+def solve_with_highs(description, time_limit=None, mip_rel_gap=None):
+    """Solve a described problem with HiGHS, through scipy.optimize.milp
+
+    Objectives are blended with unit weights, as the Gurobi models do
+
+    Args:
+        description (MILPDescription): the description of the problem
+        time_limit (float): time limit (s) for the solver. By default there is no limit
+        mip_rel_gap (float): relative MIP gap for the solver. By default it is HiGHS' one
+
+    Returns:
+        MILPSolution: the solution found
+    """
+
+    c = sum(description.objective_vector(index) for index in range(len(description.objectives)))
+    A, constr_lb, constr_ub = description.constraints()
+    var_lb, var_ub, integrality = description.bounds()
+
+    options = {}
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+    if mip_rel_gap is not None:
+        options["mip_rel_gap"] = mip_rel_gap
+
+    start = time.perf_counter()
+    result = optimize.milp(c,
+                           integrality=integrality,
+                           bounds=optimize.Bounds(var_lb, var_ub),
+                           constraints=optimize.LinearConstraint(A, constr_lb, constr_ub),
+                           options=options)
+    runtime = time.perf_counter() - start
+
+    return MILPSolution(description, "highs", _HIGHS_TO_GRB_STATUS[result.status], result.x, runtime)
+
+
+def solve_with_gurobi(description, time_limit=None, mip_rel_gap=None):
+    """Solve a described problem with Gurobi
+
+    Args:
+        description (MILPDescription): the description of the problem
+        time_limit (float): time limit (s) for the solver. By default there is no limit
+        mip_rel_gap (float): relative MIP gap for the solver. By default it is Gurobi's one
+
+    Returns:
+        MILPSolution: the solution found
+    """
+
+    problem, *_ = problem_model.to_gurobi_model(description)
+    if time_limit is not None:
+        problem.Params.TimeLimit = time_limit
+    if mip_rel_gap is not None:
+        problem.Params.MIPGap = mip_rel_gap
+    problem.optimize()
+
+    x = np.array(problem.getAttr("X", problem.getVars())) if problem.SolCount > 0 else None
+
+    return MILPSolution(description, "gurobi", problem.Status, x, problem.Runtime)
+
+
+def solve(description, backend="highs", **kwargs):
+    """Solve a described problem with the chosen MILP solver
+
+    Args:
+        description (MILPDescription): the description of the problem
+        backend (str): the solver to use. Only "highs" and "gurobi" are accepted (default is "highs")
+        **kwargs: solver's options, see solve_with_highs() and solve_with_gurobi()
+
+    Returns:
+        MILPSolution: the solution found
+    """
+
+    if backend == "highs":
+        return solve_with_highs(description, **kwargs)
+    elif backend == "gurobi":
+        return solve_with_gurobi(description, **kwargs)
+    else:
+        raise ValueError(f"Unknown MILP backend {backend!r}")
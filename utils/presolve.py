@@ -0,0 +1,316 @@
+"""Module that contains a presolve of MSPPs and MSPP-PDs, pruning the arcs and nodes agents can not use before the model is built"""
+from . import np
+from . import sparse
+from . import problem_model
+from . import shortest_paths
+from . import heuristics
+
+
+_TOL = 1e-9
+
+
+def path_bounds(nodes, w_arcs, agents):
+    """Compute, for each agent, the length of the shortest path through each arc and node
+
+    The forward cone of an agent are the nodes reachable from its source, the backward cone
+    the ones from which its terminus is reachable: arcs and nodes outside both cones lie on no
+    path of the agent and their bound is infinite
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        tuple: a tuple (arc_bounds, node_bounds, shortest) with a (len(w_arcs), len(agents))
+          matrix, whose rows are ordered by arc's idx, a (len(nodes), len(agents)) matrix and
+          the length of the shortest path of each agent
+    """
+
+    arc_idxs, tails, heads, weights = problem_model._arc_arrays(w_arcs)
+    _, sources, termini = problem_model._agent_arrays(agents)
+    node_labels = np.asarray(nodes, dtype=int)
+    num_nodes = max(node_labels.max(), tails.max(), heads.max()) + 1
+
+    # a tree for each distinct source, on the network, and terminus, on the reversed network
+    tree_sources, tree_of_source = np.unique(sources, return_inverse=True)
+    tree_termini, tree_of_terminus = np.unique(termini, return_inverse=True)
+    from_sources, _ = shortest_paths.shortest_path_trees(num_nodes, tails, heads, weights, tree_sources)
+    to_termini, _ = shortest_paths.shortest_path_trees(num_nodes, heads, tails, weights, tree_termini)
+    from_sources = from_sources[tree_of_source].T  # nodes x agents
+    to_termini = to_termini[tree_of_terminus].T
+
+    arc_bounds = np.empty((len(w_arcs), len(agents)))
+    arc_bounds[arc_idxs] = from_sources[tails] + weights[:, None] + to_termini[heads]
+    node_bounds = from_sources[node_labels] + to_termini[node_labels]
+
+    shortest = from_sources[termini, np.arange(len(agents))]
+    if not np.isfinite(shortest).all():
+        raise ValueError("Some agents can not reach their terminus")
+
+    return arc_bounds, node_bounds, shortest
+
+
+def prune_masks(nodes, w_arcs, agents, upper_bound=None):
+    """Find the arcs and nodes each agent may traverse
+
+    Without an upper bound, arcs and nodes are kept if they lie on a path of the agent. Given
+    an upper bound on the optimal objective, blended with unit weights as set_problem() does,
+    they are kept only if the shortest path through them is short enough: as penalties are
+    not negative, in an optimal solution no agent travels more than its shortest distance
+    plus the difference between the bound and the sum of all shortest distances
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        upper_bound (float): the objective of any solution, e.g. of heuristics.prioritized_planning().
+          By default there is no bound on the distances
+
+    Returns:
+        tuple: a tuple (arc_mask, node_mask) with a (len(w_arcs), len(agents)) boolean matrix,
+          whose rows are ordered by arc's idx, and a (len(nodes), len(agents)) one, True for
+          the arcs and nodes the agent may traverse
+    """
+
+    arc_bounds, node_bounds, shortest = path_bounds(nodes, w_arcs, agents)
+
+    if upper_bound is None:
+        longest = np.full(len(agents), np.inf)
+    else:
+        longest = shortest + max(upper_bound - shortest.sum(), 0)
+    longest = longest + _TOL * np.maximum(np.abs(longest), 1)
+
+    # infinite bounds, of arcs and nodes outside the cones, are never kept
+    return (np.isfinite(arc_bounds) & (arc_bounds <= longest),
+            np.isfinite(node_bounds) & (node_bounds <= longest))
+
+
+class Presolve:
+    """Class to represent a description reduced by the presolve, and map its solutions back
+
+    Blocks of variables of the reduced description keep their names but are flat, with the
+    surviving variables in their original order. Removed variables are fixed to 0
+
+    Attributes:
+        original (MILPDescription): the description before the presolve
+        description (MILPDescription): the reduced description
+        kept_cols (np.ndarray): the column, in the original description, of each variable kept
+        kept_rows (dict): the positions of the rows kept of each family of constraints
+        num_pruned_vars (int): number of variables removed
+        num_pruned_constrs (int): number of constraints removed
+    """
+
+    def __init__(self, original, description, kept_cols, kept_rows):
+        """Initialize the instance based on the outcome of the presolve
+
+        Args:
+            original (MILPDescription): the description before the presolve
+            description (MILPDescription): the reduced description
+            kept_cols (np.ndarray): the original column of each variable kept
+            kept_rows (dict): the positions of the rows kept of each family of constraints
+        """
+
+        self.original = original
+        self.description = description
+        self.kept_cols = kept_cols
+        self.kept_rows = kept_rows
+        self.num_pruned_vars = original.num_vars - len(kept_cols)
+        self.num_pruned_constrs = (sum(A.shape[0] for _, A, *_ in original.constr_families)
+                                   - sum(len(rows) for rows in kept_rows.values()))
+
+    def __repr__(self):
+        """Return the representation of the presolve instance"""
+
+        return (f"{self.__class__.__name__}(num_vars={self.description.num_vars!r}, "
+                f"num_pruned_vars={self.num_pruned_vars!r}, num_pruned_constrs={self.num_pruned_constrs!r})")
+
+    def expand(self, x):
+        """Map a solution of the reduced description to the original one
+
+        Args:
+            x (np.ndarray): the value of each variable of the reduced description
+
+        Returns:
+            np.ndarray: the value of each variable of the original description
+        """
+
+        full_x = np.zeros(self.original.num_vars)
+        full_x[self.kept_cols] = x
+
+        return full_x
+
+    def block_values(self, x, name):
+        """Extract the values of a block of variables, with its original shape, e.g. X as X.x
+
+        Args:
+            x (np.ndarray): the value of each variable of the reduced description
+            name (str): name of the block
+
+        Returns:
+            np.ndarray: the values, with the original shape of the block
+        """
+
+        return self.original.block_values(self.expand(x), name)
+
+
+def _activity_bounds(A, lb, ub):
+    """Compute the minimum and maximum value of each row of A x over the bounds of x"""
+
+    positive, negative = A.maximum(0), A.minimum(0)
+    finite_lb, finite_ub = np.where(np.isfinite(lb), lb, 0), np.where(np.isfinite(ub), ub, 0)
+
+    minimum = positive @ finite_lb + negative @ finite_ub
+    maximum = positive @ finite_ub + negative @ finite_lb
+    # an infinite bound with a non-zero coefficient makes the activity unbounded
+    infinite_lb, infinite_ub = (~np.isfinite(lb)).astype(float), (~np.isfinite(ub)).astype(float)
+    minimum[positive @ infinite_lb - negative @ infinite_ub > 0] = -np.inf
+    maximum[positive @ infinite_ub - negative @ infinite_lb > 0] = np.inf
+
+    return minimum, maximum
+
+
+def presolve_description(description, fixed_cols):
+    """Remove from a description some variables fixed to 0, and what becomes useless
+
+    Then, until nothing changes, rows satisfied by any value of their remaining variables are
+    removed, as well as the variables with lower bound 0, non-negative objective coefficients
+    and in no remaining row, that are fixed to 0
+
+    Args:
+        description (MILPDescription): the description of the problem
+        fixed_cols (np.ndarray): the columns of the variables fixed to 0
+
+    Returns:
+        Presolve: the reduced description, with the map of its solutions back to the original one
+    """
+
+    A, row_lb, row_ub = description.constraints()
+    lb, ub, _ = description.bounds()
+    costs = np.array([description.objective_vector(index) for index in range(len(description.objectives))])
+    removable = (lb == 0) & (costs >= 0).all(axis=0)
+
+    kept = np.ones(description.num_vars, dtype=bool)
+    kept[fixed_cols] = False
+    live_rows = np.ones(A.shape[0], dtype=bool)
+    while True:
+        # removed variables are 0, so their coefficients no longer count
+        reduced_A = A[live_rows] @ sparse.diags(kept.astype(float))
+        minimum, maximum = _activity_bounds(reduced_A, lb, ub)
+        if ((minimum > row_ub[live_rows] + _TOL) | (maximum < row_lb[live_rows] - _TOL)).any():
+            raise ValueError("The problem is infeasible once the variables are fixed")
+
+        redundant = (minimum >= row_lb[live_rows] - _TOL) & (maximum <= row_ub[live_rows] + _TOL)
+        live_rows[np.flatnonzero(live_rows)[redundant]] = False
+
+        used = np.asarray(abs(A[live_rows]).sum(axis=0)).ravel() > 0
+        unused = kept & removable & ~used
+        if not redundant.any() and not unused.any():
+            break
+        kept &= ~unused
+
+    return _reduced_description(description, np.flatnonzero(kept), live_rows)
+
+
+def _reduced_description(description, kept_cols, live_rows):
+    """Build the description with only the given columns and rows, see presolve_description()"""
+
+    new_cols = np.full(description.num_vars, -1)
+    new_cols[kept_cols] = np.arange(len(kept_cols))
+
+    reduced = problem_model.MILPDescription()
+    for name, shape, vtype, lb, ub in description.var_blocks:
+        block_cols = description.columns(name).ravel()
+        in_block = new_cols[block_cols] >= 0
+        block_lb = np.broadcast_to(np.asarray(lb, dtype=float), shape).ravel()[in_block]
+        block_ub = np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel()[in_block]
+        reduced.add_vars(name, int(in_block.sum()), vtype, block_lb, block_ub)
+
+    for name, cols, coeffs in description.objectives:
+        kept_terms = new_cols[cols] >= 0
+        reduced.add_objective(name, new_cols[cols][kept_terms], coeffs[kept_terms])
+
+    kept_rows, first_row = {}, 0
+    for name, A, sense, rhs in description.constr_families:
+        family_rows = np.flatnonzero(live_rows[first_row:first_row + A.shape[0]])
+        first_row += A.shape[0]
+        kept_rows[name] = family_rows
+        if len(family_rows) == 0:
+            continue
+
+        A = A.tocsr(copy=True)
+        A.resize((A.shape[0], description.num_vars))
+        sense = np.broadcast_to(sense, rhs.shape)[family_rows]
+        reduced.add_constrs(name, A[family_rows][:, kept_cols], sense, rhs[family_rows])
+
+    reduced.build_times = description.build_times
+
+    return Presolve(description, reduced, kept_cols, kept_rows)
+
+
+def describe_presolved_problem(problem_type, nodes, w_arcs, agents, penalty_formulation="pairs", upper_bound=None):
+    """Describe the specified optimization problem with only the arcs and nodes each agent may traverse
+
+    X variables of the arcs outside the agent's cones, see prune_masks(), and R variables of
+    its nodes are removed, then presolve_description() removes what becomes useless
+
+    Args:
+        problem_type (str): The optimization problem to describe. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the quadratic penalties are linearized, see
+          problem_model.set_AQP() (default is "pairs")
+        upper_bound (float): an upper bound of the optimal objective, to prune by distance, see
+          prune_masks(). By default arcs are pruned only by reachability
+
+    Returns:
+        Presolve: the reduced description of the problem
+    """
+
+    description = problem_model.describe_problem(problem_type, nodes, w_arcs, agents, penalty_formulation)
+    arc_mask, node_mask = prune_masks(nodes, w_arcs, agents, upper_bound)
+    agent_idxs, *_ = problem_model._agent_arrays(agents)
+
+    fixed_cols = [description.columns("X")[:, agent_idxs][~arc_mask]]
+    if any(name == "R" for name, *_ in description.var_blocks):
+        fixed_cols.append(description.columns("R")[np.ix_(np.asarray(nodes, dtype=int), agent_idxs)][~node_mask])
+
+    return presolve_description(description, np.concatenate(fixed_cols))
+
+
+def set_presolved_problem(problem_type, nodes, w_arcs, agents, penalty_formulation="pairs", dominance=False,
+                          env=None):
+    """Formulate the specified optimization problem with only the arcs and nodes each agent may traverse
+
+    The solution of the reduced problem is mapped back by
+    presolve.block_values(Problem.getAttr("X", Problem.getVars()), "X"), giving X.x as the one
+    of the problem of problem_model.set_problem()
+
+    Args:
+        problem_type (str): The optimization problem to formulate. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the quadratic penalties are linearized, see
+          problem_model.set_AQP() (default is "pairs")
+        dominance (bool): if True, arcs are also pruned by distance, with the bound of the paths of
+          heuristics.prioritized_planning(). Valid for the blended objectives only (default is False)
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        tuple: a tuple (Problem, presolve, *_) where:
+          - Problem is a gb.Model that represent the reduced problem
+          - presolve is the Presolve mapping its solutions back
+          - *_ are the gb.MVar, flat, containing the variables kept of each block
+    """
+
+    upper_bound = None
+    if dominance:
+        x = heuristics.prioritized_planning(problem_type, nodes, w_arcs, agents)
+        upper_bound = sum(heuristics.evaluate_paths(problem_type, x, nodes, w_arcs, agents))
+
+    presolve = describe_presolved_problem(problem_type, nodes, w_arcs, agents, penalty_formulation, upper_bound)
+    problem, *variables = problem_model.to_gurobi_model(presolve.description, env=env)
+
+    return (problem, presolve, *variables)
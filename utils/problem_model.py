@@ -1,84 +1,1129 @@
 """Module that contains useful functions to create or deal with MSPPs and MSPP-PDs"""
+from . import time
+from . import np
+from . import sparse
 from . import gb
 from . import GRB
+from . import data_generator
 
 
-def _compute_flow(X, node, w_arcs, agent):
-    """Compute the flow in a given node for a particular agent
+def _arc_arrays(w_arcs):
+    """Gather the data of the weighted arcs into arrays that follow the order of the list
 
-    The flow is defined as the difference between outgoing and ingoing edges traversed by the agent in that node
+    Args:
+        w_arcs (list): list of weighted arcs that represent the network instance
+
+    Returns:
+        tuple: a tuple (idxs, tails, heads, weights) of np.ndarray containing respectively
+          the identifier, the starting node, the ending node and the weight of each arc
+    """
+
+    if isinstance(w_arcs, data_generator.NetworkInstance):  # already arrays, ordered by idx
+        return (np.arange(len(w_arcs)), w_arcs.network.tails.astype(int),
+                w_arcs.network.heads.astype(int), w_arcs.weights)
+
+    idxs = np.fromiter((arc.idx for arc in w_arcs), dtype=int, count=len(w_arcs))
+    tails = np.fromiter((arc.i for arc in w_arcs), dtype=int, count=len(w_arcs))
+    heads = np.fromiter((arc.j for arc in w_arcs), dtype=int, count=len(w_arcs))
+    weights = np.fromiter((arc.w for arc in w_arcs), dtype=float, count=len(w_arcs))
+
+    return idxs, tails, heads, weights
+
+
+def _agent_arrays(agents):
+    """Gather the data of the agents into arrays that follow the order of the list
+
+    Args:
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        tuple: a tuple (idxs, sources, termini) of np.ndarray containing respectively
+          the identifier, the source node and the terminus node of each agent
+    """
+
+    idxs = np.fromiter((agent.idx for agent in agents), dtype=int, count=len(agents))
+    sources = np.fromiter((agent.source for agent in agents), dtype=int, count=len(agents))
+    termini = np.fromiter((agent.terminus for agent in agents), dtype=int, count=len(agents))
+
+    return idxs, sources, termini
+
+
+def _agent_pairs(agents):
+    """Gives the identifiers of the pairs of agents penalized by the quadratic penalties
+
+    Pairs are listed in the same order of the nested loops over the agents used in the paper,
+    i.e. (agent, agent_) with agent_.idx < agent.idx
+
+    Args:
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        np.ndarray: a (num_of_pairs, 2) matrix whose rows are (agent.idx, agent_.idx)
+    """
+
+    idxs, *_ = _agent_arrays(agents)
+    first, second = np.meshgrid(idxs, idxs, indexing="ij")
+    is_pair = second < first
+
+    return np.column_stack([first[is_pair], second[is_pair]])
+
+
+def _incidence_matrix(nodes, w_arcs):
+    """Compute the node-arc incidence matrix of a network instance
+
+    The entry (node, arc.idx) is 1 if the arc leaves the node and -1 if the arc enters the node.
+    As done for the variables indexed by nodes, rows are indexed by the nodes themselves
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs that represent the network instance
+
+    Returns:
+        sparse.csr_matrix: a (len(nodes), len(w_arcs)) sparse incidence matrix
+    """
+
+    idxs, tails, heads, _ = _arc_arrays(w_arcs)
+    coeffs = np.concatenate([np.ones(len(idxs)), -np.ones(len(idxs))])
+
+    return sparse.csr_matrix((coeffs, (np.concatenate([tails, heads]), np.concatenate([idxs, idxs]))),
+                             shape=(len(nodes), len(w_arcs)))
+
+
+def _fixed_width_matrix(cols, coeffs, num_cols):
+    """Build a constraint matrix whose rows have the same number of terms
+
+    Args:
+        cols (np.ndarray): a (num_of_rows, num_of_terms) matrix with the columns of each row's terms
+        coeffs (np.ndarray): the terms' coefficients, broadcastable to the shape of cols
+        num_cols (int): number of columns of the matrix
+
+    Returns:
+        sparse.csr_matrix: the constraint matrix
+    """
+
+    num_rows, num_terms = cols.shape
+    rows = np.repeat(np.arange(num_rows), num_terms)
+    coeffs = np.broadcast_to(coeffs, cols.shape)
+
+    return sparse.csr_matrix((coeffs.ravel(), (rows, cols.ravel())), shape=(num_rows, num_cols))
+
+
+def _linear_expr(model, cols, coeffs):
+    """Build the linear expression having the given coefficients on some of the model's variables
+
+    Args:
+        model (gb.Model): the model the expression refers to
+        cols (np.ndarray): columns of the variables within the model
+        coeffs (np.ndarray): the variables' coefficients, broadcastable to the shape of cols
+
+    Returns:
+        gb.LinExpr: the linear expression
+    """
+
+    model.update()
+    variables = model.getVars()
+    coeffs = np.broadcast_to(coeffs, cols.shape)
+
+    return gb.LinExpr(coeffs.ravel().tolist(), [variables[col] for col in cols.ravel()])
+
+
+def _add_constrs(model, A, sense, rhs):
+    """Add a whole family of linear constraints to a model with a single matrix call
+
+    Args:
+        model (gb.Model): the model to which constraints are added
+        A (sparse.csr_matrix): the constraint matrix, with a column for each of the first variables of the model
+        sense (str or np.ndarray): the sense of all the constraints or of each of them
+        rhs (np.ndarray): the right-hand side of each constraint
+
+    Returns:
+        gb.MConstr: the added constraints
+    """
+
+    model.update()
+    A = A.tocsr(copy=True)
+    A.resize((A.shape[0], model.NumVars))  # columns of variables added afterwards
+    A.eliminate_zeros()
+
+    return model.addMConstr(A, None, sense, np.asarray(rhs, dtype=float))
+
+
+def _flow_constraints(nodes, w_arcs, agents, X_cols, num_cols):
+    """Build the flow constraints (4) of every agent at every node
+
+    Constraints are ordered by agent and then by node, i.e. as if they were added looping over
+    the agents and, for each agent, over the nodes
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs that represent the network instance
+        agents (list): list of agents that has to be routed
+        X_cols (np.ndarray): columns of the X decision variables within the model
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    agent_idxs, sources, termini = _agent_arrays(agents)
+    node_labels = np.asarray(nodes, dtype=int)
+    incidence = _incidence_matrix(nodes, w_arcs)[node_labels].tocoo()
+
+    # one copy of the incidence matrix for each agent, acting on the agent's column of X
+    agent_pos = np.repeat(np.arange(len(agents)), incidence.nnz)
+    rows = agent_pos * len(nodes) + np.tile(incidence.row, len(agents))
+    cols = X_cols[np.tile(incidence.col, len(agents)), agent_idxs[agent_pos]]
+    A = sparse.csr_matrix((np.tile(incidence.data, len(agents)), (rows, cols)),
+                          shape=(len(agents) * len(nodes), num_cols))
+
+    # +1 on the source, -1 on the terminus, 0 elsewhere (the source wins if they coincide)
+    rhs = np.zeros((len(agents), len(nodes)))
+    rhs[termini[:, None] == node_labels[None, :]] = -1
+    rhs[sources[:, None] == node_labels[None, :]] = 1
+
+    return A, GRB.EQUAL, rhs.ravel()
+
+
+def _sharing_constraints(usage_cols, penalty_cols, num_cols, num_agents=None):
+    """Build the constraints (7,12) that turn on a binary penalty when an arc/node is used by more than one agent
+
+    Args:
+        usage_cols (np.ndarray): a (num_of_elements, num_of_agents) matrix with the columns of the
+          variables telling if an agent uses an element (arc or node) of the network
+        penalty_cols (np.ndarray): the columns of the penalty variable of each element
+        num_cols (int): number of variables of the model
+        num_agents (int): number of agents. By default it is the number of columns of usage_cols,
+          it differs when they are the flows of commodities
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    num_elements, num_usage_cols = usage_cols.shape
+    if num_agents is None:
+        num_agents = num_usage_cols
+    cols = np.column_stack([usage_cols, penalty_cols])
+    coeffs = np.append(np.full(num_usage_cols, 1/num_agents), -1)
+
+    return (_fixed_width_matrix(cols, coeffs, num_cols),
+            GRB.LESS_EQUAL,
+            np.full(num_elements, 1/num_agents))
+
+
+def _any_use_constraints(usage_cols, indicator_cols, num_cols, num_agents=None):
+    """Build the constraints (16,19) that turn on an indicator iff an arc/node is used by any agent
+
+    The two constraints of each element are adjacent
+
+    Args:
+        usage_cols (np.ndarray): a (num_of_elements, num_of_agents) matrix with the columns of the
+          variables telling if an agent uses an element (arc or node) of the network
+        indicator_cols (np.ndarray): the columns of the indicator variable of each element
+        num_cols (int): number of variables of the model
+        num_agents (int): number of agents. By default it is the number of columns of usage_cols,
+          it differs when they are the flows of commodities
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    num_elements, num_usage_cols = usage_cols.shape
+    if num_agents is None:
+        num_agents = num_usage_cols
+    cols = np.column_stack([usage_cols, indicator_cols])
+    cols = np.stack([cols, cols], axis=1).reshape(2 * num_elements, num_usage_cols + 1)
+    coeffs = np.array([np.append(np.full(num_usage_cols, 1/num_agents), -1),
+                       np.append(np.full(num_usage_cols, -1.0), 1)])
+
+    return (_fixed_width_matrix(cols, np.tile(coeffs, (num_elements, 1)), num_cols),
+            GRB.LESS_EQUAL,
+            np.zeros(2 * num_elements))
+
+
+def _pair_constraints(usage_cols, pair_cols, pairs, num_cols):
+    """Build the constraints (23-25,30-32) that linearize the product of the usage of two agents
+
+    The three constraints of each (element, pair) are adjacent
+
+    Args:
+        usage_cols (np.ndarray): a (num_of_elements, num_of_agents) matrix with the columns of the
+          variables telling if an agent, by idx, uses an element (arc or node) of the network
+        pair_cols (np.ndarray): a (num_of_elements, num_of_agents, num_of_agents) array with the
+          columns of the variables that linearize the products
+        pairs (np.ndarray): the (agent.idx, agent_.idx) pairs to linearize
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    first, second = pairs[:, 0], pairs[:, 1]
+    product_cols = pair_cols[:, first, second]
+    cols = np.stack([product_cols, usage_cols[:, first], usage_cols[:, second]], axis=2)
+    cols = np.broadcast_to(cols[:, :, None, :], cols.shape[:2] + (3, 3))
+
+    # z <= x, z <= x_, z >= x + x_ - 1
+    coeffs = np.array([[1, -1, 0], [1, 0, -1], [1, -1, -1]])
+    num_constrs = cols.shape[0] * cols.shape[1] * 3
+
+    return (_fixed_width_matrix(cols.reshape(-1, 3), np.tile(coeffs, (num_constrs // 3, 1)), num_cols),
+            np.tile(np.array([GRB.LESS_EQUAL, GRB.LESS_EQUAL, GRB.GREATER_EQUAL]), num_constrs // 3),
+            np.tile([0, 0, -1], num_constrs // 3))
+
+
+def _count_constraints(usage_cols, penalty_cols, num_cols):
+    """Build the constraints that bound a penalty by the number of pairs of agents sharing an arc/node
+
+    With n agents using an element, the pairs are n(n-1)/2, a convex function of n that, on
+    integers, is the maximum of the lines through its values in m and m+1 (m = 0..K-1):
+    p >= m*n - m(m+1)/2. The line with m = 0 is the lower bound of p. The constraints of each
+    element are adjacent
+
+    Args:
+        usage_cols (np.ndarray): a (num_of_elements, num_of_agents) matrix with the columns of the
+          variables telling if an agent uses an element (arc or node) of the network
+        penalty_cols (np.ndarray): the columns of the penalty variable of each element
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    num_elements, num_agents = usage_cols.shape
+    slopes = np.arange(1, num_agents)
+
+    cols = np.column_stack([usage_cols, penalty_cols])
+    cols = np.repeat(cols, len(slopes), axis=0)
+    coeffs = np.column_stack([np.repeat(-slopes[:, None], num_agents, axis=1),
+                              np.ones(len(slopes))])
+
+    return (_fixed_width_matrix(cols, np.tile(coeffs, (num_elements, 1)), num_cols),
+            GRB.GREATER_EQUAL,
+            np.tile(-slopes * (slopes + 1) / 2, num_elements))
+
+
+def _arc_to_node_constraints(w_arcs, agents, X_cols, R_cols, num_cols):
+    """Build the constraints (10,11) that turn on r_i when an agent traverses an arc leaving or entering node i
+
+    Constraints are ordered by arc, then by agent and then by tail/head of the arc
+
+    Args:
+        w_arcs (list): list of weighted arcs that represent the network instance
+        agents (list): list of agents that has to be routed
+        X_cols (np.ndarray): columns of the X decision variables within the model
+        R_cols (np.ndarray): columns of the R decision variables within the model
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    arc_idxs, tails, heads, _ = _arc_arrays(w_arcs)
+    agent_idxs, *_ = _agent_arrays(agents)
+
+    arc_X = X_cols[np.ix_(arc_idxs, agent_idxs)]
+    end_R = np.stack([R_cols[np.ix_(tails, agent_idxs)],
+                      R_cols[np.ix_(heads, agent_idxs)]], axis=2)
+    cols = np.stack([np.broadcast_to(arc_X[:, :, None], end_R.shape), end_R], axis=3)
+    A = _fixed_width_matrix(cols.reshape(-1, 2), np.array([-1, 1]), num_cols)
+
+    return A, GRB.GREATER_EQUAL, np.zeros(A.shape[0])
+
+
+def _node_to_arc_constraints(nodes, w_arcs, agents, X_cols, R_cols, num_cols):
+    """Build the constraints (29) that turn off r_i when an agent traverses no arc leaving or entering node i
+
+    Constraints are ordered by node and then by agent
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs that represent the network instance
+        agents (list): list of agents that has to be routed
+        X_cols (np.ndarray): columns of the X decision variables within the model
+        R_cols (np.ndarray): columns of the R decision variables within the model
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    agent_idxs, *_ = _agent_arrays(agents)
+    node_labels = np.asarray(nodes, dtype=int)
+    touching = abs(_incidence_matrix(nodes, w_arcs)[node_labels]).tocoo()
+
+    # -x for each arc touching the node...
+    agent_pos = np.tile(np.arange(len(agents)), touching.nnz)
+    arc_rows = np.repeat(touching.row, len(agents)) * len(agents) + agent_pos
+    arc_cols = X_cols[np.repeat(touching.col, len(agents)), agent_idxs[agent_pos]]
+
+    # ... and +r for the node itself
+    node_rows = np.arange(len(nodes) * len(agents))
+    node_cols = R_cols[np.ix_(node_labels, agent_idxs)].ravel()
+
+    A = sparse.csr_matrix((np.concatenate([-np.ones(len(arc_rows)), np.ones(len(node_rows))]),
+                           (np.concatenate([arc_rows, node_rows]), np.concatenate([arc_cols, node_cols]))),
+                          shape=(len(node_rows), num_cols))
+
+    return A, GRB.LESS_EQUAL, np.zeros(len(node_rows))
+
+
+class MILPDescription:
+    """Class to represent a MSPP or MSPP-PD as a plain sparse mixed integer linear program
+
+    The description does not depend on any solver. Variables are stacked in named blocks, that
+    become the gb.MVar of a Gurobi model, and constraints in named families of rows sharing
+    the same meaning
+
+    Attributes:
+        var_blocks (list): list of (name, shape, vtype, lb, ub) of each block of variables
+        objectives (list): list of (name, cols, coeffs) of each objective, ordered by index
+        constr_families (list): list of (name, A, sense, rhs) of each family of constraints
+        num_vars (int): number of variables
+        build_times (dict): time (s) spent building each block of variables, objective and
+          family of constraints, i.e. since the previous one was added
+    """
+
+    def __init__(self):
+        """Initialize an empty description"""
+
+        self.var_blocks = []
+        self.objectives = []
+        self.constr_families = []
+        self.num_vars = 0
+        self.build_times = {}
+        self._block_cols = {}
+        self._last_added = time.perf_counter()
+
+    def _record_build_time(self, name):
+        """Record the time spent building a part of the description"""
+
+        now = time.perf_counter()
+        self.build_times[name] = self.build_times.get(name, 0.0) + now - self._last_added
+        self._last_added = now
+
+    def __repr__(self):
+        """Return the representation of the description instance"""
+
+        blocks = [name for name, *_ in self.var_blocks]
+        return f"{self.__class__.__name__}(blocks={blocks!r}, num_vars={self.num_vars!r})"
+
+    def add_vars(self, name, shape, vtype=GRB.BINARY, lb=0.0, ub=GRB.INFINITY):
+        """Add a block of variables
+
+        Args:
+            name (str): name of the block
+            shape (int or tuple): shape of the block
+            vtype (str): type of the variables, as GRB.BINARY, GRB.INTEGER or GRB.CONTINUOUS
+            lb (float or np.ndarray): lower bound of the variables (default is 0)
+            ub (float or np.ndarray): upper bound of the variables (default is no bound)
+
+        Returns:
+            np.ndarray: an array, with the given shape, containing the columns of the variables
+        """
+
+        shape = tuple(np.atleast_1d(shape).tolist())
+        size = int(np.prod(shape))
+        cols = np.arange(self.num_vars, self.num_vars + size).reshape(shape)
+
+        self.var_blocks.append((name, shape, vtype, lb, ub))
+        self._block_cols[name] = cols
+        self.num_vars += size
+        self._record_build_time(f"{name} variables")
+
+        return cols
+
+    def columns(self, name):
+        """Gives the columns of a block of variables
+
+        Args:
+            name (str): name of the block
+
+        Returns:
+            np.ndarray: an array, with the shape of the block, containing the columns of its variables
+        """
+
+        return self._block_cols[name]
+
+    def add_objective(self, name, cols, coeffs):
+        """Add an objective, that will have the next index
+
+        Args:
+            name (str): name of the objective
+            cols (np.ndarray): columns of the variables in the objective
+            coeffs (np.ndarray): the variables' coefficients, broadcastable to the shape of cols
+        """
+
+        self.objectives.append((name, cols, np.broadcast_to(coeffs, cols.shape)))
+        self._record_build_time(f"{name} objective")
+
+    def add_constrs(self, name, A, sense, rhs):
+        """Add a family of constraints
+
+        Args:
+            name (str): name of the family
+            A (sparse.csr_matrix): the constraint matrix, with a column for each variable added so far
+            sense (str or np.ndarray): the sense of all the constraints or of each of them
+            rhs (np.ndarray): the right-hand side of each constraint
+        """
+
+        self.constr_families.append((name, A, sense, np.asarray(rhs, dtype=float)))
+        self._record_build_time(name)
+
+    def objective_vector(self, index):
+        """Gives the dense coefficients' vector of an objective
+
+        Args:
+            index (int): index of the objective
+
+        Returns:
+            np.ndarray: the coefficient of each variable in the objective
+        """
+
+        _, cols, coeffs = self.objectives[index]
+        c = np.zeros(self.num_vars)
+        np.add.at(c, cols.ravel(), coeffs.ravel())
+
+        return c
+
+    def constraints(self):
+        """Gives all the constraints as a single two-sided system lb <= A x <= ub
+
+        Returns:
+            tuple: a tuple (A, lb, ub) with the sparse constraint matrix and the bounds of each row
+        """
+
+        blocks, lbs, ubs = [], [], []
+        for _, A, sense, rhs in self.constr_families:
+            sense = np.broadcast_to(sense, rhs.shape)
+            lbs.append(np.where(sense == GRB.LESS_EQUAL, -np.inf, rhs))
+            ubs.append(np.where(sense == GRB.GREATER_EQUAL, np.inf, rhs))
+            A = A.tocsr(copy=True)
+            A.resize((A.shape[0], self.num_vars))
+            blocks.append(A)
+
+        return sparse.vstack(blocks, format="csr"), np.concatenate(lbs), np.concatenate(ubs)
+
+    def bounds(self):
+        """Gives the bounds and the integrality of the variables
+
+        Returns:
+            tuple: a tuple (lb, ub, integrality) of np.ndarray with the bounds of each variable
+              and 1 for integer (or binary) variables, 0 for continuous ones
+        """
+
+        lbs, ubs, integralities = [], [], []
+        for _, shape, vtype, lb, ub in self.var_blocks:
+            size = int(np.prod(shape))
+            lbs.append(np.broadcast_to(np.asarray(lb, dtype=float), shape).ravel())
+            ubs.append(np.full(size, 1.0) if vtype == GRB.BINARY
+                       else np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel())
+            integralities.append(np.full(size, int(vtype != GRB.CONTINUOUS)))
+
+        return np.concatenate(lbs), np.concatenate(ubs), np.concatenate(integralities)
+
+    def block_values(self, x, name):
+        """Extract the values of a block of variables from a solution
+
+        Args:
+            x (np.ndarray): the value of each variable
+            name (str): name of the block
+
+        Returns:
+            np.ndarray: the values, with the shape of the block
+        """
+
+        return np.asarray(x)[self.columns(name)]
+
+
+def start_env(**params):
+    """Start a Gurobi environment to be shared by many models
+
+    Models created in an environment inherit its parameters, so they are set once, and the
+    license is checked once instead of for every model, e.g. in each worker of batch_solver
+
+    Args:
+        **params: Gurobi's parameters of the environment, e.g. Threads=1, TimeLimit=60
+
+    Returns:
+        gb.Env: the started environment, with no output
+    """
+
+    env = gb.Env(empty=True)
+    env.setParam("OutputFlag", 0)
+    for name, value in params.items():
+        env.setParam(name, value)
+    env.start()
+
+    return env
+
+
+def to_gurobi_model(description, load_times=None, env=None):
+    """Create a Gurobi model from the description of a problem
+
+    Args:
+        description (MILPDescription): the description of the problem
+        load_times (dict): if given, it is filled with the time (s) spent loading the
+          variables, the objectives and each family of constraints into the model
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        tuple: a tuple (Problem, *_) where
+          - Problem is a gb.Model that represent the described problem
+          - *_ are the gb.MVar containing the variables of each block, in order
+    """
+
+    if load_times is None:
+        load_times = {}
+
+    problem = gb.Model(env=env)
+    problem.setParam("OutputFlag", 0)
+
+    start = time.perf_counter()
+    mvars = [problem.addMVar(shape, vtype=vtype, lb=lb, ub=ub, name=name)
+             for name, shape, vtype, lb, ub in description.var_blocks]
+    load_times["variables"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for index, (name, cols, coeffs) in enumerate(description.objectives):
+        problem.setObjectiveN(_linear_expr(problem, cols, coeffs),
+                              index=index, weight=1, name=name)
+    load_times["objectives"] = time.perf_counter() - start
+
+    for name, A, sense, rhs in description.constr_families:
+        start = time.perf_counter()
+        _add_constrs(problem, A, sense, rhs)
+        load_times[name] = load_times.get(name, 0.0) + time.perf_counter() - start
+
+    return (problem, *mvars)
+
+
+def _describe_MSPP(nodes, w_arcs, agents):
+    """Describe a MSPP for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        MILPDescription: the description of the MSPP, with the block of variables X
+    """
+
+    MSPP_pb = MILPDescription()
+
+    # Decision variables
+    X_var_shape = len(w_arcs), len(agents)
+    X_cols = MSPP_pb.add_vars("X", X_var_shape,
+                              vtype=GRB.BINARY)  # 5) Binary constraints
+
+    arc_idxs, _, _, weights = _arc_arrays(w_arcs)
+    agent_idxs, *_ = _agent_arrays(agents)
+
+    # 1-3) Objective
+    MSPP_pb.add_objective("Distance",
+                          X_cols[np.ix_(arc_idxs, agent_idxs)],
+                          weights[:, None])
+
+    # 4) Flow constraints
+    MSPP_pb.add_constrs("Flow",
+                        *_flow_constraints(nodes, w_arcs, agents, X_cols, MSPP_pb.num_vars))
+
+    return MSPP_pb
+
+
+def _describe_ABP(nodes, w_arcs, agents):
+    """Describe a MSPP-PD(ABP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(ABP), with the blocks of variables X and Psi
+    """
+
+    MSPP_PD_ABP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_ABP_pb.columns("X")
+
+    # Additional decision variables
+    Psi_var_shape = len(w_arcs)
+    Psi_cols = MSPP_PD_ABP_pb.add_vars("Psi", Psi_var_shape,
+                                       vtype=GRB.BINARY)  # 8) Binary constraints
+
+    arc_idxs, *_ = _arc_arrays(w_arcs)
+    agent_idxs, *_ = _agent_arrays(agents)
+
+    # 6) Additional objective
+    MSPP_PD_ABP_pb.add_objective("Penalty", Psi_cols[arc_idxs], 1)
+
+    # 7) Additonal constraints
+    MSPP_PD_ABP_pb.add_constrs("Arc sharing",
+                               *_sharing_constraints(X_cols[np.ix_(arc_idxs, agent_idxs)],
+                                                     Psi_cols[arc_idxs],
+                                                     MSPP_PD_ABP_pb.num_vars))
+
+    return MSPP_PD_ABP_pb
+
+
+def _describe_NBP(nodes, w_arcs, agents):
+    """Describe a MSPP-PD(NBP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(NBP), with the blocks of variables X, R and Zeta
+    """
+
+    MSPP_PD_NBP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_NBP_pb.columns("X")
+
+    # Additional decision variables
+    R_var_shape = len(nodes), len(agents)
+    R_cols = MSPP_PD_NBP_pb.add_vars("R", R_var_shape,
+                                     vtype=GRB.BINARY)  # 13) Binary constraints
+    Zeta_var_shape = len(nodes)
+    Zeta_cols = MSPP_PD_NBP_pb.add_vars("Zeta", Zeta_var_shape,
+                                        vtype=GRB.BINARY)  # 14) Binary constraints
+
+    node_labels = np.asarray(nodes, dtype=int)
+    agent_idxs, *_ = _agent_arrays(agents)
+
+    # 9) Additional objective
+    MSPP_PD_NBP_pb.add_objective("Penalty", Zeta_cols[node_labels], 1)
+
+    # 10,11) Turning on r_i constraints
+    MSPP_PD_NBP_pb.add_constrs("Arc to node",
+                               *_arc_to_node_constraints(w_arcs, agents, X_cols, R_cols,
+                                                         MSPP_PD_NBP_pb.num_vars))
+
+    # 12) Turning on xi_i constraints
+    # ! Different from paper. Paper seems weird, the -1 should be outside the summation
+    MSPP_PD_NBP_pb.add_constrs("Node sharing",
+                               *_sharing_constraints(R_cols[np.ix_(node_labels, agent_idxs)],
+                                                     Zeta_cols[node_labels],
+                                                     MSPP_PD_NBP_pb.num_vars))
+
+    return MSPP_PD_NBP_pb
+
+
+def _describe_ALP(nodes, w_arcs, agents):
+    """Describe a MSPP-PD(ALP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(ALP), with the blocks of variables X and Eps
+    """
+
+    MSPP_PD_ALP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_ALP_pb.columns("X")
+
+    # Additional decision variables
+    Eps_var_shape = len(w_arcs)
+    Eps_cols = MSPP_PD_ALP_pb.add_vars("Eps", Eps_var_shape,
+                                       vtype=GRB.BINARY)  # 17) Binary constraints
+
+    arc_idxs, *_ = _arc_arrays(w_arcs)
+    agent_idxs, *_ = _agent_arrays(agents)
+    usage_cols = X_cols[np.ix_(arc_idxs, agent_idxs)]
+
+    # 15) Additional objective
+    MSPP_PD_ALP_pb.add_objective("Penalty",
+                                 np.column_stack([Eps_cols[arc_idxs], usage_cols]),
+                                 np.append(-1, np.ones(len(agents))))
+
+    # 16) Turning on eps_i constraints
+    MSPP_PD_ALP_pb.add_constrs("Arc use",
+                               *_any_use_constraints(usage_cols, Eps_cols[arc_idxs],
+                                                     MSPP_PD_ALP_pb.num_vars))
+
+    return MSPP_PD_ALP_pb
+
+
+def _describe_NLP(nodes, w_arcs, agents):
+    """Describe a MSPP-PD(NLP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(NLP), with the blocks of variables X, R and Theta
+    """
+
+    MSPP_PD_NLP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_NLP_pb.columns("X")
+
+    # Additional decision variables
+    R_var_shape = len(nodes), len(agents)
+    R_cols = MSPP_PD_NLP_pb.add_vars("R", R_var_shape,
+                                     vtype=GRB.BINARY)  # 13) Binary constraints
+    Theta_var_shape = len(nodes)
+    Theta_cols = MSPP_PD_NLP_pb.add_vars("Theta", Theta_var_shape,
+                                         vtype=GRB.BINARY)  # 20) Binary constraints
+
+    node_labels = np.asarray(nodes, dtype=int)
+    agent_idxs, *_ = _agent_arrays(agents)
+    usage_cols = R_cols[np.ix_(node_labels, agent_idxs)]
+
+    # 18) Additional objective
+    MSPP_PD_NLP_pb.add_objective("Penalty",
+                                 np.column_stack([Theta_cols[node_labels], usage_cols]),
+                                 np.append(-1, np.ones(len(agents))))
+
+    # 10,11) Turning on r_i constraints
+    MSPP_PD_NLP_pb.add_constrs("Arc to node",
+                               *_arc_to_node_constraints(w_arcs, agents, X_cols, R_cols,
+                                                         MSPP_PD_NLP_pb.num_vars))
+
+    # 19) Turning on theta_i constraints
+    MSPP_PD_NLP_pb.add_constrs("Node use",
+                               *_any_use_constraints(usage_cols, Theta_cols[node_labels],
+                                                     MSPP_PD_NLP_pb.num_vars))
+
+    return MSPP_PD_NLP_pb
+
+
+def _describe_AQP(nodes, w_arcs, agents, penalty_formulation="pairs"):
+    """Describe a MSPP-PD(AQP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the penalty is linearized, see set_AQP() (default is "pairs")
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(AQP), with the blocks of variables X and
+          Z, or X and Phi for the "counts" formulation
+    """
+
+    if penalty_formulation not in ("pairs", "counts"):
+        raise ValueError(f"Unknown penalty formulation {penalty_formulation!r}")
+
+    MSPP_PD_AQP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_AQP_pb.columns("X")
+    arc_idxs, *_ = _arc_arrays(w_arcs)
+
+    if penalty_formulation == "counts":
+        # Penalty of each arc, i.e. the number of pairs of agents traversing it
+        Phi_cols = MSPP_PD_AQP_pb.add_vars("Phi", len(w_arcs),
+                                           vtype=GRB.CONTINUOUS)
+
+        MSPP_PD_AQP_pb.add_objective("Penalty", Phi_cols[arc_idxs], 1)
+
+        MSPP_PD_AQP_pb.add_constrs("Arc counts",
+                                   *_count_constraints(X_cols[arc_idxs], Phi_cols[arc_idxs],
+                                                       MSPP_PD_AQP_pb.num_vars))
+
+        return MSPP_PD_AQP_pb
+
+    # Additional decision variables
+    Z_var_shape = len(w_arcs), len(agents), len(agents)
+    Z_cols = MSPP_PD_AQP_pb.add_vars("Z", Z_var_shape,
+                                     vtype=GRB.BINARY)  # 26) Binary constraints
+
+    pairs = _agent_pairs(agents)
+
+    # 22) Additional (linearized) objective
+    MSPP_PD_AQP_pb.add_objective("Penalty",
+                                 Z_cols[arc_idxs][:, pairs[:, 0], pairs[:, 1]],
+                                 1)
+
+    # 23-25) Well-defined Z variable
+    MSPP_PD_AQP_pb.add_constrs("Arc pairs",
+                               *_pair_constraints(X_cols[arc_idxs], Z_cols[arc_idxs], pairs,
+                                                  MSPP_PD_AQP_pb.num_vars))
+
+    return MSPP_PD_AQP_pb
+
+
+def _describe_NQP(nodes, w_arcs, agents, penalty_formulation="pairs"):
+    """Describe a MSPP-PD(NQP) for a network instance given the agents to route
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the penalty is linearized, see set_NQP() (default is "pairs")
+
+    Returns:
+        MILPDescription: the description of the MSPP-PD(NQP), with the blocks of variables X, R
+          and W, or X, R and Omega for the "counts" formulation
+    """
+
+    if penalty_formulation not in ("pairs", "counts"):
+        raise ValueError(f"Unknown penalty formulation {penalty_formulation!r}")
+
+    MSPP_PD_NQP_pb = _describe_MSPP(nodes, w_arcs, agents)
+    X_cols = MSPP_PD_NQP_pb.columns("X")
+
+    # Additional decision variables
+    R_var_shape = len(nodes), len(agents)
+    R_cols = MSPP_PD_NQP_pb.add_vars("R", R_var_shape,
+                                     vtype=GRB.BINARY)  # 13) Binary constraints
+
+    node_labels = np.asarray(nodes, dtype=int)
+
+    if penalty_formulation == "counts":
+        # Penalty of each node, i.e. the number of pairs of agents traversing it
+        Omega_cols = MSPP_PD_NQP_pb.add_vars("Omega", len(nodes),
+                                             vtype=GRB.CONTINUOUS)
+
+        MSPP_PD_NQP_pb.add_objective("Penalty", Omega_cols[node_labels], 1)
+
+        # 10,11) Turning on r_i constraints
+        MSPP_PD_NQP_pb.add_constrs("Arc to node",
+                                   *_arc_to_node_constraints(w_arcs, agents, X_cols, R_cols,
+                                                             MSPP_PD_NQP_pb.num_vars))
+
+        # 29) Turning off r_i constraints
+        MSPP_PD_NQP_pb.add_constrs("Node to arc",
+                                   *_node_to_arc_constraints(nodes, w_arcs, agents, X_cols, R_cols,
+                                                             MSPP_PD_NQP_pb.num_vars))
+
+        MSPP_PD_NQP_pb.add_constrs("Node counts",
+                                   *_count_constraints(R_cols[node_labels], Omega_cols[node_labels],
+                                                       MSPP_PD_NQP_pb.num_vars))
+
+        return MSPP_PD_NQP_pb
+
+    W_var_shape = len(nodes), len(agents), len(agents)
+    W_cols = MSPP_PD_NQP_pb.add_vars("W", W_var_shape,
+                                     vtype=GRB.BINARY)  # 33) Binary constraints
+
+    pairs = _agent_pairs(agents)
+
+    # 28) Additional (linearized) objective
+    MSPP_PD_NQP_pb.add_objective("Penalty",
+                                 W_cols[node_labels][:, pairs[:, 0], pairs[:, 1]],
+                                 1)
+
+    # 10,11) Turning on r_i constraints
+    MSPP_PD_NQP_pb.add_constrs("Arc to node",
+                               *_arc_to_node_constraints(w_arcs, agents, X_cols, R_cols,
+                                                         MSPP_PD_NQP_pb.num_vars))
+
+    # 29) Turning off r_i constraints
+    MSPP_PD_NQP_pb.add_constrs("Node to arc",
+                               *_node_to_arc_constraints(nodes, w_arcs, agents, X_cols, R_cols,
+                                                         MSPP_PD_NQP_pb.num_vars))
+
+    # 30-32) Well-defined W variable
+    MSPP_PD_NQP_pb.add_constrs("Node pairs",
+                               *_pair_constraints(R_cols[node_labels], W_cols[node_labels], pairs,
+                                                  MSPP_PD_NQP_pb.num_vars))
+
+    return MSPP_PD_NQP_pb
+
+
+def _describe_commodity_MSPP(nodes, w_arcs, commodities):
+    """Describe a MSPP for a network instance routing agents grouped into commodities
+
+    Y[arc.idx, commodity.idx] is the number of agents of a commodity traversing an arc
 
     Args:
-        X (gb.MVar): X decision variables of a MSPP or MSPP-PD
-        node (int): node under consideration
-        w_arcs (list): list of weighted arcs that represent the network instance
-        agent (Agent): the agent for which to compue the flow
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of commodities that has to be routed, see data_generator.group_agents()
 
     Returns:
-        gb.MLinExpr: an expression for the computed flow 
+        MILPDescription: the description of the aggregated MSPP, with the block of variables Y
     """
 
-    flow_out = gb.quicksum(
-        X[arc.idx, agent.idx]
-        for arc in w_arcs if arc.i == node
-    )
-    flow_in = gb.quicksum(
-        X[arc.idx, agent.idx]
-        for arc in w_arcs if arc.j == node
-    )
-    return flow_out - flow_in
+    MSPP_pb = MILPDescription()
 
+    # Decision variables
+    multiplicities = np.array([commodity.multiplicity for commodity in commodities])
+    Y_var_shape = len(w_arcs), len(commodities)
+    Y_cols = MSPP_pb.add_vars("Y", Y_var_shape,
+                              vtype=GRB.INTEGER, ub=multiplicities[None, :])
 
-def set_MSPP(nodes, w_arcs, agents):
-    """Create and set a MSPP for a network instance given the agents to route
+    arc_idxs, _, _, weights = _arc_arrays(w_arcs)
+    commodity_idxs, *_ = _agent_arrays(commodities)
+
+    # 1-3) Objective
+    MSPP_pb.add_objective("Distance",
+                          Y_cols[np.ix_(arc_idxs, commodity_idxs)],
+                          weights[:, None])
+
+    # 4) Flow constraints, the commodity's agents leave its source and reach its terminus
+    A, sense, rhs = _flow_constraints(nodes, w_arcs, commodities, Y_cols, MSPP_pb.num_vars)
+    MSPP_pb.add_constrs("Flow", A, sense,
+                        (rhs.reshape(len(commodities), len(nodes)) * multiplicities[:, None]).ravel())
+
+    return MSPP_pb
+
+
+def _describe_commodity_ABP(nodes, w_arcs, commodities):
+    """Describe a MSPP-PD(ABP) for a network instance routing agents grouped into commodities
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of commodities that has to be routed, see data_generator.group_agents()
+
+    Returns:
+        MILPDescription: the description of the aggregated MSPP-PD(ABP), with the blocks of variables Y and Psi
+    """
+
+    MSPP_PD_ABP_pb = _describe_commodity_MSPP(nodes, w_arcs, commodities)
+    Y_cols = MSPP_PD_ABP_pb.columns("Y")
+
+    # Additional decision variables
+    Psi_var_shape = len(w_arcs)
+    Psi_cols = MSPP_PD_ABP_pb.add_vars("Psi", Psi_var_shape,
+                                       vtype=GRB.BINARY)  # 8) Binary constraints
+
+    arc_idxs, *_ = _arc_arrays(w_arcs)
+    commodity_idxs, *_ = _agent_arrays(commodities)
+    num_agents = sum(commodity.multiplicity for commodity in commodities)
+
+    # 6) Additional objective
+    MSPP_PD_ABP_pb.add_objective("Penalty", Psi_cols[arc_idxs], 1)
+
+    # 7) Additonal constraints
+    MSPP_PD_ABP_pb.add_constrs("Arc sharing",
+                               *_sharing_constraints(Y_cols[np.ix_(arc_idxs, commodity_idxs)],
+                                                     Psi_cols[arc_idxs],
+                                                     MSPP_PD_ABP_pb.num_vars,
+                                                     num_agents))
+
+    return MSPP_PD_ABP_pb
+
+
+def _describe_commodity_ALP(nodes, w_arcs, commodities):
+    """Describe a MSPP-PD(ALP) for a network instance routing agents grouped into commodities
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of commodities that has to be routed, see data_generator.group_agents()
+
+    Returns:
+        MILPDescription: the description of the aggregated MSPP-PD(ALP), with the blocks of variables Y and Eps
+    """
+
+    MSPP_PD_ALP_pb = _describe_commodity_MSPP(nodes, w_arcs, commodities)
+    Y_cols = MSPP_PD_ALP_pb.columns("Y")
+
+    # Additional decision variables
+    Eps_var_shape = len(w_arcs)
+    Eps_cols = MSPP_PD_ALP_pb.add_vars("Eps", Eps_var_shape,
+                                       vtype=GRB.BINARY)  # 17) Binary constraints
+
+    arc_idxs, *_ = _arc_arrays(w_arcs)
+    commodity_idxs, *_ = _agent_arrays(commodities)
+    num_agents = sum(commodity.multiplicity for commodity in commodities)
+    usage_cols = Y_cols[np.ix_(arc_idxs, commodity_idxs)]
+
+    # 15) Additional objective
+    MSPP_PD_ALP_pb.add_objective("Penalty",
+                                 np.column_stack([Eps_cols[arc_idxs], usage_cols]),
+                                 np.append(-1, np.ones(len(commodities))))
+
+    # 16) Turning on eps_i constraints
+    MSPP_PD_ALP_pb.add_constrs("Arc use",
+                               *_any_use_constraints(usage_cols, Eps_cols[arc_idxs],
+                                                     MSPP_PD_ALP_pb.num_vars, num_agents))
+
+    return MSPP_PD_ALP_pb
+
+
+def describe_aggregated_problem(problem_type, nodes, w_arcs, commodities):
+    """Describe the specified optimization problem routing agents grouped into commodities
+
+    See set_aggregated_problem()
+
+    Args:
+        problem_type (str): The optimization problem to describe. Only MSPP, ABP and ALP are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of commodities that has to be routed, see data_generator.group_agents()
+
+    Returns:
+        MILPDescription: the description of the selected optimization problem
+    """
+
+    params = nodes, w_arcs, commodities
+    if problem_type == "MSPP":
+        return _describe_commodity_MSPP(*params)
+    elif problem_type == "ABP":
+        return _describe_commodity_ABP(*params)
+    elif problem_type == "ALP":
+        return _describe_commodity_ALP(*params)
+    else:
+        raise ValueError(f"Problem {problem_type!r} can not be aggregated by commodities")
+
+
+def describe_problem(problem_type, nodes, w_arcs, agents, penalty_formulation="pairs"):
+    """Describe the specified optimization problem for a network instance given the agents to route
+
+    The description can be solved by any MILP solver, see milp_backends
 
     Args:
+        problem_type (str): The optimization problem to describe. Only MSPP and MSPP-PD variants are accepted
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        penalty_formulation (str): how the quadratic penalties are linearized, see set_AQP()
+          (default is "pairs"). Ignored by the other problems
 
     Returns:
-        tuple: a tuple (MSPP_pb, X) where:
-          - MSPP_pb is a gb.Model that represent the created MSPP
-          - X is a gb.MVar containing the decision variables associated to the agents' paths
+        MILPDescription: the description of the selected optimization problem
     """
 
-    MSPP_pb = gb.Model()
-    MSPP_pb.setParam("OutputFlag", 0)
+    params = nodes, w_arcs, agents
+    if problem_type == "MSPP":
+        return _describe_MSPP(*params)
+    elif problem_type == "ABP":
+        return _describe_ABP(*params)
+    elif problem_type == "NBP":
+        return _describe_NBP(*params)
+    elif problem_type == "ALP":
+        return _describe_ALP(*params)
+    elif problem_type == "NLP":
+        return _describe_NLP(*params)
+    elif problem_type == "AQP":
+        return _describe_AQP(*params, penalty_formulation)
+    elif problem_type == "NQP":
+        return _describe_NQP(*params, penalty_formulation)
+
 
-    # Decision variables
-    X_var_shape = len(w_arcs), len(agents)
-    X = MSPP_pb.addMVar(X_var_shape,
-                        vtype=GRB.BINARY,  # 5) Binary constraints
-                        name="X")
+def set_MSPP(nodes, w_arcs, agents, env=None):
+    """Create and set a MSPP for a network instance given the agents to route
 
-    # 1-3) Objective
-    distance_obj = gb.quicksum(
-        arc.w * X[arc.idx, agent.idx]
-        for arc in w_arcs for agent in agents
-    )
-    MSPP_pb.setObjectiveN(distance_obj, index=0, weight=1, name="Distance")
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
-    # 4) Flow constraints
-    for agent in agents:
-        for node in nodes:
-            if node == agent.source:
-                MSPP_pb.addConstr(_compute_flow(X, node, w_arcs, agent) == 1)
-            elif node == agent.terminus:
-                MSPP_pb.addConstr(_compute_flow(X, node, w_arcs, agent) == -1)
-            else:
-                MSPP_pb.addConstr(_compute_flow(X, node, w_arcs, agent) == 0)
+    Returns:
+        tuple: a tuple (MSPP_pb, X) where:
+          - MSPP_pb is a gb.Model that represent the created MSPP
+          - X is a gb.MVar containing the decision variables associated to the agents' paths
+    """
 
-    return MSPP_pb, X
+    return to_gurobi_model(_describe_MSPP(nodes, w_arcs, agents), env=env)
 
 
-def set_ABP(nodes, w_arcs, agents):
+def set_ABP(nodes, w_arcs, agents, env=None):
     """Create and set a MSPP-PD(ABP) for a network instance given the agents to route
 
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_ABP_pb, X, Psi) where:
@@ -88,39 +1133,17 @@ def set_ABP(nodes, w_arcs, agents):
             traverse a specific arc
     """
 
-    MSPP_PD_ABP_pb, X = set_MSPP(nodes, w_arcs, agents)
-
-    # Additional decision variables
-    Psi_var_shape = len(w_arcs)
-    Psi = MSPP_PD_ABP_pb.addMVar(Psi_var_shape,
-                                 vtype=GRB.BINARY,  # 8) Binary constraints
-                                 name="Psi")
-
-    # 6) Additional objective
-    penalty_obj = gb.quicksum(
-        Psi[arc.idx] for arc in w_arcs
-    )
-    MSPP_PD_ABP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty")
-
-    # 7) Additonal constraints
-    for arc in w_arcs:
-        MSPP_PD_ABP_pb.addConstr(
-            1/len(agents) *
-            (gb.quicksum(X[arc.idx, agent.idx] for agent in agents) - 1)
-            <= Psi[arc.idx]
-        )
-
-    return MSPP_PD_ABP_pb, X, Psi
+    return to_gurobi_model(_describe_ABP(nodes, w_arcs, agents), env=env)
 
 
-def set_NBP(nodes, w_arcs, agents):
+def set_NBP(nodes, w_arcs, agents, env=None):
     """Create and set a MSPP-PD(NBP) for a network instance given the agents to route
 
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_NBP_pb, X, R, Xi) where:
@@ -132,54 +1155,17 @@ def set_NBP(nodes, w_arcs, agents):
             traverse a particular node
     """
 
-    MSPP_PD_NBP_pb, X = set_MSPP(nodes, w_arcs, agents)
-
-    # Additional decision variables
-    R_var_shape = len(nodes), len(agents)
-    R = MSPP_PD_NBP_pb.addMVar(R_var_shape,
-                               vtype=GRB.BINARY,  # 13) Binary constraints
-                               name="R")
-    Zeta_var_shape = len(nodes)
-    Zeta = MSPP_PD_NBP_pb.addMVar(Zeta_var_shape,
-                                  vtype=GRB.BINARY,  # 14) Binary constraints
-                                  name="Zeta")
-
-    # 9) Additional objective
-    penalty_obj = gb.quicksum(
-        Zeta[node] for node in nodes
-    )
-    MSPP_PD_NBP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty")
-
-    # 10,11) Turning on r_i constraints
-    for arc in w_arcs:
-        for agent in agents:
-            MSPP_PD_NBP_pb.addConstr(
-                R[arc.i, agent.idx] >= X[arc.idx, agent.idx]
-            )
-            MSPP_PD_NBP_pb.addConstr(
-                R[arc.j, agent.idx] >= X[arc.idx, agent.idx]
-            )
-
-    # 12) Turning on xi_i constraints
-    # ! Different from paper. Paper seems weird, the -1 should be outside the summation
-    for node in nodes:
-        MSPP_PD_NBP_pb.addConstr(
-            1/len(agents) *
-            (gb.quicksum(R[node, agent.idx] for agent in agents) - 1)
-            <= Zeta[node]
-        )
+    return to_gurobi_model(_describe_NBP(nodes, w_arcs, agents), env=env)
 
-    return MSPP_PD_NBP_pb, X, R, Zeta
 
-
-def set_ALP(nodes, w_arcs, agents):
+def set_ALP(nodes, w_arcs, agents, env=None):
     """Create and set a MSPP-PD(ALP) for a network instance given the agents to route
 
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_ALP_pb, X, Eps) where:
@@ -189,45 +1175,17 @@ def set_ALP(nodes, w_arcs, agents):
             traverse a particular arc
     """
 
-    MSPP_PD_ALP_pb, X = set_MSPP(nodes, w_arcs, agents)
-
-    # Additional decision variables
-    Eps_var_shape = len(w_arcs)
-    Eps = MSPP_PD_ALP_pb.addMVar(Eps_var_shape,
-                                 vtype=GRB.BINARY,  # 17) Binary constraints
-                                 name="Eps")
-
-    # 15) Additional objective
-    penalty_obj = gb.quicksum(
-        - Eps[arc.idx] + gb.quicksum(X[arc.idx, agent.idx] for agent in agents)
-        for arc in w_arcs
-    )
-    MSPP_PD_ALP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty"
-    )
-
-    # 16) Turning on eps_i constraints
-    for arc in w_arcs:
-        MSPP_PD_ALP_pb.addConstr(
-            1/len(agents) *
-            (gb.quicksum(X[arc.idx, agent.idx] for agent in agents))
-            <= Eps[arc.idx]
-        )
-        MSPP_PD_ALP_pb.addConstr(
-            Eps[arc.idx] <= gb.quicksum(X[arc.idx, agent.idx]
-                                        for agent in agents)
-        )
-
-    return MSPP_PD_ALP_pb, X, Eps
+    return to_gurobi_model(_describe_ALP(nodes, w_arcs, agents), env=env)
 
 
-def set_NLP(nodes, w_arcs, agents):
+def set_NLP(nodes, w_arcs, agents, env=None):
     """Create and set a MSPP-PD(NLP) for a network instance given the agents to route
 
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_NLP_pb, X, R, Theta) where:
@@ -239,111 +1197,47 @@ def set_NLP(nodes, w_arcs, agents):
             traverse a particular node
     """
 
-    MSPP_PD_NLP_pb, X = set_MSPP(nodes, w_arcs, agents)
-
-    # Additional decision variables
-    R_var_shape = len(nodes), len(agents)
-    R = MSPP_PD_NLP_pb.addMVar(R_var_shape,
-                               vtype=GRB.BINARY,  # 13) Binary constraints
-                               name="R")
-    Theta_var_shape = len(nodes)
-    Theta = MSPP_PD_NLP_pb.addMVar(Theta_var_shape,
-                                   vtype=GRB.BINARY,  # 20) Binary constraints
-                                   name="Theta")
-
-    # 18) Additional objective
-    penalty_obj = gb.quicksum(
-        - Theta[node] + gb.quicksum(R[node, agent.idx] for agent in agents)
-        for node in nodes
-    )
-    MSPP_PD_NLP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty"
-    )
-
-    # 10,11) Turning on r_i constraints
-    for arc in w_arcs:
-        for agent in agents:
-            MSPP_PD_NLP_pb.addConstr(
-                R[arc.i, agent.idx] >= X[arc.idx, agent.idx]
-            )
-            MSPP_PD_NLP_pb.addConstr(
-                R[arc.j, agent.idx] >= X[arc.idx, agent.idx]
-            )
-
-    # 19) Turning on theta_i constraints
-    for node in nodes:
-        MSPP_PD_NLP_pb.addConstr(
-            1/len(agents) *
-            (gb.quicksum(R[node, agent.idx] for agent in agents))
-            <= Theta[node]
-        )
-        MSPP_PD_NLP_pb.addConstr(
-            Theta[node] <= gb.quicksum(R[node, agent.idx]
-                                       for agent in agents)
-        )
-
-    return MSPP_PD_NLP_pb, X, R, Theta
+    return to_gurobi_model(_describe_NLP(nodes, w_arcs, agents), env=env)
 
 
-def set_AQP(nodes, w_arcs, agents):
+def set_AQP(nodes, w_arcs, agents, penalty_formulation="pairs", env=None):
     """Create and set a MSPP-PD(AQP) for a network instance given the agents to route
 
+    The "pairs" formulation is the paper's one, with a binary variable for each arc and pair
+    of agents. The equivalent "counts" formulation has a single continuous penalty for each
+    arc, bounded from below by the number of pairs of agents traversing it, so that the model
+    grows linearly, instead of quadratically, with the number of agents
+
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        penalty_formulation (str): "pairs" or "counts" (default is "pairs")
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_AQP_pb, Z) where:
           - MSPP_PD_AQP_pb is a gb.Model that represent the created MSPP-PD(AQP)
           - X is a gb.MVar containing the decision variables associated to the agents' paths
           - Z is a gb.MVar containing the decision variables used to linearize the original
-            objective function of the MSPP-PD(AQP)
+            objective function of the MSPP-PD(AQP). With the "counts" formulation it is
+            replaced by Phi, containing the penalty of each arc
     """
 
-    MSPP_PD_AQP_pb, X = set_MSPP(nodes, w_arcs, agents)
-
-    # Additional decision variables
-    Z_var_shape = len(w_arcs), len(agents), len(agents)
-    Z = MSPP_PD_AQP_pb.addMVar(Z_var_shape,
-                               vtype=GRB.BINARY,  # 26) Binary constraints
-                               name="Z")
+    return to_gurobi_model(_describe_AQP(nodes, w_arcs, agents, penalty_formulation), env=env)
 
-    # 22) Additional (linearized) objective
-    penalty_obj = gb.quicksum(
-        Z[arc.idx, agent.idx, agent_.idx] for arc in w_arcs
-        for agent in agents for agent_ in agents if agent_.idx < agent.idx
-    )
-    MSPP_PD_AQP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty"
-    )
 
-    # 23-25) Well-defined Z variable
-    for arc in w_arcs:
-        for agent in agents:
-            for agent_ in agents:
-                if agent_.idx < agent.idx:
-                    MSPP_PD_AQP_pb.addConstr(
-                        Z[arc.idx, agent.idx, agent_.idx] <= X[arc.idx, agent.idx]
-                    )
-                    MSPP_PD_AQP_pb.addConstr(
-                        Z[arc.idx, agent.idx, agent_.idx] <= X[arc.idx, agent_.idx]
-                    )
-                    MSPP_PD_AQP_pb.addConstr(
-                        Z[arc.idx, agent.idx, agent_.idx] >=
-                        X[arc.idx, agent.idx] + X[arc.idx, agent_.idx] - 1
-                    )
-
-    return MSPP_PD_AQP_pb, X, Z
-
-
-def set_NQP(nodes, w_arcs, agents):
+def set_NQP(nodes, w_arcs, agents, penalty_formulation="pairs", env=None):
     """Create and set a MSPP-PD(NQP) for a network instance given the agents to route
 
+    Formulations are the same of set_AQP(), over nodes
+
     Args:
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        penalty_formulation (str): "pairs" or "counts" (default is "pairs")
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (MSPP_PD_NQP_pb, R, W) where:
@@ -352,71 +1246,153 @@ def set_NQP(nodes, w_arcs, agents):
           - R is a gb.MVar containing the decision variables that tell if a particular
             agent traverse a particular node
           - W is a gb.MVar containing the decision variables used to linearize the original
-            objective function of the MSPP-PD(AQP)
+            objective function of the MSPP-PD(AQP). With the "counts" formulation it is
+            replaced by Omega, containing the penalty of each node
     """
 
-    MSPP_PD_NQP_pb, X = set_MSPP(nodes, w_arcs, agents)
+    return to_gurobi_model(_describe_NQP(nodes, w_arcs, agents, penalty_formulation), env=env)
 
-    # Additional decision variables
-    R_var_shape = len(nodes), len(agents)
-    R = MSPP_PD_NQP_pb.addMVar(R_var_shape,
-                               vtype=GRB.BINARY,  # 13) Binary constraints
-                               name="R")
-    W_var_shape = len(nodes), len(agents), len(agents)
-    W = MSPP_PD_NQP_pb.addMVar(W_var_shape,
-                               vtype=GRB.BINARY,  # 33) Binary constraints
-                               name="W")
 
-    # 28) Additional (linearized) objective
-    penalty_obj = gb.quicksum(
-        W[node, agent.idx, agent_.idx] for node in nodes
-        for agent in agents for agent_ in agents if agent_.idx < agent.idx
-    )
-    MSPP_PD_NQP_pb.setObjectiveN(
-        penalty_obj, index=1, weight=1, name="Penalty"
-    )
+class ObjectiveLevel:
+    """Class to represent how an objective is handled when a problem is optimized
 
-    # 10,11) Turning on r_i constraints
-    for arc in w_arcs:
-        for agent in agents:
-            MSPP_PD_NQP_pb.addConstr(
-                R[arc.i, agent.idx] >= X[arc.idx, agent.idx]
-            )
-            MSPP_PD_NQP_pb.addConstr(
-                R[arc.j, agent.idx] >= X[arc.idx, agent.idx]
-            )
+    Attributes:
+        objective (str): name of the objective, "Distance" or "Penalty"
+        priority (int): priority of the objective, higher priorities are optimized first in the
+          hierarchical mode
+        weight (float): weight of the objective when blended with the others of the same priority
+        abs_tol (float): absolute degradation of the objective allowed while optimizing lower
+          priorities, None for Gurobi's default
+        rel_tol (float): relative degradation of the objective allowed while optimizing lower
+          priorities, None for Gurobi's default
+        time_limit (float): time limit (s) of the optimization of the objective's priority, None
+          for no limit
+    """
 
-    # 29) Turning off r_i constraints
-    for node in nodes:
-        for agent in agents:
-            MSPP_PD_NQP_pb.addConstr(
-                R[node, agent.idx] <= (
-                    gb.quicksum(X[arc.idx, agent.idx] for arc in w_arcs if arc.i == node) +
-                    gb.quicksum(X[arc.idx, agent.idx]
-                                for arc in w_arcs if arc.j == node)
-                )
-            )
+    def __init__(self, objective, priority=0, weight=1.0, abs_tol=None, rel_tol=None, time_limit=None):
+        """Initialize the instance based on the passed parameters
 
-    # 30-32) Well-defined W variable
-    for node in nodes:
-        for agent in agents:
-            for agent_ in agents:
-                if agent_.idx < agent.idx:
-                    MSPP_PD_NQP_pb.addConstr(
-                        W[node, agent.idx, agent_.idx] <= R[node, agent.idx]
-                    )
-                    MSPP_PD_NQP_pb.addConstr(
-                        W[node, agent.idx, agent_.idx] <= R[node, agent_.idx]
-                    )
-                    MSPP_PD_NQP_pb.addConstr(
-                        W[node, agent.idx, agent_.idx] >=
-                        R[node, agent.idx] + R[node, agent_.idx] - 1
-                    )
-
-    return MSPP_PD_NQP_pb, X, R, W
-
-
-def set_problem(problem_type, nodes, w_arcs, agents):
+        Args:
+            objective (str): name of the objective, "Distance" or "Penalty"
+            priority (int): priority of the objective (default is 0)
+            weight (float): weight of the objective (default is 1)
+            abs_tol (float): allowed absolute degradation. By default it is Gurobi's one
+            rel_tol (float): allowed relative degradation. By default it is Gurobi's one
+            time_limit (float): time limit (s) of the objective's priority. By default there is no limit
+        """
+
+        self.objective = objective
+        self.priority = priority
+        self.weight = weight
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+        self.time_limit = time_limit
+
+    def __repr__(self):
+        """Return the representation of the objective level instance"""
+
+        return f"{self.__class__.__name__}({self.objective!r}, priority={self.priority!r}, weight={self.weight!r})"
+
+
+# Default levels of the hierarchical mode: conflicts are minimized first, then distance
+HIERARCHICAL_LEVELS = [ObjectiveLevel("Penalty", priority=1),
+                       ObjectiveLevel("Distance", priority=0)]
+
+
+def set_objective_mode(problem, objective_mode="blended", levels=None):
+    """Set how the objectives of a problem are combined
+
+    In the "blended" mode all the objectives share the same priority and their weighted sum is
+    minimized, as done by the set_* functions. In the "hierarchical" mode objectives are
+    minimized one priority at a time, from the highest, each one without degrading the
+    previous ones beyond their tolerances. Objectives of the model without a level are ignored,
+    so that the same levels can be used for the MSPP, that has no Penalty
+
+    Args:
+        problem (gb.Model): the problem, as returned by set_problem()
+        objective_mode (str): how objectives are combined, "blended" or "hierarchical" (default is "blended")
+        levels (list): list of ObjectiveLevel. By default objectives have unit weights and, in
+          the hierarchical mode, the priorities of HIERARCHICAL_LEVELS
+
+    Returns:
+        list: the ObjectiveLevel of the objectives of the problem, ordered by objective's index
+    """
+
+    if objective_mode not in ("blended", "hierarchical"):
+        raise ValueError(f"Unknown objective mode {objective_mode!r}")
+    if levels is None:
+        levels = HIERARCHICAL_LEVELS if objective_mode == "hierarchical" else []
+    levels_by_objective = {level.objective: level for level in levels}
+
+    problem.update()
+    problem_levels = []
+    for obj in range(problem.NumObj):
+        problem.params.ObjNumber = obj
+        level = levels_by_objective.get(problem.ObjNName, ObjectiveLevel(problem.ObjNName))
+        problem_levels.append(level)
+
+        problem.ObjNPriority = level.priority if objective_mode == "hierarchical" else 0
+        problem.ObjNWeight = level.weight
+        if level.abs_tol is not None:
+            problem.ObjNAbsTol = level.abs_tol
+        if level.rel_tol is not None:
+            problem.ObjNRelTol = level.rel_tol
+
+    # each distinct priority is a pass of the optimization, with its own environment
+    if objective_mode == "hierarchical":
+        priorities = sorted({level.priority for level in problem_levels}, reverse=True)
+        for optimization_pass, priority in enumerate(priorities):
+            time_limits = [level.time_limit for level in problem_levels
+                           if level.priority == priority and level.time_limit is not None]
+            if time_limits:
+                problem.getMultiobjEnv(optimization_pass).setParam("TimeLimit", min(time_limits))
+
+    problem._objective_mode = objective_mode
+    problem._objective_levels = problem_levels
+
+    return problem_levels
+
+
+def blend_objectives(problem):
+    """Replace the objectives of a problem with their weighted sum
+
+    Presolve and lazy constraints are not available for multi-objective models, while the
+    single weighted sum is equivalent to the blended objectives of the set_* functions
+
+    Args:
+        problem (gb.Model): the problem, as returned by set_problem()
+    """
+
+    problem.update()
+    objectives = []
+    for obj in range(problem.NumObj):
+        problem.params.ObjNumber = obj
+        objectives.append((problem.ObjNWeight, problem.getObjective(obj)))
+    problem.NumObj = 0
+    problem.update()
+    problem.setObjective(gb.quicksum(weight * objective for weight, objective in objectives))
+
+
+def _multiobj_callback(problem, where):
+    """Gurobi callback that records in problem._level_runtimes when each optimization pass ends"""
+
+    if where == GRB.Callback.MULTIOBJ:
+        problem._level_runtimes.append(problem.cbGet(GRB.Callback.RUNTIME))
+
+
+def optimize_problem(problem):
+    """Optimize a problem recording the runtime of each priority level of its objectives
+
+    Args:
+        problem (gb.Model): the problem, as returned by set_problem()
+    """
+
+    problem._level_runtimes = []
+    problem.optimize(_multiobj_callback)
+
+
+def set_problem(problem_type, nodes, w_arcs, agents, objective_mode="blended", levels=None,
+                penalty_formulation="pairs", env=None):
     """Formulate the specified optimization problem for a network instance given the agents to route
 
     Args:
@@ -424,6 +1400,13 @@ def set_problem(problem_type, nodes, w_arcs, agents):
         nodes (list): list of the nodes in the network instance
         w_arcs (list): list of weighted arcs in the network instance
         agents (list): list of agents that has to be routed
+        objective_mode (str): how the objectives are combined, "blended" or "hierarchical" (default
+          is "blended"), see set_objective_mode()
+        levels (list): list of ObjectiveLevel with priority, weight, tolerances and time limit of
+          each objective. By default see set_objective_mode()
+        penalty_formulation (str): how the quadratic penalties are linearized, "pairs" or
+          "counts" (default is "pairs"), see set_AQP(). Ignored by the other problems
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
 
     Returns:
         tuple: a tuple (Problem, *_) where
@@ -433,29 +1416,196 @@ def set_problem(problem_type, nodes, w_arcs, agents):
 
     params = nodes, w_arcs, agents
     if problem_type == "MSPP":
-        return set_MSPP(*params)
+        problem_and_vars = set_MSPP(*params, env=env)
     elif problem_type == "ABP":
-        return set_ABP(*params)
+        problem_and_vars = set_ABP(*params, env=env)
     elif problem_type == "NBP":
-        return set_NBP(*params)
+        problem_and_vars = set_NBP(*params, env=env)
     elif problem_type == "ALP":
-        return set_ALP(*params)
+        problem_and_vars = set_ALP(*params, env=env)
     elif problem_type == "NLP":
-        return set_NLP(*params)
+        problem_and_vars = set_NLP(*params, env=env)
     elif problem_type == "AQP":
-        return set_AQP(*params)
+        problem_and_vars = set_AQP(*params, penalty_formulation, env=env)
     elif problem_type == "NQP":
-        return set_NQP(*params)
+        problem_and_vars = set_NQP(*params, penalty_formulation, env=env)
+    else:
+        return None
+
+    # blended with unit weights is how the set_* functions already build the model
+    if objective_mode != "blended" or levels is not None:
+        set_objective_mode(problem_and_vars[0], objective_mode, levels)
+
+    return problem_and_vars
+
+
+def set_aggregated_problem(problem_type, nodes, w_arcs, commodities, env=None):
+    """Formulate the specified optimization problem routing agents grouped into commodities
+
+    Each commodity is routed as an integer flow, so the model has a column of variables for
+    each commodity instead of one for each agent and no permutation-equivalent solutions.
+    Agents' paths are recovered by decompose_flows()
+
+    Args:
+        problem_type (str): The optimization problem to formulate. Only MSPP, ABP and ALP are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of commodities that has to be routed, see data_generator.group_agents()
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        tuple: a tuple (Problem, Y, *_) where
+          - Problem is a gb.Model that represent the selected and created optimization problem
+          - Y is a gb.MVar with the number of agents of each commodity traversing each arc
+          - *_ is a tuple of gb.MVar containing the other decision variables of the problem
+    """
+
+    return to_gurobi_model(describe_aggregated_problem(problem_type, nodes, w_arcs, commodities), env=env)
+
+
+def decompose_flows(y, w_arcs, commodities):
+    """Recover the agents' paths from the flows of their commodities
 
+    The flow of each commodity is split into as many source-terminus paths as its agents,
+    each one assigned to one of them
 
-def evaluate_pb_objectives(problem):
+    Args:
+        y (np.ndarray): a (len(w_arcs), len(commodities)) matrix with the flows, as Y.x
+        w_arcs (list): list of weighted arcs in the network instance
+        commodities (list): list of the routed commodities
+
+    Returns:
+        np.ndarray: a (len(w_arcs), num_of_agents) matrix with the same meaning of X.x, where
+          agents are identified by idx
+    """
+
+    arc_idxs, tails, heads, _ = _arc_arrays(w_arcs)
+    num_agents = max(agent.idx for commodity in commodities for agent in commodity.agents) + 1
+
+    # arcs leaving each node, in the order of the list
+    by_tail = np.argsort(tails, kind="stable")
+    starts = np.searchsorted(tails[by_tail], np.arange(max(tails.max(), heads.max()) + 2))
+
+    x = np.zeros((len(w_arcs), num_agents))
+    for commodity in commodities:
+        residual = np.round(np.asarray(y)[arc_idxs, commodity.idx]).astype(int)
+        for agent in commodity.agents:
+            node = commodity.source
+            for _ in range(len(w_arcs)):
+                if node == commodity.terminus:
+                    break
+                out_arcs = by_tail[starts[node]:starts[node + 1]]
+                arc_pos = out_arcs[residual[out_arcs] > 0][0]
+                residual[arc_pos] -= 1
+                x[arc_idxs[arc_pos], agent.idx] = 1
+                node = heads[arc_pos]
+
+    return x
+
+
+class ReusableProblem:
+    """Class to solve a problem over network instances that share topology and agents
+
+    The model is built once, then each new network instance just replaces the coefficients
+    of the distance objective, i.e. the weights of the arcs, before being optimized again
+
+    Attributes:
+        problem_type (str): the optimization problem solved
+        model (gb.Model): the model of the optimization problem
+        variables (tuple): tuple of gb.MVar with the decision variables returned by set_problem
+        X (gb.MVar): X decision variables associated to the agents' paths
+    """
+
+    def __init__(self, problem_type, nodes, w_arcs, agents, env=None):
+        """Initialize the instance building the model for a first network instance
+
+        Args:
+            problem_type (str): The optimization problem to formulate. Only MSPP and MSPP-PD variants are accepted
+            nodes (list): list of the nodes in the network instance
+            w_arcs (list): list of weighted arcs in the first network instance
+            agents (list): list of agents that has to be routed
+            env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+        """
+
+        self.problem_type = problem_type
+        self.model, *variables = set_problem(problem_type, nodes, w_arcs, agents, env=env)
+        self.variables = tuple(variables)
+        self.X = self.variables[0]
+
+        _, self._tails, self._heads, _ = _arc_arrays(sorted(w_arcs, key=lambda arc: arc.idx))
+        self._agent_idxs, *_ = _agent_arrays(agents)
+        self._last_solution = None
+
+    def __repr__(self):
+        """Return the representation of the reusable problem instance"""
+
+        return f"{self.__class__.__name__}({self.problem_type!r}, {self.model!r})"
+
+    def set_weights(self, weights):
+        """Replace the weights of the arcs in the distance objective
+
+        The current solution, if any, is kept aside to be used as a warm start
+
+        Args:
+            weights (array_like): the new weight of each arc, ordered by arc's idx
+        """
+
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != self._tails.shape:
+            raise ValueError(f"Expected {len(self._tails)} weights, got {weights.shape}")
+
+        if self.model.SolCount > 0:
+            self._last_solution = self.model.getAttr("X", self.model.getVars())
+
+        distance_coeffs = np.zeros(self.X.shape)
+        distance_coeffs[:, self._agent_idxs] = weights[:, None]
+        self.model.params.ObjNumber = 0  # Distance objective
+        self.X.setAttr("ObjN", distance_coeffs)
+
+    def set_instance(self, w_arcs):
+        """Replace the weights of the arcs with the ones of another network instance
+
+        Args:
+            w_arcs (list): list of weighted arcs of a network instance with the same topology
+        """
+
+        w_arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+        _, tails, heads, weights = _arc_arrays(w_arcs)
+        if not (np.array_equal(tails, self._tails) and np.array_equal(heads, self._heads)):
+            raise ValueError("The network instance has a different topology")
+
+        self.set_weights(weights)
+
+    def optimize(self, warm_start=False):
+        """Optimize the problem for the current weights of the arcs
+
+        Args:
+            warm_start (bool): if True, the solution of the previous optimization is used as
+              starting solution. Otherwise the problem is solved from scratch (default is False)
+        """
+
+        variables = self.model.getVars()
+        if warm_start and self._last_solution is not None:
+            self.model.setAttr("Start", variables, self._last_solution)
+        else:
+            self.model.reset()
+            self.model.setAttr("Start", variables, [GRB.UNDEFINED] * len(variables))
+
+        self.model.optimize()
+
+
+def evaluate_pb_objectives(problem, per_level=False):
     """Get optimal objectives from an optimization problem
 
     Args:
         problem (gb.Model): The optimization problem
+        per_level (bool): if True, objectives are reported by priority level, see below
 
     Returns:
-        list: a list with the optimal values of the different problem's objectives
+        list: a list with the optimal values of the different problem's objectives or, if
+          per_level is True, a list with a dict for each priority level, from the first
+          optimized, with the names ("objectives") and values ("values") of its objectives and
+          the time (s) spent on it ("runtime", NaN if not recorded by optimize_problem())
     """
 
     # ? Shold I check optimality
@@ -470,4 +1620,29 @@ def evaluate_pb_objectives(problem):
         problem.params.ObjNumber = obj
         opt_solution.append(problem.ObjNVal)
 
-    return opt_solution
+    if not per_level:
+        return opt_solution
+
+    names, priorities = [], []
+    for obj in range(problem.NumObj):
+        problem.params.ObjNumber = obj
+        names.append(problem.ObjNName)
+        priorities.append(problem.ObjNPriority)
+
+    runtimes = list(getattr(problem, "_level_runtimes", []))
+    levels_priorities = sorted(set(priorities), reverse=True)
+    if len(levels_priorities) == 1:
+        runtimes = [problem.Runtime]  # a single blended optimization
+    else:
+        # each pass is timed since the start of the optimization
+        runtimes = np.diff(np.r_[0, runtimes]).tolist() if len(runtimes) == len(levels_priorities) else []
+
+    levels = []
+    for level_i, priority in enumerate(levels_priorities):
+        objs = [obj for obj in range(problem.NumObj) if priorities[obj] == priority]
+        levels.append({"priority": priority,
+                       "objectives": [names[obj] for obj in objs],
+                       "values": [opt_solution[obj] for obj in objs],
+                       "runtime": runtimes[level_i] if runtimes else np.nan})
+
+    return levels
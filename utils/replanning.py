@@ -0,0 +1,410 @@
+"""Module that contains an online planner of MSPP-PDs, and an asyncio service around it, for agents arriving over time"""
+from . import time
+from . import random
+from . import asyncio
+from . import np
+from . import GRB
+from . import data_generator
+from . import problem_model
+from . import shortest_paths
+from . import solution_analysis
+
+
+# for each supported problem: the penalized element, the family of constraints linking its
+# usage to its penalty and the block of the penalty's variables
+_PENALTY_FAMILIES = {"MSPP": (None, None, None),
+                     "ABP": ("arc", "Arc sharing", "Psi"),
+                     "NBP": ("node", "Node sharing", "Zeta"),
+                     "ALP": ("arc", "Arc use", "Eps"),
+                     "NLP": ("node", "Node use", "Theta")}
+
+
+class IncrementalPlanner:
+    """Class to route batches of agents arriving over time, keeping the paths already committed fixed
+
+    The model has a fixed number of slots for the newcomers and is built once. Routing a batch
+    only changes the right-hand sides of the flow constraints (4), to place the sources and
+    termini of the slots, and the bounds of the penalties, so that the committed paths count
+    as constant usage of arcs and nodes. Newcomers are thus penalized for sharing an arc or a
+    node with any agent of the fleet. Slots left empty route nothing
+
+    Attributes:
+        problem_type (str): the optimization problem solved, MSPP, ABP, NBP, ALP or NLP
+        max_batch (int): the maximum number of agents routed together
+        model (gb.Model): the model of the optimization problem
+        X (gb.MVar): X decision variables associated to the paths of the slots
+        committed (dict): the committed agents, by idx, with their path of nodes in agent.path
+        arc_counts (np.ndarray): the number of committed agents on each arc, by idx
+        node_counts (np.ndarray): the number of committed agents on each node
+    """
+
+    def __init__(self, problem_type, nodes, w_arcs, max_batch=8, env=None):
+        """Initialize the instance building the model, with no committed path
+
+        Args:
+            problem_type (str): The optimization problem to solve. Only MSPP, ABP, NBP, ALP and NLP are accepted
+            nodes (list): list of the nodes in the network instance
+            w_arcs (list): list of weighted arcs in the network instance
+            max_batch (int): the maximum number of agents routed together (default is 8)
+            env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+        """
+
+        if problem_type not in _PENALTY_FAMILIES:
+            raise ValueError(f"Problem {problem_type!r} can not be re-planned incrementally")
+
+        self.problem_type = problem_type
+        self.max_batch = max_batch
+        self._nodes = nodes
+        self._w_arcs = w_arcs
+        self._node_labels = np.asarray(nodes, dtype=int)
+        self._arc_idxs, *_ = problem_model._arc_arrays(w_arcs)
+
+        placeholders = [data_generator.Agent(nodes[0], nodes[0], slot) for slot in range(max_batch)]
+        description = problem_model.describe_problem(problem_type, nodes, w_arcs, placeholders)
+        self.model, self.X, *_ = problem_model.to_gurobi_model(description, env=env)
+        self.model.update()
+
+        # rows of each family of constraints, in the order they were added
+        constrs = self.model.getConstrs()
+        self._family_constrs, first_row = {}, 0
+        for name, A, *_ in description.constr_families:
+            self._family_constrs[name] = constrs[first_row:first_row + A.shape[0]]
+            first_row += A.shape[0]
+
+        self._element, family, block = _PENALTY_FAMILIES[problem_type]
+        if self._element is not None:
+            labels = self._arc_idxs if self._element == "arc" else self._node_labels
+            variables = self.model.getVars()
+            self._penalty_vars = [variables[col] for col in description.columns(block)[labels]]
+            self._penalty_constrs = self._family_constrs[family]
+
+        self.committed = {}
+        self.arc_counts = np.zeros(len(w_arcs), dtype=int)
+        self.node_counts = np.zeros(self._node_labels.max() + 1, dtype=int)
+        self._committed_usage = {}
+
+    def __repr__(self):
+        """Return the representation of the incremental planner instance"""
+
+        return (f"{self.__class__.__name__}({self.problem_type!r}, max_batch={self.max_batch!r}, "
+                f"num_committed={len(self.committed)!r})")
+
+    def _set_batch(self, agents):
+        """Place the sources and termini of a batch in the slots and the committed usage in the penalties"""
+
+        # +1 on the source, -1 on the terminus, as problem_model._flow_constraints(), 0 for empty slots
+        rhs = np.zeros((self.max_batch, len(self._nodes)))
+        for slot, agent in enumerate(agents):
+            rhs[slot, self._node_labels == agent.terminus] = -1
+            rhs[slot, self._node_labels == agent.source] = 1
+        self.model.setAttr("RHS", self._family_constrs["Flow"], rhs.ravel().tolist())
+
+        if self._element is None:
+            return
+
+        counts = (self.arc_counts[self._arc_idxs] if self._element == "arc"
+                  else self.node_counts[self._node_labels])
+        if self.problem_type in ("ABP", "NBP"):
+            # (7,12) with rhs 1/K allow one agent, with rhs 0 none, and 2 committed agents already pay
+            rhs = np.where(counts == 1, 0, 1 / self.max_batch)
+            self.model.setAttr("RHS", self._penalty_constrs, rhs.tolist())
+            self.model.setAttr("LB", self._penalty_vars, (counts >= 2).astype(float).tolist())
+        else:
+            # (16,19) the indicator is on if the element is used by any newcomer or committed agent
+            self.model.setAttr("RHS", self._penalty_constrs[1::2], counts.astype(float).tolist())
+            self.model.setAttr("LB", self._penalty_vars, (counts >= 1).astype(float).tolist())
+
+    def plan(self, agents, time_limit=None):
+        """Route a batch of newcomers and commit their paths
+
+        If the solver finds no solution within the time limit, the newcomers are routed along
+        shortest paths, ignoring conflicts
+
+        Args:
+            agents (list): list of the agents that has to be routed, at most max_batch
+            time_limit (float): time limit (s) of the solver. By default there is no limit
+
+        Returns:
+            tuple: a tuple (paths, status) with the list of the nodes of each agent's path, also
+              stored in agent.path, and the final status of the solver
+        """
+
+        if len(agents) > self.max_batch:
+            raise ValueError(f"At most {self.max_batch} agents can be routed together, not {len(agents)}")
+        batch_idxs = set()
+        for agent in agents:
+            if agent.idx in self.committed:
+                raise ValueError(f"Agent {agent.idx} is already committed")
+            if agent.idx in batch_idxs:
+                raise ValueError(f"Agent {agent.idx} appears more than once in the batch")
+            batch_idxs.add(agent.idx)
+
+        self._set_batch(agents)
+        self.model.Params.TimeLimit = GRB.INFINITY if time_limit is None else time_limit
+        self.model.optimize()
+
+        slot_agents = [data_generator.Agent(agent.source, agent.terminus, slot) for slot, agent in enumerate(agents)]
+        if self.model.SolCount > 0:
+            x = self.X.X[:, :len(agents)]
+        else:
+            x, _ = shortest_paths.solve_MSPP(self._nodes, self._w_arcs, slot_agents)
+
+        sequences = solution_analysis.path_nodes(x, self._nodes, self._w_arcs, slot_agents)
+        node_usage = solution_analysis.node_usage(x, self._nodes, self._w_arcs, slot_agents)
+        paths = []
+        for slot, agent in enumerate(agents):
+            agent.path = sequences[slot][sequences[slot] >= 0].tolist()
+            arcs_used = np.flatnonzero(np.rint(x[:, slot]))
+            nodes_used = self._node_labels[node_usage[:, slot] > 0]
+            self.arc_counts[arcs_used] += 1
+            self.node_counts[nodes_used] += 1
+            self.committed[agent.idx] = agent
+            self._committed_usage[agent.idx] = arcs_used, nodes_used
+            paths.append(agent.path)
+
+        return paths, self.model.Status
+
+    def release(self, agent_idx):
+        """Remove the path of an agent that reached its terminus, freeing its arcs and nodes
+
+        Args:
+            agent_idx (int): the idx of the committed agent
+        """
+
+        arcs_used, nodes_used = self._committed_usage.pop(agent_idx)
+        self.arc_counts[arcs_used] -= 1
+        self.node_counts[nodes_used] -= 1
+        del self.committed[agent_idx]
+
+    def conflicts(self):
+        """Compute the penalty of the committed paths for every MSPP-PD variant
+
+        Returns:
+            dict: a dict with the penalty of each MSPP-PD variant, see solution_analysis.conflict_totals()
+        """
+
+        return solution_analysis.conflict_totals(self.arc_counts, self.node_counts)
+
+
+class PlanningService:
+    """Class to serve, with asyncio, the requests of routing agents arriving over time
+
+    Requests are gathered for batch_window seconds after the first one, or until max_batch of
+    them arrive, and routed together by an IncrementalPlanner in a worker thread, so that new
+    requests keep arriving while a batch is optimized. The solver's time limit of a batch is
+    what is left of the latency target of its oldest request
+
+    Attributes:
+        planner (IncrementalPlanner): the planner routing the batches
+        batch_window (float): time (s) requests are gathered before routing them
+        latency_target (float): time (s) within which each request should be answered
+        num_batches (int): the number of batches routed
+    """
+
+    def __init__(self, planner, batch_window=0.005, latency_target=0.5, min_time_limit=0.01):
+        """Initialize the instance, the service is run by start() or as an async context manager
+
+        Args:
+            planner (IncrementalPlanner): the planner routing the batches
+            batch_window (float): time (s) requests are gathered before routing them (default is 0.005)
+            latency_target (float): time (s) within which each request should be answered (default is 0.5)
+            min_time_limit (float): minimum time limit (s) of the solver, even when the latency
+              target is already missed (default is 0.01)
+        """
+
+        self.planner = planner
+        self.batch_window = batch_window
+        self.latency_target = latency_target
+        self.min_time_limit = min_time_limit
+        self.num_batches = 0
+        self._queue = None
+        self._releases = []
+        self._task = None
+        self._batch = []
+        self._planning = None
+
+    def __repr__(self):
+        """Return the representation of the planning service instance"""
+
+        return (f"{self.__class__.__name__}({self.planner!r}, batch_window={self.batch_window!r}, "
+                f"latency_target={self.latency_target!r})")
+
+    async def __aenter__(self):
+        """Start the service when entering the context"""
+
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Stop the service when leaving the context"""
+
+        await self.stop()
+
+    async def start(self):
+        """Start serving requests in the running event loop"""
+
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    async def stop(self):
+        """Stop serving requests, the batch being routed is completed and the other requests are cancelled"""
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        # the requests already dequeued by _serve() are not in the queue any more
+        if self._planning is not None:
+            await asyncio.wait([self._planning])
+            self._answer(self._batch, self._planning)
+        else:
+            for _, future, _ in self._batch:
+                future.cancel()
+        self._batch, self._planning = [], None
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    async def request(self, agent):
+        """Ask to route an agent
+
+        Args:
+            agent (Agent): the agent, with an idx not used by the committed agents
+
+        Returns:
+            Agent: the agent, with its path of nodes in agent.path
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        await self._queue.put((agent, future, loop.time()))
+
+        return await future
+
+    def release(self, agent_idx):
+        """Free the path of an agent that reached its terminus, before routing the next batch
+
+        Args:
+            agent_idx (int): the idx of the committed agent
+        """
+
+        self._releases.append(agent_idx)
+
+    def _answer(self, batch, planning):
+        """Resolve the futures of the requests of a batch with the outcome of its routing"""
+
+        error = planning.exception()
+        if error is None:
+            self.num_batches += 1
+        for agent, future, _ in batch:
+            if future.done():  # the request was cancelled
+                continue
+            if error is None:
+                future.set_result(agent)
+            else:
+                future.set_exception(error)
+
+    async def _serve(self):
+        """Route the requests, a batch at a time
+
+        The batch and its routing are kept in self._batch and self._planning, so that stop()
+        can answer or cancel the requests already dequeued
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = batch = [await self._queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.planner.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # the planner is only touched by this task, so releases wait for the batch in progress
+            while self._releases:
+                self.planner.release(self._releases.pop())
+
+            agents = [agent for agent, _, _ in batch]
+            time_limit = max(self.latency_target - (loop.time() - batch[0][2]), self.min_time_limit)
+            self._planning = loop.run_in_executor(None, self.planner.plan, agents, time_limit)
+            # unlike awaiting the routing, waiting for it does not cancel it when the service stops
+            await asyncio.wait([self._planning])
+            self._answer(batch, self._planning)
+            self._batch, self._planning = [], None
+
+
+async def _timed_request(service, agent, arrival, start, hold_time, answers):
+    """Send a request at its arrival time (s), record when it is sent and answered and release it after hold_time (s)"""
+
+    await asyncio.sleep(max(arrival - (time.perf_counter() - start), 0))
+    sent = time.perf_counter()
+    await service.request(agent)
+    answers[agent.idx] = sent, time.perf_counter()
+
+    if hold_time is not None:
+        await asyncio.sleep(hold_time)
+        service.release(agent.idx)
+
+
+async def _run_load_test(service, agents, arrivals, hold_time):
+    """Drive a service with requests arriving at the given times (s), returning the latencies and the duration"""
+
+    answers = {}
+    async with service:
+        start = time.perf_counter()
+        await asyncio.gather(*[_timed_request(service, agent, arrival, start, hold_time, answers)
+                               for agent, arrival in zip(agents, arrivals)])
+
+    sent, answered = np.array([answers[agent.idx] for agent in agents]).T
+
+    return answered - sent, answered.max() - start
+
+
+def load_test(problem_type, nodes, w_arcs, agents, rate=50.0, hold_time=None, max_batch=8,
+              batch_window=0.005, latency_target=0.5, seed=None, env=None):
+    """Measure the latency and the throughput of a planning service with an in-process client
+
+    Requests arrive as a Poisson process, each agent being released hold_time seconds after
+    its path is committed, as robots leaving the facility
+
+    Args:
+        problem_type (str): the optimization problem solved. Only MSPP, ABP, NBP, ALP and NLP are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents requesting a path, in order of arrival
+        rate (float): mean number of requests per second (default is 50)
+        hold_time (float): time (s) each path is kept. By default paths are never released
+        max_batch (int): the maximum number of agents routed together (default is 8)
+        batch_window (float): time (s) requests are gathered before routing them (default is 0.005)
+        latency_target (float): time (s) within which each request should be answered (default is 0.5)
+        seed (int or str): seed of the arrivals' random number generator. By default the random
+          module's generator is used
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        dict: a dict with:
+          - "num_requests", "num_batches": the number of requests and of batches routed
+          - "duration": the time (s) from the first arrival to the last answer
+          - "throughput": the requests answered per second
+          - "latency_p50", "latency_p99", "latency_max": percentiles of the latencies (s)
+          - "on_target": the fraction of requests answered within the latency target
+          - "conflicts": the penalty of the paths still committed, see IncrementalPlanner.conflicts()
+    """
+
+    rng = random if seed is None else random.Random(seed)
+    arrivals = np.cumsum([rng.expovariate(rate) for _ in agents])
+
+    planner = IncrementalPlanner(problem_type, nodes, w_arcs, max_batch, env)
+    service = PlanningService(planner, batch_window, latency_target)
+    latencies, duration = asyncio.run(_run_load_test(service, agents, arrivals, hold_time))
+
+    return {"num_requests": len(agents),
+            "num_batches": service.num_batches,
+            "duration": float(duration),
+            "throughput": float(len(agents) / duration),
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p99": float(np.percentile(latencies, 99)),
+            "latency_max": float(latencies.max()),
+            "on_target": float(np.mean(latencies <= latency_target)),
+            "conflicts": planner.conflicts()}
@@ -0,0 +1,313 @@
+"""Module that contains graph algorithms to route agents along shortest paths without a MIP solver"""
+from . import np
+from . import sparse
+from . import csgraph
+
+
+def _node_levels(num_nodes, tails, heads):
+    """Compute the topological level of each node of a network
+
+    The level of a node is the number of arcs of the longest path ending in it
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+
+    Returns:
+        np.ndarray: the level of each node, or None if the network has a cycle
+    """
+
+    levels = np.zeros(num_nodes, dtype=int)
+    for _ in range(num_nodes):
+        new_levels = levels.copy()
+        np.maximum.at(new_levels, heads, levels[tails] + 1)
+        if np.array_equal(new_levels, levels):
+            return levels
+        levels = new_levels
+
+    return None  # levels keep growing only along a cycle
+
+
+def _head_groups(heads):
+    """Sort arcs by ending node, to reduce over the arcs entering each node with a single call
+
+    Args:
+        heads (np.ndarray): the ending node of each arc
+
+    Returns:
+        tuple: a tuple (order, starts, group_heads) with the positions of the arcs sorted by
+          ending node (stable), the start of each group of arcs in that order and the ending
+          node of each group
+    """
+
+    order = np.argsort(heads, kind="stable")
+    starts = np.flatnonzero(np.r_[True, np.diff(heads[order]) != 0])
+
+    return order, starts, heads[order][starts]
+
+
+def _dag_distances(num_nodes, tails, heads, weights, sources, levels):
+    """Compute the shortest distances from some sources in an acyclic network
+
+    Arcs are relaxed one level at a time, following the topological order of their starting
+    nodes, so that each relaxation is a single vectorized operation over all the sources and,
+    possibly, over many network instances sharing the same topology
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the weight of each arc, with shape (..., num_of_arcs) to
+          compute the distances for many network instances at once
+        sources (np.ndarray): the nodes from which distances are computed
+        levels (np.ndarray): the topological level of each node
+
+    Returns:
+        np.ndarray: a (..., len(sources), num_nodes) array of distances, inf for unreachable nodes
+    """
+
+    weights = np.asarray(weights, dtype=float)
+    distances = np.full(weights.shape[:-1] + (len(sources), num_nodes), np.inf)
+    distances[..., np.arange(len(sources)), sources] = 0
+
+    arc_levels = levels[tails]
+    for level in np.unique(arc_levels):
+        level_arcs = np.flatnonzero(arc_levels == level)
+        order, starts, group_heads = _head_groups(heads[level_arcs])
+        level_arcs = level_arcs[order]
+
+        candidates = distances[..., tails[level_arcs]] + weights[..., None, level_arcs]
+        distances[..., group_heads] = np.minimum(distances[..., group_heads],
+                                                 np.minimum.reduceat(candidates, starts, axis=-1))
+
+    return distances
+
+
+def _dag_predecessor_arcs(tails, heads, weights, distances):
+    """Compute, for each source, the arc through which each node is reached along a shortest path
+
+    Among the arcs that are tight, i.e. that realize the shortest distance of their ending
+    node, the one with the smallest position is chosen
+
+    Args:
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the weight of each arc, with shape (..., num_of_arcs)
+        distances (np.ndarray): a (..., num_of_sources, num_nodes) array of shortest distances
+
+    Returns:
+        np.ndarray: a (..., num_of_sources, num_nodes) array with the position of the predecessor
+          arc of each node, -1 for sources and unreachable nodes
+    """
+
+    num_arcs = len(tails)
+    weights = np.asarray(weights, dtype=float)
+    order, starts, group_heads = _head_groups(heads)
+
+    head_distances = distances[..., heads[order]]
+    tight = (np.isfinite(head_distances)
+             & (distances[..., tails[order]] + weights[..., None, order] == head_distances))
+
+    # first tight arc, in the sorted order, of each group of arcs entering the same node
+    sorted_positions = np.where(tight, np.arange(num_arcs), num_arcs)
+    first_tight = np.minimum.reduceat(sorted_positions, starts, axis=-1)
+
+    predecessor_arcs = np.full(distances.shape, -1)
+    predecessor_arcs[..., group_heads] = np.where(first_tight < num_arcs,
+                                                  order[np.minimum(first_tight, num_arcs - 1)],
+                                                  -1)
+
+    return predecessor_arcs
+
+
+def dag_shortest_path_trees(num_nodes, tails, heads, weights, sources):
+    """Compute the shortest path trees rooted in some sources for many acyclic network instances
+
+    Args:
+        num_nodes (int): number of nodes in the networks
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): a (num_of_instances, num_of_arcs) matrix with the weights of the
+          arcs of each network instance
+        sources (np.ndarray): the roots of the trees
+
+    Returns:
+        tuple: a tuple (distances, predecessor_arcs) of (num_of_instances, len(sources), num_nodes)
+          arrays, see shortest_path_trees()
+    """
+
+    levels = _node_levels(num_nodes, tails, heads)
+    if levels is None:
+        raise ValueError("The network instances are not acyclic")
+
+    distances = _dag_distances(num_nodes, tails, heads, weights, sources, levels)
+    return distances, _dag_predecessor_arcs(tails, heads, weights, distances)
+
+
+def _dijkstra_predecessor_arcs(num_nodes, tails, heads, weights, sources):
+    """Compute shortest distances and predecessor arcs from some sources with Dijkstra's algorithm
+
+    Used for networks with cycles. Among parallel arcs only the lightest one is considered
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the weight of each arc
+        sources (np.ndarray): the nodes from which distances are computed
+
+    Returns:
+        tuple: a tuple (distances, predecessor_arcs) of (len(sources), num_nodes) matrices,
+          see _dag_distances() and _dag_predecessor_arcs()
+    """
+
+    # keep the lightest arc between each pair of nodes
+    by_pair = np.lexsort((weights, heads, tails))
+    is_first = np.ones(len(by_pair), dtype=bool)
+    is_first[1:] = (np.diff(tails[by_pair]) != 0) | (np.diff(heads[by_pair]) != 0)
+    lightest = by_pair[is_first]
+
+    graph = sparse.csr_matrix((weights[lightest], (tails[lightest], heads[lightest])),
+                              shape=(num_nodes, num_nodes))
+    arc_of_pair = sparse.csr_matrix((lightest + 1, (tails[lightest], heads[lightest])),
+                                    shape=(num_nodes, num_nodes))
+
+    distances, predecessors = csgraph.dijkstra(graph, indices=sources, return_predecessors=True)
+
+    reached = predecessors >= 0
+    predecessor_arcs = np.full(distances.shape, -1)
+    predecessor_arcs[reached] = np.asarray(arc_of_pair[predecessors[reached],
+                                                       np.nonzero(reached)[1]]).ravel() - 1
+
+    return distances, predecessor_arcs
+
+
+def shortest_path_trees(num_nodes, tails, heads, weights, sources):
+    """Compute the shortest path trees rooted in some sources
+
+    Acyclic networks, as the grid-like ones of the paper, are solved by dynamic programming
+    along their topological order, other networks by Dijkstra's algorithm
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the non-negative weight of each arc
+        sources (np.ndarray): the roots of the trees
+
+    Returns:
+        tuple: a tuple (distances, predecessor_arcs) of (len(sources), num_nodes) matrices with
+          the shortest distance of each node from each source and the position of the arc
+          through which it is reached (-1 for sources and unreachable nodes)
+    """
+
+    levels = _node_levels(num_nodes, tails, heads)
+    if levels is None:
+        return _dijkstra_predecessor_arcs(num_nodes, tails, heads, weights, sources)
+
+    distances = _dag_distances(num_nodes, tails, heads, weights, sources, levels)
+    return distances, _dag_predecessor_arcs(tails, heads, weights, distances)
+
+
+def _trace_paths(tails, predecessor_arcs, sources, termini, max_num_of_arcs):
+    """Walk the shortest path trees backward from the termini to the sources
+
+    Args:
+        tails (np.ndarray): the starting node of each arc
+        predecessor_arcs (np.ndarray): for each path, the predecessor arc of each node
+        sources (np.ndarray): the source of each path
+        termini (np.ndarray): the terminus of each path
+        max_num_of_arcs (int): maximum number of arcs in a path
+
+    Returns:
+        np.ndarray: a (num_of_paths, max_num_of_arcs) matrix with the positions of the arcs of
+          each path, from the terminus backward, padded with -1
+    """
+
+    paths = np.full((len(termini), max_num_of_arcs), -1)
+    current_nodes = termini.copy()
+    walking = current_nodes != sources
+
+    for step in range(max_num_of_arcs):
+        if not walking.any():
+            break
+        path_pos = np.flatnonzero(walking)
+        arcs = predecessor_arcs[path_pos, current_nodes[path_pos]]
+        paths[path_pos, step] = arcs
+        current_nodes[path_pos] = tails[arcs]
+        walking[path_pos] = current_nodes[path_pos] != sources[path_pos]
+
+    return paths
+
+
+def shortest_path(num_nodes, tails, heads, weights, source, terminus):
+    """Compute a shortest path between two nodes
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        weights (np.ndarray): the non-negative weight of each arc
+        source (int): the starting node of the path
+        terminus (int): the ending node of the path
+
+    Returns:
+        np.ndarray: the positions of the arcs of the path, from the source to the terminus,
+          or None if the terminus can not be reached
+    """
+
+    distances, predecessor_arcs = shortest_path_trees(num_nodes, tails, heads, weights,
+                                                      np.array([source]))
+    if not np.isfinite(distances[0, terminus]):
+        return None
+
+    path = _trace_paths(tails, predecessor_arcs, np.array([source]), np.array([terminus]), num_nodes)[0]
+    return path[path >= 0][::-1]
+
+
+def solve_MSPP(nodes, w_arcs, agents):
+    """Solve a MSPP routing each agent along a shortest path, without building a MIP
+
+    Without deconfliction the MSPP decomposes into an independent shortest path problem for
+    each agent, and agents with the same source share a single shortest path tree
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+
+    Returns:
+        tuple: a tuple (x, objectives) where:
+          - x is a (len(w_arcs), len(agents)) np.ndarray with the same meaning of X.x for the
+            MSPP formulated by problem_model.set_MSPP()
+          - objectives is a list with the optimal total distance, as the one returned by
+            problem_model.evaluate_pb_objectives()
+    """
+
+    arcs = sorted(w_arcs, key=lambda arc: arc.idx)
+    tails = np.array([arc.i for arc in arcs], dtype=int)
+    heads = np.array([arc.j for arc in arcs], dtype=int)
+    weights = np.array([arc.w for arc in arcs], dtype=float)
+    arc_idxs = np.array([arc.idx for arc in arcs], dtype=int)
+
+    agent_idxs = np.array([agent.idx for agent in agents], dtype=int)
+    sources = np.array([agent.source for agent in agents], dtype=int)
+    termini = np.array([agent.terminus for agent in agents], dtype=int)
+
+    # a single tree for each distinct source
+    tree_sources, tree_of_agent = np.unique(sources, return_inverse=True)
+    distances, predecessor_arcs = shortest_path_trees(len(nodes), tails, heads, weights, tree_sources)
+
+    agent_distances = distances[tree_of_agent, termini]
+    if not np.isfinite(agent_distances).all():
+        unreachable = agent_idxs[~np.isfinite(agent_distances)]
+        raise ValueError(f"Agents {unreachable.tolist()} can not reach their terminus")
+
+    paths = _trace_paths(tails, predecessor_arcs[tree_of_agent], sources, termini, len(nodes))
+
+    x = np.zeros((len(w_arcs), len(agents)))
+    path_pos, step = np.nonzero(paths >= 0)
+    x[arc_idxs[paths[path_pos, step]], agent_idxs[path_pos]] = 1
+
+    return x, [float(weights[paths[path_pos, step]].sum())]
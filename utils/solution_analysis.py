@@ -0,0 +1,222 @@
+"""Module that contains functions to analyze the solutions of MSPPs and MSPP-PDs, one or many at once
+
+Solutions are the values of X (and R) as returned by the solver, i.e. (len(w_arcs), num_of_agents)
+matrices, or arrays stacking the solutions of many solves along their first axes, e.g. with
+shape (num_of_instances, len(w_arcs), num_of_agents). Agents are identified by idx
+"""
+from . import np
+from . import problem_model
+
+
+def _arcs_by_idx(w_arcs):
+    """Gives the starting node, the ending node and the weight of each arc, ordered by idx"""
+
+    idxs, tails, heads, weights = problem_model._arc_arrays(w_arcs)
+    order = np.argsort(idxs)
+
+    return tails[order], heads[order], weights[order]
+
+
+def _agent_columns(x, agents):
+    """Gives the values of the agents' columns of a (stack of) solution(s), rounded to integers"""
+
+    agent_idxs, *_ = problem_model._agent_arrays(agents)
+
+    return np.rint(np.asarray(x)[..., agent_idxs]).astype(int)
+
+
+def _per_agent(matrix, x):
+    """Multiply a sparse matrix by each agent's column of each stacked solution
+
+    Args:
+        matrix (sparse.spmatrix): a (num_of_rows, len(w_arcs)) matrix
+        x (np.ndarray): a (..., len(w_arcs), num_of_agents) array
+
+    Returns:
+        np.ndarray: a (..., num_of_rows, num_of_agents) array
+    """
+
+    num_arcs, num_agents = x.shape[-2:]
+    stacked = np.moveaxis(x, -2, 0).reshape(num_arcs, -1)  # arcs x (solutions * agents)
+    product = np.asarray(matrix @ stacked)
+
+    return np.moveaxis(product.reshape((matrix.shape[0],) + x.shape[:-2] + (num_agents,)), 0, -2)
+
+
+def agent_distances(x, w_arcs, agents):
+    """Compute the distance travelled by each agent
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of routed agents
+
+    Returns:
+        np.ndarray: a (..., len(agents)) array with the distance of each agent
+    """
+
+    _, _, weights = _arcs_by_idx(w_arcs)
+
+    return np.einsum("a,...ak->...k", weights, _agent_columns(x, agents))
+
+
+def arc_counts(x, agents):
+    """Count the agents traversing each arc
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        agents (list): list of routed agents
+
+    Returns:
+        np.ndarray: a (..., num_of_arcs) array with the number of agents on each arc, by idx
+    """
+
+    return _agent_columns(x, agents).sum(axis=-1)
+
+
+def node_usage(x, nodes, w_arcs, agents, r=None):
+    """Tell which nodes each agent traverses
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of routed agents
+        r (np.ndarray): the value of R, or a stack of them. By default nodes are found from the
+          arcs. Note that R is only bounded from below by X in the NBP and NLP, so it can be 1 on
+          nodes not traversed where that does not increase the penalty
+
+    Returns:
+        np.ndarray: a (..., len(nodes), len(agents)) array of 0/1, 1 if the agent traverses the node
+    """
+
+    if r is not None:
+        return _agent_columns(r, agents)[..., np.asarray(nodes, dtype=int), :]
+
+    # a node is traversed if any arc leaving or entering it is
+    touching = abs(problem_model._incidence_matrix(nodes, w_arcs))[np.asarray(nodes, dtype=int)]
+
+    return (_per_agent(touching, _agent_columns(x, agents)) > 0).astype(int)
+
+
+def conflict_totals(arc_counts, node_counts):
+    """Compute the penalty of every MSPP-PD variant from the number of agents on arcs and nodes
+
+    Args:
+        arc_counts (np.ndarray): a (..., num_of_arcs) array with the agents on each arc
+        node_counts (np.ndarray): a (..., num_of_nodes) array with the agents on each node
+
+    Returns:
+        dict: a dict with the penalty, an array with shape (...), of each MSPP-PD variant, e.g. "ABP"
+    """
+
+    totals = {}
+    for element, counts in (("A", arc_counts), ("N", node_counts)):
+        totals[f"{element}BP"] = (counts > 1).sum(axis=-1)
+        totals[f"{element}LP"] = np.maximum(counts - 1, 0).sum(axis=-1)
+        totals[f"{element}QP"] = (counts * (counts - 1) // 2).sum(axis=-1)
+
+    return {problem_type: totals[problem_type] for problem_type in ["ABP", "NBP", "ALP", "NLP", "AQP", "NQP"]}
+
+
+def flow_residuals(x, nodes, w_arcs, agents):
+    """Compute how much the paths of the agents violate the flow constraints (4)
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of routed agents
+
+    Returns:
+        np.ndarray: a (..., len(agents)) array with the largest violation over the nodes for each
+          agent, 0 if its arcs form a flow from its source to its terminus
+    """
+
+    node_labels = np.asarray(nodes, dtype=int)
+    _, sources, termini = problem_model._agent_arrays(agents)
+    outflows = _per_agent(problem_model._incidence_matrix(nodes, w_arcs)[node_labels], _agent_columns(x, agents))
+
+    # +1 on the source, -1 on the terminus, 0 elsewhere (the source wins if they coincide)
+    rhs = np.zeros((len(nodes), len(agents)))
+    rhs[termini[None, :] == node_labels[:, None]] = -1
+    rhs[sources[None, :] == node_labels[:, None]] = 1
+
+    return np.abs(outflows - rhs).max(axis=-2, initial=0)
+
+
+def path_nodes(x, nodes, w_arcs, agents):
+    """Gives the sequence of nodes traversed by each agent, from its source
+
+    Paths are followed from the source along the arcs with value 1, for all the agents and
+    solutions at once. An agent leaving a node along more than one arc follows the one with
+    the highest idx
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of routed agents
+
+    Returns:
+        np.ndarray: a (..., len(agents), len(nodes)) array with the nodes of each agent's path,
+          padded with -1
+    """
+
+    tails, heads, _ = _arcs_by_idx(w_arcs)
+    _, sources, termini = problem_model._agent_arrays(agents)
+    used = np.moveaxis(_agent_columns(x, agents), -1, -2) > 0  # (..., agents, arcs)
+    num_nodes = int(np.max(nodes)) + 1
+
+    # the next node from each node, -1 if the agent does not leave it
+    successors = np.full(used.shape[:-1] + (num_nodes,), -1)
+    *solution_pos, arc_pos = np.nonzero(used)
+    successors[(*solution_pos, tails[arc_pos])] = heads[arc_pos]
+
+    sequences = np.full(used.shape[:-1] + (len(nodes),), -1)
+    current = np.broadcast_to(sources, used.shape[:-1]).copy()
+    walking = np.ones(current.shape, dtype=bool)
+    for step in range(len(nodes)):
+        sequences[..., step] = np.where(walking, current, -1)
+        walking &= current != termini
+        current = np.where(walking,
+                           np.take_along_axis(successors, np.maximum(current, 0)[..., None], axis=-1)[..., 0],
+                           -1)
+        walking &= current >= 0
+        if not walking.any():
+            break
+
+    return sequences
+
+
+def analyze_solutions(x, nodes, w_arcs, agents, r=None):
+    """Analyze one or many solutions of MSPPs or MSPP-PDs with vectorized passes
+
+    Args:
+        x (np.ndarray): the value of X, or a stack of them
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of routed agents
+        r (np.ndarray): the value of R, or a stack of them. By default nodes are found from the arcs
+
+    Returns:
+        dict: a dict with, for each solution:
+          - "paths": the nodes of each agent's path, see path_nodes()
+          - "distances": the distance travelled by each agent
+          - "arc_counts", "node_counts": the number of agents on each arc (by idx) and node
+          - "conflicts": the penalty of every MSPP-PD variant, see conflict_totals()
+          - "flow_residuals": the violation of the flow constraints of each agent
+          - "valid": True if the paths of all the agents satisfy the flow constraints
+    """
+
+    counts_on_arcs = arc_counts(x, agents)
+    counts_on_nodes = node_usage(x, nodes, w_arcs, agents, r).sum(axis=-1)
+    residuals = flow_residuals(x, nodes, w_arcs, agents)
+
+    return {"paths": path_nodes(x, nodes, w_arcs, agents),
+            "distances": agent_distances(x, w_arcs, agents),
+            "arc_counts": counts_on_arcs,
+            "node_counts": counts_on_nodes,
+            "conflicts": conflict_totals(counts_on_arcs, counts_on_nodes),
+            "flow_residuals": residuals,
+            "valid": (residuals == 0).all(axis=-1)}
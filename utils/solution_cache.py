@@ -0,0 +1,223 @@
+"""Module that contains a persistent cache of the solutions of MSPPs and MSPP-PDs"""
+from . import os
+from . import hashlib
+from . import np
+from . import problem_model
+
+
+def _canonical(value):
+    """Convert a value into a representation that does not depend on the identity of its objects
+
+    Args:
+        value: a number, string, list, tuple, dict or object with attributes
+
+    Returns:
+        a nested structure of tuples, numbers and strings
+    """
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, _canonical(item)) for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_canonical(item) for item in value)
+    elif hasattr(value, "__dict__"):
+        return (value.__class__.__name__, _canonical(vars(value)))
+
+    return value
+
+
+def solution_key(problem_type, nodes, w_arcs, agents, params=None, **problem_options):
+    """Compute the key that identifies the solution of a problem
+
+    The key is the hash of the formulation, of the topology and the weights of the network
+    instance, of the agents and of the solver's parameters, so that equal problems built from
+    different objects share the same key
+
+    Args:
+        problem_type (str): the optimization problem. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        params (dict): Gurobi's parameters used to solve the problem, e.g. {"TimeLimit": 600}
+        **problem_options: other options of problem_model.set_problem(), e.g. penalty_formulation
+
+    Returns:
+        str: the hexadecimal key
+    """
+
+    arc_idxs, tails, heads, weights = problem_model._arc_arrays(w_arcs)
+    agent_idxs, sources, termini = problem_model._agent_arrays(agents)
+
+    digest = hashlib.sha256()
+    digest.update(repr((problem_type,
+                        _canonical(params or {}),
+                        _canonical(problem_options))).encode())
+    for array in [np.asarray(nodes, dtype=np.int64),
+                  np.column_stack([arc_idxs, tails, heads]).astype(np.int64),
+                  weights.astype(np.float64),
+                  np.column_stack([agent_idxs, sources, termini]).astype(np.int64)]:
+        digest.update(np.ascontiguousarray(array).tobytes())
+
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    """Class to store on disk the solutions of problems, to avoid solving them again
+
+    Each solution is a .npz file, named after its key, in the cache's directory. When the
+    cache exceeds its limits the least recently used solutions are evicted
+
+    Attributes:
+        dirname (str): the directory of the cache
+        max_entries (int): maximum number of solutions kept, None for no limit
+        max_bytes (int): maximum size (bytes) of the solutions kept, None for no limit
+        hits (int): number of lookups that found a solution
+        misses (int): number of lookups that found no solution
+    """
+
+    def __init__(self, dirname, max_entries=None, max_bytes=None):
+        """Initialize the instance, creating the directory if missing
+
+        Args:
+            dirname (str): the directory of the cache
+            max_entries (int): maximum number of solutions kept. By default there is no limit
+            max_bytes (int): maximum size (bytes) of the solutions kept. By default there is no limit
+        """
+
+        self.dirname = dirname
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(dirname, exist_ok=True)
+
+    def __repr__(self):
+        """Return the representation of the cache instance"""
+
+        return f"{self.__class__.__name__}({self.dirname!r}, entries={len(self)!r})"
+
+    def __len__(self):
+        """Return the number of solutions in the cache"""
+
+        return len(self._entries())
+
+    def __contains__(self, key):
+        """Tell if the cache has a solution for the key"""
+
+        return os.path.exists(self._filename(key))
+
+    def _filename(self, key):
+        """Gives the file of the solution with the given key"""
+
+        return os.path.join(self.dirname, f"{key}.npz")
+
+    def _entries(self):
+        """Gives the files of the solutions in the cache"""
+
+        return [entry for entry in os.scandir(self.dirname)
+                if entry.is_file() and entry.name.endswith(".npz")]
+
+    def get(self, key):
+        """Look up the solution with the given key, marking it as recently used
+
+        Args:
+            key (str): the key of the solution, see solution_key()
+
+        Returns:
+            dict: the solution, see solve(), or None if it is not in the cache
+        """
+
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as saved:
+                solution = {"x": saved["x"] if saved["has_x"] else None,
+                            "objectives": saved["objectives"].tolist(),
+                            "status": int(saved["status"]),
+                            "runtime": float(saved["runtime"])}
+        except (FileNotFoundError, OSError, ValueError, KeyError):  # missing or corrupted
+            self.misses += 1
+            return None
+
+        os.utime(filename)  # the modification time tracks the last use
+        self.hits += 1
+
+        return solution
+
+    def put(self, key, solution):
+        """Store a solution, evicting the least recently used ones if the cache is full
+
+        Args:
+            key (str): the key of the solution, see solution_key()
+            solution (dict): the solution, see solve()
+        """
+
+        filename = self._filename(key)
+        tmp_filename = filename + ".tmp.npz"
+        has_x = solution["x"] is not None
+        np.savez(tmp_filename,
+                 x=solution["x"] if has_x else np.empty(0),
+                 has_x=has_x,
+                 objectives=np.asarray(solution["objectives"], dtype=float),
+                 status=solution["status"],
+                 runtime=solution["runtime"])
+        os.replace(tmp_filename, filename)  # readers never see a partial file
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used solutions until the cache respects its limits"""
+
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        total_bytes = sum(entry.stat().st_size for entry in entries)
+
+        while entries and ((self.max_entries is not None and len(entries) > self.max_entries)
+                           or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+            entry = entries.pop(0)
+            total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def clear(self):
+        """Remove all the solutions"""
+
+        for entry in self._entries():
+            os.remove(entry.path)
+
+    def solve(self, problem_type, nodes, w_arcs, agents, params=None, **problem_options):
+        """Give the solution of a problem, solving it only if it is not in the cache
+
+        Args:
+            problem_type (str): The optimization problem to solve. Only MSPP and MSPP-PD variants are accepted
+            nodes (list): list of the nodes in the network instance
+            w_arcs (list): list of weighted arcs in the network instance
+            agents (list): list of agents that has to be routed
+            params (dict): Gurobi's parameters to set before solving, e.g. {"TimeLimit": 600}
+            **problem_options: other options of problem_model.set_problem(), e.g. penalty_formulation
+
+        Returns:
+            dict: a dict with the value of X ("x", None if no solution was found), the value of
+              each objective ("objectives"), the final status ("status"), the solver's runtime (s)
+              ("runtime") and whether the solution comes from the cache ("cached")
+        """
+
+        key = solution_key(problem_type, nodes, w_arcs, agents, params, **problem_options)
+        solution = self.get(key)
+        if solution is not None:
+            return {**solution, "cached": True}
+
+        problem, X, *_ = problem_model.set_problem(problem_type, nodes, w_arcs, agents, **problem_options)
+        for name, value in (params or {}).items():
+            problem.setParam(name, value)
+        problem.optimize()
+
+        objectives, x = [], None
+        if problem.SolCount > 0:
+            problem.params.SolutionNumber = 0
+            for obj in range(problem.NumObj):
+                problem.params.ObjNumber = obj
+                objectives.append(problem.ObjNVal)
+            x = X.X
+
+        solution = {"x": x, "objectives": objectives, "status": problem.Status, "runtime": problem.Runtime}
+        self.put(key, solution)
+
+        return {**solution, "cached": False}
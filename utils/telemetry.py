@@ -0,0 +1,246 @@
+"""Module that contains functions to record structured statistics of the solves of MSPPs and MSPP-PDs"""
+from . import time
+from . import json
+from . import np
+from . import gb
+from . import GRB
+from . import problem_model
+
+
+def _progress_callback(problem, where):
+    """Gurobi callback that records the first incumbent and the progress of the MIP gap
+
+    Samples are taken at most every problem._sample_interval seconds and each time a new
+    incumbent is found
+    """
+
+    if where == GRB.Callback.MIPSOL:
+        runtime = problem.cbGet(GRB.Callback.RUNTIME)
+        if problem._first_incumbent is None:
+            problem._first_incumbent = {"time": runtime,
+                                        "objective": problem.cbGet(GRB.Callback.MIPSOL_OBJ)}
+        problem._progress.append({"time": runtime,
+                                  "best_objective": problem.cbGet(GRB.Callback.MIPSOL_OBJBST),
+                                  "best_bound": problem.cbGet(GRB.Callback.MIPSOL_OBJBND)})
+
+    elif where == GRB.Callback.MIP:
+        runtime = problem.cbGet(GRB.Callback.RUNTIME)
+        if runtime - problem._last_sample >= problem._sample_interval:
+            problem._last_sample = runtime
+            problem._progress.append({"time": runtime,
+                                      "best_objective": problem.cbGet(GRB.Callback.MIP_OBJBST),
+                                      "best_bound": problem.cbGet(GRB.Callback.MIP_OBJBND)})
+
+
+def _gap(best_objective, best_bound):
+    """Gives the relative MIP gap as computed by Gurobi, inf if there is no incumbent or bound"""
+
+    if abs(best_objective) >= GRB.INFINITY or abs(best_bound) >= GRB.INFINITY:
+        return float("inf")
+    if best_objective == best_bound:
+        return 0.0
+    return abs(best_objective - best_bound) / max(abs(best_objective), 1e-10)
+
+
+def _finite(value):
+    """Convert infinite and NaN values, including GRB.INFINITY, to None, that are valid JSON"""
+
+    return value if np.isfinite(value) and abs(value) < GRB.INFINITY else None
+
+
+def _final_sample(problem, objective_exprs):
+    """Gives the best objective and bound at the end of a solve
+
+    A blended problem is solved with its objectives replaced by their weighted sum, whose bound
+    Gurobi reports. Gurobi does not report the bound of the passes of the hierarchical mode:
+    only the objective of the last pass is known
+
+    Args:
+        problem (gb.Model): the solved problem
+        objective_exprs (list): the objectives of a blended problem, None in the hierarchical mode
+
+    Returns:
+        dict: a sample with "time", "best_objective" and "best_bound"
+    """
+
+    best_objective, best_bound = GRB.INFINITY, -GRB.INFINITY
+    if objective_exprs is not None:
+        if problem.SolCount > 0:
+            best_objective = problem.ObjVal
+        try:
+            best_bound = problem.ObjBound
+        except (AttributeError, gb.GurobiError):  # not available, e.g. if the solve ended in presolve
+            pass
+    elif problem.SolCount > 0:
+        problem.params.SolutionNumber = 0
+        levels = []
+        for obj in range(problem.NumObj):
+            problem.params.ObjNumber = obj
+            levels.append((problem.ObjNPriority, problem.ObjNWeight * problem.ObjNVal))
+        last_priority = min(priority for priority, _ in levels)
+        best_objective = sum(value for priority, value in levels if priority == last_priority)
+
+    return {"time": problem.Runtime, "best_objective": best_objective, "best_bound": best_bound}
+
+
+def _presolve_blended(problem):
+    """Presolve a copy of a problem whose objectives are blended into a single one
+
+    Gurobi presolves multi-objective models ignoring the objectives, that would let it
+    remove almost everything
+
+    Args:
+        problem (gb.Model): the problem
+
+    Returns:
+        gb.Model: the presolved model
+    """
+
+    blended = problem.copy()
+    problem_model.blend_objectives(blended)
+
+    presolved = blended.presolve()
+    blended.dispose()
+
+    return presolved
+
+
+def profile_solve(problem_type, nodes, w_arcs, agents, params=None, presolve_stats=True,
+                  sample_interval=1.0, objective_mode="blended", levels=None,
+                  penalty_formulation="pairs"):
+    """Build and solve a problem recording statistics of each phase
+
+    Args:
+        problem_type (str): The optimization problem to solve. Only MSPP and MSPP-PD variants are accepted
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        params (dict): Gurobi's parameters to set before solving, e.g. {"TimeLimit": 600}
+        presolve_stats (bool): if True (default) the model is also presolved on its own, to
+          measure the reduction of its size. The time is not included in the solve
+        sample_interval (float): minimum time (s) between two samples of the MIP gap (default is 1)
+        objective_mode (str): see problem_model.set_problem()
+        levels (list): see problem_model.set_problem()
+        penalty_formulation (str): see problem_model.set_problem()
+
+    Returns:
+        dict: a JSON serializable record with:
+          - "problem_type", "num_nodes", "num_arcs", "num_agents": the solved problem
+          - "describe_times", "load_times": time (s) to describe and to load into Gurobi
+            each block of variables, objective and family of constraints
+          - "update_time": time (s) Gurobi spent processing the loaded model
+          - "build_time": overall time (s) to build the model
+          - "num_vars", "num_constrs", "num_nonzeros": size of the model
+          - "presolved_num_vars", "presolved_num_constrs", "presolved_num_nonzeros", "presolve_time":
+            size of the presolved model and time (s) to presolve it (None without presolve_stats)
+          - "first_incumbent_time", "first_incumbent_objective": when the first solution was
+            found and its objective (None if none was found)
+          - "gap_progress": list of {"time", "best_objective", "best_bound", "gap"} samples,
+            the last one at the end of the solve
+          - "node_count", "mip_gap", "objectives", "status", "runtime": final state of the solve.
+            In the blended mode the objectives are solved as their weighted sum, that is
+            equivalent, so that Gurobi reports its bound and gap. In the hierarchical mode
+            samples mix the objectives of the passes and the final bound and gap are None, as
+            Gurobi does not report them
+    """
+
+    record = {"problem_type": problem_type,
+              "num_nodes": len(nodes),
+              "num_arcs": len(w_arcs),
+              "num_agents": len(agents)}
+
+    start = time.perf_counter()
+    description = problem_model.describe_problem(problem_type, nodes, w_arcs, agents,
+                                                 penalty_formulation)
+    load_times = {}
+    problem, *_ = problem_model.to_gurobi_model(description, load_times)
+    if objective_mode != "blended" or levels is not None:
+        problem_model.set_objective_mode(problem, objective_mode, levels)
+    update_start = time.perf_counter()
+    problem.update()
+    record["update_time"] = time.perf_counter() - update_start
+    record["build_time"] = time.perf_counter() - start
+    record["describe_times"] = dict(description.build_times)
+    record["load_times"] = load_times
+
+    record["num_vars"] = problem.NumVars
+    record["num_constrs"] = problem.NumConstrs
+    record["num_nonzeros"] = problem.NumNZs
+
+    for name, value in (params or {}).items():
+        problem.setParam(name, value)
+
+    objective_exprs = None
+    if objective_mode == "blended":
+        objective_exprs = [problem.getObjective(obj) for obj in range(problem.NumObj)]
+        problem_model.blend_objectives(problem)
+
+    record.update(presolved_num_vars=None, presolved_num_constrs=None,
+                  presolved_num_nonzeros=None, presolve_time=None)
+    if presolve_stats:
+        start = time.perf_counter()
+        presolved = _presolve_blended(problem) if objective_exprs is None else problem.presolve()
+        record.update(presolved_num_vars=presolved.NumVars,
+                      presolved_num_constrs=presolved.NumConstrs,
+                      presolved_num_nonzeros=presolved.NumNZs,
+                      presolve_time=time.perf_counter() - start)
+        presolved.dispose()
+
+    problem._first_incumbent = None
+    problem._progress = []
+    problem._last_sample = -np.inf
+    problem._sample_interval = sample_interval
+    problem.optimize(_progress_callback)
+
+    first_incumbent = problem._first_incumbent or {"time": None, "objective": None}
+    record["first_incumbent_time"] = first_incumbent["time"]
+    record["first_incumbent_objective"] = first_incumbent["objective"]
+    record["gap_progress"] = [{"time": sample["time"],
+                               "best_objective": _finite(sample["best_objective"]),
+                               "best_bound": _finite(sample["best_bound"]),
+                               "gap": _finite(_gap(sample["best_objective"], sample["best_bound"]))}
+                              for sample in problem._progress + [_final_sample(problem, objective_exprs)]]
+
+    objectives = []
+    if problem.SolCount > 0 and objective_exprs is not None:
+        objectives = [expr.getValue() for expr in objective_exprs]
+    elif problem.SolCount > 0:
+        problem.params.SolutionNumber = 0
+        for obj in range(problem.NumObj):
+            problem.params.ObjNumber = obj
+            objectives.append(problem.ObjNVal)
+
+    record["node_count"] = problem.NodeCount
+    record["mip_gap"] = record["gap_progress"][-1]["gap"]
+    record["objectives"] = objectives
+    record["status"] = problem.Status
+    record["runtime"] = problem.Runtime
+
+    return record
+
+
+def write_records(records, filename):
+    """Append records to a JSON lines file, one record per line
+
+    Args:
+        records (list): list of JSON serializable dicts, as the ones returned by profile_solve()
+        filename (str): The name of the file
+    """
+
+    with open(filename, "a") as records_file:
+        for record in records:
+            records_file.write(json.dumps(record) + "\n")
+
+
+def read_records(filename):
+    """Read the records of a JSON lines file
+
+    Args:
+        filename (str): The name of the file
+
+    Returns:
+        list: list of dicts, one for each line of the file
+    """
+
+    with open(filename) as records_file:
+        return [json.loads(line) for line in records_file if line.strip()]
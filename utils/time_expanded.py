@@ -0,0 +1,572 @@
+"""Module that contains the time-expanded MSPP-PD, where agents conflict only if they use the network at the same time"""
+from . import np
+from . import sparse
+from . import GRB
+from . import shortest_paths
+from . import problem_model
+
+
+def _ragged_ranges(starts, counts):
+    """Concatenate the integer ranges [start, start + count) of many groups
+
+    Args:
+        starts (np.ndarray): the first value of each group
+        counts (np.ndarray): the number of values of each group, possibly 0
+
+    Returns:
+        tuple: a tuple (groups, values) of np.ndarray with the group of each value and the value itself
+    """
+
+    counts = np.maximum(counts, 0)
+    groups = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(len(groups)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return groups, np.repeat(starts, counts) + offsets
+
+
+def _hop_distances(num_nodes, tails, heads, sources, termini):
+    """Compute the minimum number of arcs from each agent's source and to each agent's terminus
+
+    Args:
+        num_nodes (int): number of nodes in the network
+        tails (np.ndarray): the starting node of each arc
+        heads (np.ndarray): the ending node of each arc
+        sources (np.ndarray): the source of each agent
+        termini (np.ndarray): the terminus of each agent
+
+    Returns:
+        tuple: a tuple (from_source, to_terminus) of (num_of_agents, num_nodes) matrices, inf for
+          the nodes that can not be reached or can not reach
+    """
+
+    unit_weights = np.ones(len(tails))
+
+    tree_sources, tree_of_agent = np.unique(sources, return_inverse=True)
+    from_source, _ = shortest_paths.shortest_path_trees(num_nodes, tails, heads, unit_weights, tree_sources)
+
+    # distances to a terminus are distances from it along the reversed arcs
+    tree_termini, tree_of_agent_ = np.unique(termini, return_inverse=True)
+    to_terminus, _ = shortest_paths.shortest_path_trees(num_nodes, heads, tails, unit_weights, tree_termini)
+
+    return from_source[tree_of_agent], to_terminus[tree_of_agent_]
+
+
+def _group_rows(keys, agents):
+    """Group the variables sharing a key, counting the distinct agents of each group
+
+    Args:
+        keys (np.ndarray): the key of each variable
+        agents (np.ndarray): the agent of each variable
+
+    Returns:
+        tuple: a tuple (rows, num_agents) with the group of each variable and the number of
+          distinct agents in each group
+    """
+
+    group_keys, rows = np.unique(keys, return_inverse=True)
+    group_agent_pairs = np.unique(rows * (agents.max(initial=0) + 1) + agents)
+    num_agents = np.bincount(group_agent_pairs // (agents.max(initial=0) + 1), minlength=len(group_keys))
+
+    return rows, num_agents
+
+
+class TimeExpansion:
+    """Class to represent the time-expanded copy of a network on which agents are routed
+
+    Time is discrete, from 0 to the horizon, and traversing an arc takes a single time step.
+    Each variable of the time-expanded problem is an agent moving along an arc, or waiting on
+    a node, from time t to time t+1. Only the moves that let the agent leave its source at
+    time 0 and reach its terminus by the horizon are kept
+
+    Attributes:
+        horizon (int): the last time step
+        agents (list): list of agents that has to be routed
+        num_arcs (int): number of arcs of the network
+        var_agents (np.ndarray): position, in agents, of the agent of each variable
+        var_arcs (np.ndarray): idx of the arc of each variable, -1 for waits
+        var_tails (np.ndarray): the node of the agent at time t
+        var_heads (np.ndarray): the node of the agent at time t+1
+        var_times (np.ndarray): the time t of each variable
+        num_unpruned_vars (int): number of variables without pruning, for all the agents, arcs,
+          nodes and time steps
+    """
+
+    def __init__(self, horizon, agents, num_arcs, var_agents, var_arcs, var_tails, var_heads, var_times):
+        """Initialize the instance based on the variables of the time-expanded problem
+
+        Args:
+            horizon (int): the last time step
+            agents (list): list of agents that has to be routed
+            num_arcs (int): number of arcs of the network
+            var_agents (np.ndarray): position of the agent of each variable
+            var_arcs (np.ndarray): idx of the arc of each variable, -1 for waits
+            var_tails (np.ndarray): the node of the agent at time t
+            var_heads (np.ndarray): the node of the agent at time t+1
+            var_times (np.ndarray): the time t of each variable
+        """
+
+        self.horizon = horizon
+        self.agents = agents
+        self.num_arcs = num_arcs
+        self.var_agents = var_agents
+        self.var_arcs = var_arcs
+        self.var_tails = var_tails
+        self.var_heads = var_heads
+        self.var_times = var_times
+        self.num_unpruned_vars = None
+
+    def __repr__(self):
+        """Return the representation of the time expansion instance"""
+
+        return f"{self.__class__.__name__}(horizon={self.horizon!r}, num_vars={len(self.var_times)!r})"
+
+    def paths(self, x):
+        """Project the time-expanded solution on the network, dropping the times
+
+        Args:
+            x (np.ndarray): the value of each variable of the time-expanded problem, as X.x
+
+        Returns:
+            np.ndarray: a (num_arcs, num_of_agents) matrix with the same meaning of X.x of the
+              other problems, where agents are identified by idx
+        """
+
+        agent_idxs, *_ = problem_model._agent_arrays(self.agents)
+        used = (np.round(x) > 0) & (self.var_arcs >= 0)
+
+        paths = np.zeros((self.num_arcs, agent_idxs.max(initial=-1) + 1))
+        paths[self.var_arcs[used], agent_idxs[self.var_agents[used]]] = 1
+
+        return paths
+
+    def schedules(self, x):
+        """Gives the node of each agent at each time step
+
+        Args:
+            x (np.ndarray): the value of each variable of the time-expanded problem, as X.x
+
+        Returns:
+            np.ndarray: a (num_of_agents, horizon + 1) matrix with the node of each agent, by
+              position in agents, at each time step
+        """
+
+        used = np.round(x) > 0
+        schedules = np.zeros((len(self.agents), self.horizon + 1), dtype=int)
+        schedules[self.var_agents[used], self.var_times[used]] = self.var_tails[used]
+        schedules[:, self.horizon] = [agent.terminus for agent in self.agents]
+
+        return schedules
+
+
+def expand_network(nodes, w_arcs, agents, horizon=None, slack=2):
+    """Build the time expansion of a network for some agents, pruned by horizon bounds
+
+    An agent can be on a node at time t only if the node is at most t arcs away from its
+    source (earliest arrival) and if the terminus can still be reached from it by the
+    horizon (latest departure). All the other moves and waits are never created
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        horizon (int): the last time step. By default it is the number of arcs of the longest
+          among the agents' paths with fewest arcs, plus the slack
+        slack (int): time steps added to the default horizon, that the agents can spend
+          waiting or making detours (default is 2)
+
+    Returns:
+        TimeExpansion: the time expansion
+    """
+
+    arc_idxs, tails, heads, _ = problem_model._arc_arrays(w_arcs)
+    _, sources, termini = problem_model._agent_arrays(agents)
+    num_nodes = int(np.max(nodes)) + 1
+
+    from_source, to_terminus = _hop_distances(num_nodes, tails, heads, sources, termini)
+    min_hops = from_source[np.arange(len(agents)), termini]
+    if not np.isfinite(min_hops).all():
+        raise ValueError("Some agents can not reach their terminus")
+
+    if horizon is None:
+        horizon = int(min_hops.max(initial=0)) + slack
+    if (min_hops > horizon).any():
+        raise ValueError(f"Horizon {horizon} is too short, some agents need {int(min_hops.max())} time steps")
+
+    # a move from time t is possible if earliest(tail) <= t and t + 1 + to go(head) <= horizon
+    latest = horizon - to_terminus  # -inf where the terminus can not be reached
+    move_first = from_source[:, tails]
+    move_last = latest[:, heads] - 1
+    move_counts = np.where(np.isfinite(move_first) & np.isfinite(move_last),
+                           move_last - move_first + 1, 0).astype(int)
+    move_groups, move_times = _ragged_ranges(np.nan_to_num(move_first, posinf=0).astype(int).ravel(),
+                                             move_counts.ravel())
+    move_agents, move_arcs = np.divmod(move_groups, len(tails))
+
+    # a wait from time t is possible if earliest(node) <= t and t + 1 + to go(node) <= horizon
+    node_labels = np.asarray(nodes, dtype=int)
+    wait_first = from_source[:, node_labels]
+    wait_last = latest[:, node_labels] - 1
+    wait_counts = np.where(np.isfinite(wait_first) & np.isfinite(wait_last),
+                           wait_last - wait_first + 1, 0).astype(int)
+    wait_groups, wait_times = _ragged_ranges(np.nan_to_num(wait_first, posinf=0).astype(int).ravel(),
+                                             wait_counts.ravel())
+    wait_agents, wait_nodes = np.divmod(wait_groups, len(node_labels))
+    wait_nodes = node_labels[wait_nodes]
+
+    expansion = TimeExpansion(horizon, agents, len(w_arcs),
+                              np.concatenate([move_agents, wait_agents]),
+                              np.concatenate([arc_idxs[move_arcs], np.full(len(wait_nodes), -1)]),
+                              np.concatenate([tails[move_arcs], wait_nodes]),
+                              np.concatenate([heads[move_arcs], wait_nodes]),
+                              np.concatenate([move_times, wait_times]))
+    expansion.num_unpruned_vars = len(agents) * horizon * (len(w_arcs) + len(nodes))
+
+    return expansion
+
+
+def _time_flow_constraints(expansion, num_nodes, num_cols):
+    """Build the flow constraints (4) of every agent at every node and time step it can reach
+
+    Args:
+        expansion (TimeExpansion): the time expansion of the network
+        num_nodes (int): number of nodes in the network, labeled from 0
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    num_vars = len(expansion.var_times)
+    num_times = expansion.horizon + 1
+
+    # each variable leaves (tail, t) and enters (head, t+1) of its agent's copy of the network
+    keys = np.concatenate([(expansion.var_agents * num_times + expansion.var_times) * num_nodes + expansion.var_tails,
+                           (expansion.var_agents * num_times + expansion.var_times + 1) * num_nodes + expansion.var_heads])
+    row_keys, rows = np.unique(keys, return_inverse=True)
+    A = sparse.csr_matrix((np.concatenate([np.ones(num_vars), -np.ones(num_vars)]),
+                           (rows, np.tile(np.arange(num_vars), 2))),
+                          shape=(len(row_keys), num_cols))
+
+    # +1 on the source at time 0, -1 on the terminus at the horizon, 0 elsewhere
+    _, sources, termini = problem_model._agent_arrays(expansion.agents)
+    agent_pos = np.arange(len(expansion.agents))
+    rhs = np.zeros(len(row_keys))
+    for keys, value in [((agent_pos * num_times + expansion.horizon) * num_nodes + termini, -1),
+                        ((agent_pos * num_times) * num_nodes + sources, 1)]:
+        pos = np.minimum(np.searchsorted(row_keys, keys), len(row_keys) - 1)
+        if len(row_keys) == 0 or (row_keys[pos] != keys).any():
+            raise ValueError(f"Horizon {expansion.horizon} is too short, some agents can not reach their terminus")
+        rhs[pos] += value
+
+    return A, GRB.EQUAL, rhs
+
+
+def _depot_holds(expansion):
+    """Find the waits on the depots of the agents, with a hold for each depot a wait is on
+
+    The source and the terminus of an agent are its depots. A hold is 1 when its wait does not
+    occupy the depot, as the agent has not left its source yet or will not leave its terminus
+    any more, see _hold_constraints()
+
+    Args:
+        expansion (TimeExpansion): the time expansion of the network
+
+    Returns:
+        tuple: a tuple (hold_waits, hold_ends) of np.ndarray with the wait of each hold and
+          whether it holds the agent on its terminus rather than on its source
+    """
+
+    _, sources, termini = problem_model._agent_arrays(expansion.agents)
+    is_wait = expansion.var_arcs < 0
+    on_source = np.flatnonzero(is_wait & (expansion.var_tails == sources[expansion.var_agents]))
+    on_terminus = np.flatnonzero(is_wait & (expansion.var_tails == termini[expansion.var_agents]))
+
+    return (np.concatenate([on_source, on_terminus]),
+            np.concatenate([np.zeros(len(on_source), dtype=bool), np.ones(len(on_terminus), dtype=bool)]))
+
+
+def _occupancy(expansion, hold_waits):
+    """Find when each variable makes its agent occupy a node
+
+    An agent occupies its source at each time t it leaves it or waits there, and any other
+    node at the time t+1 it reaches it. Each hold, see _depot_holds(), is subtracted from the
+    occupation of its wait, so that waiting on a depot, before first leaving the source or
+    after last reaching the terminus, does not occupy it
+
+    Args:
+        expansion (TimeExpansion): the time expansion of the network
+        hold_waits (np.ndarray): the wait of each hold
+
+    Returns:
+        tuple: a tuple (entries, coeffs, nodes, times) of np.ndarray with the variable of each
+          term of the occupations, the position of a variable or, after all of them, of a hold,
+          its coefficient and the occupied node and time
+    """
+
+    _, sources, _ = problem_model._agent_arrays(expansion.agents)
+    var_sources = sources[expansion.var_agents]
+    num_vars = len(expansion.var_times)
+
+    # the source is occupied by the variables leaving it, any other node by the ones entering it
+    leaving = np.flatnonzero(expansion.var_tails == var_sources)
+    arriving = np.flatnonzero(expansion.var_heads != var_sources)
+    hold_times = expansion.var_times[hold_waits] + (expansion.var_tails[hold_waits] != var_sources[hold_waits])
+
+    return (np.concatenate([arriving, leaving, num_vars + np.arange(len(hold_waits))]),
+            np.concatenate([np.ones(len(arriving) + len(leaving)), -np.ones(len(hold_waits))]),
+            np.concatenate([expansion.var_heads[arriving], expansion.var_tails[leaving],
+                            expansion.var_tails[hold_waits]]),
+            np.concatenate([expansion.var_times[arriving] + 1, expansion.var_times[leaving], hold_times]))
+
+
+def _hold_constraints(expansion, hold_waits, hold_ends, X_cols, Hold_cols, num_cols):
+    """Build the constraints letting a hold be 1 only before leaving the source or after reaching the terminus
+
+    The holds of a wait are at most the wait itself. A hold on the source is at most the one
+    of the wait at the previous time, a hold on the terminus the one of the wait at the next
+    time: the waits on a depot are at consecutive times, from 0 on the source and up to the
+    horizon on the terminus
+
+    Args:
+        expansion (TimeExpansion): the time expansion of the network
+        hold_waits (np.ndarray): the wait of each hold
+        hold_ends (np.ndarray): whether each hold is on the terminus rather than on the source
+        X_cols (np.ndarray): the columns of the variables X
+        Hold_cols (np.ndarray): the columns of the holds
+        num_cols (int): number of variables of the model
+
+    Returns:
+        tuple: a tuple (A, sense, rhs) describing the constraints
+    """
+
+    # sum of the holds of a wait <= wait
+    waits, wait_rows = np.unique(hold_waits, return_inverse=True)
+    A_waits = sparse.csr_matrix((np.concatenate([np.ones(len(hold_waits)), -np.ones(len(waits))]),
+                                 (np.concatenate([wait_rows, np.arange(len(waits))]),
+                                  np.concatenate([Hold_cols, X_cols[waits]]))),
+                                shape=(len(waits), num_cols))
+
+    # later hold <= earlier hold on the source, earlier hold <= later hold on the terminus
+    hold_agents = expansion.var_agents[hold_waits]
+    order = np.lexsort((expansion.var_times[hold_waits], hold_agents, hold_ends))
+    earlier, later = order[:-1], order[1:]
+    chained = (hold_ends[earlier] == hold_ends[later]) & (hold_agents[earlier] == hold_agents[later])
+    earlier, later = earlier[chained], later[chained]
+    bounded = np.where(hold_ends[earlier], earlier, later)
+    bounding = np.where(hold_ends[earlier], later, earlier)
+    A_chains = problem_model._fixed_width_matrix(np.column_stack([Hold_cols[bounded], Hold_cols[bounding]]),
+                                                 np.array([1, -1]), num_cols)
+
+    return sparse.vstack([A_waits, A_chains], format="csr"), GRB.LESS_EQUAL, np.zeros(len(waits) + len(bounded))
+
+
+def _antiparallel_pairs(tails, heads, num_nodes):
+    """Find the pairs of arcs linking the same nodes in opposite directions
+
+    Args:
+        tails (np.ndarray): the starting node of each arc, by idx
+        heads (np.ndarray): the ending node of each arc, by idx
+        num_nodes (int): number of nodes in the network, labeled from 0
+
+    Returns:
+        np.ndarray: a (num_of_pairs, 2) matrix with the idx of the two arcs of each pair, the
+          smaller first. Among parallel arcs only the first one is paired
+    """
+
+    forward_keys = tails * num_nodes + heads
+    order = np.argsort(forward_keys, kind="stable")
+    reverse_keys = heads * num_nodes + tails
+
+    pos = np.minimum(np.searchsorted(forward_keys[order], reverse_keys), len(order) - 1)
+    has_reverse = forward_keys[order][pos] == reverse_keys
+    first, second = np.flatnonzero(has_reverse), order[pos[has_reverse]]
+    is_pair = first < second
+
+    return np.column_stack([first[is_pair], second[is_pair]])
+
+
+def describe_time_expanded_problem(nodes, w_arcs, agents, horizon=None, slack=2, conflicts="penalized",
+                                   wait_cost=0.0):
+    """Describe a time-expanded MSPP-PD for a network instance given the agents to route
+
+    It is the MSPP's flow formulation on the time expansion of the network, see
+    expand_network(). Two agents conflict if they occupy the same node at the same time
+    (vertex conflict) or if they traverse the same pair of opposite arcs at the same time
+    (swap conflict). Only the nodes, arcs and times that two or more agents can reach are
+    given conflict constraints
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        horizon (int): the last time step. By default see expand_network()
+        slack (int): time steps added to the default horizon (default is 2)
+        conflicts (str): "penalized", to count the conflicting nodes and arc pairs at each time
+          as the penalty of the NBP, or "forbidden", to forbid any conflict (default is "penalized")
+        wait_cost (float): cost of waiting a time step on a node that is not a depot of the agent,
+          added to the distance (default is 0)
+
+    Returns:
+        tuple: a tuple (description, expansion) with the MILPDescription, with the block of
+          variables X and, if penalized, the blocks Zeta (vertex conflicts), E (use of the arcs
+          that can swap) and Psi (swap conflicts), then the block Hold of the waits on the
+          depots, see _depot_holds(), and the TimeExpansion giving the meaning of X
+    """
+
+    if conflicts not in ("penalized", "forbidden"):
+        raise ValueError(f"Unknown conflicts' handling {conflicts!r}")
+
+    expansion = expand_network(nodes, w_arcs, agents, horizon, slack)
+    arc_idxs, tails, heads, weights = problem_model._arc_arrays(w_arcs)
+    _, sources, termini = problem_model._agent_arrays(agents)
+    num_nodes = int(np.max(nodes)) + 1
+    num_vars = len(expansion.var_times)
+
+    arc_weights = np.zeros(len(w_arcs))
+    arc_weights[arc_idxs] = weights
+    arc_tails, arc_heads = np.zeros(len(w_arcs), dtype=int), np.zeros(len(w_arcs), dtype=int)
+    arc_tails[arc_idxs], arc_heads[arc_idxs] = tails, heads
+
+    TE_pb = problem_model.MILPDescription()
+
+    # Decision variables
+    X_cols = TE_pb.add_vars("X", num_vars,
+                            vtype=GRB.BINARY)  # 5) Binary constraints
+
+    # 1-3) Objective, waits on the depots are free
+    is_move = expansion.var_arcs >= 0
+    is_depot = ((expansion.var_tails == sources[expansion.var_agents])
+                | (expansion.var_tails == termini[expansion.var_agents]))
+    TE_pb.add_objective("Distance",
+                        X_cols,
+                        np.where(is_move, arc_weights[expansion.var_arcs], np.where(is_depot, 0.0, wait_cost)))
+
+    # 4) Flow constraints
+    TE_pb.add_constrs("Flow", *_time_flow_constraints(expansion, num_nodes, TE_pb.num_vars))
+
+    # vertex conflicts, on the (node, time) that two or more agents can occupy
+    hold_waits, hold_ends = _depot_holds(expansion)
+    occupying, occupying_coeffs, occupied_nodes, occupied_times = _occupancy(expansion, hold_waits)
+    vertex_rows, vertex_agents = _group_rows(occupied_times * num_nodes + occupied_nodes,
+                                             np.concatenate([expansion.var_agents,
+                                                             expansion.var_agents[hold_waits]])[occupying])
+    shared = vertex_agents[vertex_rows] >= 2
+    kept_rows, vertex_rows = np.unique(vertex_rows[shared], return_inverse=True)
+    occupying, occupying_coeffs = occupying[shared], occupying_coeffs[shared]
+    num_occupants = vertex_agents[kept_rows]
+    num_vertex_rows = len(kept_rows)
+
+    # swap conflicts, on the (pair of opposite arcs, time) that two or more agents can traverse
+    pairs = _antiparallel_pairs(arc_tails, arc_heads, num_nodes)
+    pair_of_arc = np.full(len(w_arcs), -1)
+    pair_of_arc[pairs.ravel()] = np.repeat(np.arange(len(pairs)), 2)
+    swapping = np.flatnonzero(is_move)
+    swapping = swapping[pair_of_arc[expansion.var_arcs[swapping]] >= 0]
+    swap_rows, swap_agents = _group_rows(expansion.var_times[swapping] * len(pairs)
+                                         + pair_of_arc[expansion.var_arcs[swapping]],
+                                         expansion.var_agents[swapping])
+    # both arcs of the pair must be usable at that time
+    side = (expansion.var_arcs[swapping] == pairs[pair_of_arc[expansion.var_arcs[swapping]], 1]).astype(int)
+    sides_of_row = np.zeros(len(swap_agents), dtype=int)
+    np.bitwise_or.at(sides_of_row, swap_rows, side + 1)
+    shared = (swap_agents[swap_rows] >= 2) & (sides_of_row[swap_rows] == 3)
+    swap_rows = np.unique(swap_rows[shared], return_inverse=True)[1]
+    swapping, side = swapping[shared], side[shared]
+    num_swap_rows = swap_rows.max(initial=-1) + 1
+
+    if conflicts == "forbidden":
+        Hold_cols = TE_pb.add_vars("Hold", len(hold_waits),
+                                   vtype=GRB.CONTINUOUS, ub=1.0)
+        TE_pb.add_constrs("Depot holds",
+                          *_hold_constraints(expansion, hold_waits, hold_ends, X_cols, Hold_cols, TE_pb.num_vars))
+
+        TE_pb.add_constrs("Vertex conflicts",
+                          sparse.csr_matrix((occupying_coeffs,
+                                             (vertex_rows, np.concatenate([X_cols, Hold_cols])[occupying])),
+                                            shape=(num_vertex_rows, TE_pb.num_vars)),
+                          GRB.LESS_EQUAL, np.ones(num_vertex_rows))
+        TE_pb.add_constrs("Swap conflicts",
+                          sparse.csr_matrix((np.ones(len(swapping)), (swap_rows, X_cols[swapping])),
+                                            shape=(num_swap_rows, TE_pb.num_vars)),
+                          GRB.LESS_EQUAL, np.ones(num_swap_rows))
+
+        return TE_pb, expansion
+
+    # Additional decision variables
+    Zeta_cols = TE_pb.add_vars("Zeta", num_vertex_rows,
+                               vtype=GRB.BINARY)  # 14) Binary constraints
+    E_cols = TE_pb.add_vars("E", (num_swap_rows, 2),
+                            vtype=GRB.BINARY)  # 17) Binary constraints
+    Psi_cols = TE_pb.add_vars("Psi", num_swap_rows,
+                              vtype=GRB.BINARY)  # 8) Binary constraints
+    Hold_cols = TE_pb.add_vars("Hold", len(hold_waits),
+                               vtype=GRB.CONTINUOUS, ub=1.0)
+
+    # 9,6) Additional objective
+    TE_pb.add_objective("Penalty", np.concatenate([Zeta_cols, Psi_cols]), 1)
+
+    TE_pb.add_constrs("Depot holds",
+                      *_hold_constraints(expansion, hold_waits, hold_ends, X_cols, Hold_cols, TE_pb.num_vars))
+
+    # 12) Turning on zeta constraints, as in the NBP, with the agents that can occupy the node
+    TE_pb.add_constrs("Vertex conflicts",
+                      sparse.csr_matrix((np.concatenate([occupying_coeffs / num_occupants[vertex_rows],
+                                                         -np.ones(num_vertex_rows)]),
+                                         (np.concatenate([vertex_rows, np.arange(num_vertex_rows)]),
+                                          np.concatenate([np.concatenate([X_cols, Hold_cols])[occupying],
+                                                          Zeta_cols]))),
+                                        shape=(num_vertex_rows, TE_pb.num_vars)),
+                      GRB.LESS_EQUAL,
+                      1 / num_occupants)
+
+    # 16) Turning on e constraints, for each arc of the pair
+    use_rows = swap_rows * 2 + side
+    num_users = np.bincount(use_rows, minlength=2 * num_swap_rows)
+    TE_pb.add_constrs("Arc use",
+                      sparse.csr_matrix((np.concatenate([1 / num_users[use_rows], -np.ones(2 * num_swap_rows)]),
+                                         (np.concatenate([use_rows, np.arange(2 * num_swap_rows)]),
+                                          np.concatenate([X_cols[swapping], E_cols.ravel()]))),
+                                        shape=(2 * num_swap_rows, TE_pb.num_vars)),
+                      GRB.LESS_EQUAL,
+                      np.zeros(2 * num_swap_rows))
+
+    # psi >= e + e' - 1
+    TE_pb.add_constrs("Swap conflicts",
+                      problem_model._fixed_width_matrix(np.column_stack([E_cols, Psi_cols]),
+                                                        np.array([1, 1, -1]), TE_pb.num_vars),
+                      GRB.LESS_EQUAL,
+                      np.ones(num_swap_rows))
+
+    return TE_pb, expansion
+
+
+def set_time_expanded_problem(nodes, w_arcs, agents, horizon=None, slack=2, conflicts="penalized",
+                              wait_cost=0.0, env=None):
+    """Create and set a time-expanded MSPP-PD for a network instance given the agents to route
+
+    See describe_time_expanded_problem(). The agents' paths are recovered with
+    expansion.paths(X.x) and their timing with expansion.schedules(X.x)
+
+    Args:
+        nodes (list): list of the nodes in the network instance
+        w_arcs (list): list of weighted arcs in the network instance
+        agents (list): list of agents that has to be routed
+        horizon (int): the last time step. By default see expand_network()
+        slack (int): time steps added to the default horizon (default is 2)
+        conflicts (str): "penalized" or "forbidden" (default is "penalized")
+        wait_cost (float): cost of waiting a time step outside the depots (default is 0)
+        env (gb.Env): the environment where the model is created. By default it is Gurobi's default one
+
+    Returns:
+        tuple: a tuple (TE_pb, expansion, X, *_) where:
+          - TE_pb is a gb.Model that represent the created time-expanded problem
+          - expansion is the TimeExpansion giving the meaning of X
+          - X is a gb.MVar containing a decision variable for each move or wait of an agent
+          - *_ are the gb.MVar Zeta, E and Psi of the penalized conflicts, then Hold
+    """
+
+    description, expansion = describe_time_expanded_problem(nodes, w_arcs, agents, horizon, slack,
+                                                            conflicts, wait_cost)
+    TE_pb, *variables = problem_model.to_gurobi_model(description, env=env)
+
+    return (TE_pb, expansion, *variables)